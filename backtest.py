@@ -1,22 +1,41 @@
 import pandas as pd
 import numpy as np
+from contextlib import nullcontext
 from datetime import datetime, timezone, timedelta
-from indicators import SupportResistanceTracker, add_indicators
-from strategy import TradingStrategy
+from indicators import SortedSupportResistanceTracker, StreamingIndicators
+from candle_store import STREAM_CHUNK_BARS, iter_candle_chunks, load_candles
+from equity_curve import EquityCurve
+from funding import FundingSchedule, load_funding_rates
+from position_book import PositionBook
+from profiler import StageProfiler
+from resample import StreamingHigherTimeframeTrend, add_strategy_indicators, load_resampled_candles
+from running_stats import RunningStatistics
+from uniform_buffer import UniformBuffer
+from strategy import TradingStrategy, entry_position_size
+from patterns import is_hammer_batch, is_shooting_star_batch
 from config import (
     SYMBOL, TIMEFRAME,
     IN_SAMPLE_START, IN_SAMPLE_END,
     OUT_OF_SAMPLE_START, OUT_OF_SAMPLE_END,
-    LEVERAGE, MAX_POSITIONS, MAX_CAPITAL_USAGE, RISK_PER_TRADE
+    LEVERAGE, MAX_POSITIONS, RISK_PER_TRADE, PROFILE_STAGES, TREND_TIMEFRAME
 )
 
 class Backtester:
-    def __init__(self, initial_balance=10000):
+    def __init__(self, initial_balance=10000, sr_tracker_class=SortedSupportResistanceTracker, verbose=True,
+                 funding_rates=None, equity_decimation=1, profile=False, record_funding_history=False):
         self.initial_balance = initial_balance
+        self.sr_tracker_class = sr_tracker_class
+        self.verbose = verbose  # False면 진행 상황 출력 생략 (스윕 워커용)
+        self.equity_decimation = equity_decimation  # 자산 곡선을 k봉마다 하나씩만 저장
+        # True면 펀딩 시점마다 포지션별 펀딩비 내역을 남김 (꺼져 있으면 포지션별 합계만 유지)
+        self.record_funding_history = record_funding_history
+        # 단계별 시간 측정 (True 또는 StageProfiler), 꺼져 있으면 None이라 비용 없음
+        self.profiler = profile if isinstance(profile, StageProfiler) else (StageProfiler() if profile else None)
         self.balance = initial_balance
-        self.positions = []
+        self.book = PositionBook()  # 열린 포지션 (배열 기반)
         self.trades_history = []
-        self.sr_tracker = SupportResistanceTracker()
+        self.stats = RunningStatistics(initial_balance)  # 청산마다 갱신되는 성과 지표
+        self.sr_tracker = self.sr_tracker_class()
         self.strategy = TradingStrategy(self.sr_tracker)
         
         # 거래소 관련 설정
@@ -24,37 +43,54 @@ class Backtester:
         self.taker_fee = 0.0004  # Taker 수수료 0.04%
         self.avg_slippage = 0.0005  # 평균 슬리피지 0.05%
         self.min_order_amount = 5  # 최소 주문 금액 (USDT)
+        self._slippage_draws = None  # 엔진 실행 중 슬리피지 난수를 블록으로 뽑아 두는 UniformBuffer
         
         # 펀딩비 관련 설정
         self.funding_interval = timedelta(hours=8)  # 8시간마다 펀딩
         self.funding_rate = 0.01/100/3  # 일일 0.01% 기준, 8시간당
+        # 펀딩비율 시계열 (Series 또는 CSV 경로), 없으면 고정 비율 사용
+        if isinstance(funding_rates, str):
+            funding_rates = load_funding_rates(funding_rates)
+        self.funding_rates = funding_rates
         self.last_funding_time = None
+        self._funding = None  # (설정, FundingSchedule), 설정이 바뀔 때만 다시 만든다
         
         # 결과 저장용
-        self.equity_curve = []
+        self.equity_curve = EquityCurve(self.equity_decimation)
         self.funding_history = []
     
-    def load_data(self, csv_filename):
-        """CSV 파일에서 데이터 로드"""
-        print(f"Loading data from {csv_filename}")
-        df = pd.read_csv(csv_filename)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        return df
+    @property
+    def positions(self):
+        """열린 포지션 dict 목록 (진입 순서)"""
+        return self.book.records
+    
+    def load_data(self, csv_filename, use_cache=True):
+        """CSV 파일에서 데이터 로드
+        
+        use_cache=True이면 CSV 옆의 바이너리 컬럼 캐시를 메모리 매핑해서 읽는다
+        (CSV의 mtime/크기가 바뀌면 캐시를 다시 만든다).
+        """
+        self._log(f"Loading data from {csv_filename}")
+        return load_candles(csv_filename, use_cache=use_cache)
 
     def reset(self):
         """백테스터 상태 초기화"""
         self.balance = self.initial_balance
-        self.positions = []
+        self.book = PositionBook()
         self.trades_history = []
-        self.sr_tracker = SupportResistanceTracker()
+        self.stats = RunningStatistics(self.initial_balance)  # 청산마다 갱신되는 성과 지표
+        self.sr_tracker = self.sr_tracker_class()
         self.strategy = TradingStrategy(self.sr_tracker)
         self.last_funding_time = None
-        self.equity_curve = []
+        self.equity_curve = EquityCurve(self.equity_decimation)
         self.funding_history = []
     
     def apply_slippage(self, price, order_type):
         """슬리피지 적용"""
-        slippage = np.random.uniform(0, self.avg_slippage * 2)
+        if self._slippage_draws is not None:
+            slippage = self._slippage_draws.draw()
+        else:
+            slippage = np.random.uniform(0, self.avg_slippage * 2)
         if order_type == 'buy':
             return price * (1 + slippage)
         else:
@@ -81,174 +117,304 @@ class Backtester:
         
         while current_time >= self.last_funding_time + self.funding_interval:
             funding_time = self.last_funding_time + self.funding_interval
-            
-            for position in self.positions:
-                position_value = position['size'] * float(candle['close'])
-                funding_rate = self.funding_rate
-                if position['type'] == 'sell':  # 숏 포지션
-                    funding_rate = -funding_rate
-                
-                funding_fee = position_value * funding_rate
+            self._charge_funding(
+                funding_time, float(candle['close']), self.funding.rate_at(funding_time)
+            )
+            self.last_funding_time = funding_time
+    
+    @property
+    def funding(self):
+        """현재 펀딩 설정(주기, 고정 비율, 비율 시계열)의 FundingSchedule
+        
+        한 번 만든 스케줄을 재사용하고, funding_interval, funding_rate,
+        funding_rates 중 하나가 바뀌었을 때만 새로 만든다.
+        """
+        if self._funding is not None:
+            (interval, rate, rates), schedule = self._funding
+            if interval == self.funding_interval and rate == self.funding_rate and rates is self.funding_rates:
+                return schedule
+        
+        schedule = FundingSchedule(self.funding_interval, self.funding_rate, self.funding_rates)
+        self._funding = (self.funding_interval, self.funding_rate, self.funding_rates), schedule
+        return schedule
+    
+    def _apply_funding_event(self, funding_time_ns, close_price, funding_rate):
+        """미리 계산한 펀딩 시점 하나 처리"""
+        funding_time = pd.Timestamp(funding_time_ns, tz='UTC')
+        self._charge_funding(funding_time, close_price, funding_rate)
+        self.last_funding_time = funding_time
+    
+    def _charge_funding(self, funding_time, close_price, funding_rate=None):
+        """펀딩 시점 하나에 대해 모든 포지션의 펀딩비를 한 번에 계산해 부과"""
+        if not self.book.count:
+            return
+        
+        if funding_rate is None:
+            funding_rate = self.funding_rate
+        fees, rates = self.book.funding_fees(close_price, funding_rate)
+        if not self.record_funding_history:
+            # 포지션별 누적 펀딩비는 book.funding에 있으므로 잔고만 갱신
+            for funding_fee in fees.tolist():
                 self.balance -= funding_fee
-                
-                # 펀딩비 기록
-                if 'funding_fees' not in position:
-                    position['funding_fees'] = []
-                position['funding_fees'].append({
-                    'time': funding_time,
-                    'fee': funding_fee
-                })
-                
-                # 전체 펀딩비 히스토리에 추가
-                self.funding_history.append({
-                    'time': funding_time,
-                    'position_id': id(position),
-                    'position_type': position['type'],
-                    'position_size': position['size'],
-                    'funding_rate': funding_rate,
-                    'funding_fee': funding_fee
-                })
+            return
+        
+        for position, funding_fee, funding_rate in zip(self.book.records, fees.tolist(), rates.tolist()):
+            self.balance -= funding_fee
             
-            self.last_funding_time = funding_time
+            # 펀딩비 기록
+            if 'funding_fees' not in position:
+                position['funding_fees'] = []
+            position['funding_fees'].append({
+                'time': funding_time,
+                'fee': funding_fee
+            })
+            
+            # 전체 펀딩비 히스토리에 추가
+            self.funding_history.append({
+                'time': funding_time,
+                'position_id': id(position),
+                'position_type': position['type'],
+                'position_size': position['size'],
+                'funding_rate': funding_rate,
+                'funding_fee': funding_fee
+            })
+    
+    def funding_schedule(self, timestamps_ns, start=0):
+        """start 봉부터의 펀딩 시점(int64 ns), 부과 봉 인덱스, 펀딩비율 배열
+        
+        마지막 펀딩 시점이 없으면 start 봉 기준 8시간 단위로 내림해 정한다.
+        """
+        last_funding_ns = None
+        if self.last_funding_time is not None:
+            last_funding_ns = pd.Timestamp(self.last_funding_time).value
+        
+        last_funding_ns, funding_times_ns, funding_bars, funding_rates = self.funding.events(
+            timestamps_ns, start, last_funding_ns
+        )
+        if last_funding_ns is not None and self.last_funding_time is None:
+            self.last_funding_time = pd.Timestamp(last_funding_ns, tz='UTC')
+        return funding_times_ns, funding_bars, funding_rates
+    
+    def mark_to_market(self, price):
+        """잔고 + 열린 포지션의 미실현 손익 (청산 비용 제외)"""
+        if not self.book.count:
+            return self.balance
+        return self.balance + float(self.book.unrealized_pnl(price, LEVERAGE))
     
     def check_positions(self, candle):
         """포지션 체크 및 청산"""
-        closed_positions = []
-        current_price = float(candle['close'])
+        self._check_exits(float(candle['close']), candle['timestamp'])
+    
+    def _draw_slippage(self, n):
+        """열린 포지션 수만큼 슬리피지 샘플 (apply_slippage와 같은 난수 순서)"""
+        if self._slippage_draws is not None:
+            return self._slippage_draws.draw(n)
+        return np.random.uniform(0, self.avg_slippage * 2, n)
+    
+    def _check_exits(self, current_price, exit_time):
+        """모든 열린 포지션의 TP/SL을 한 번에 평가하고 청산"""
+        n = self.book.count
+        if not n:
+            return
         
-        for position in self.positions:
-            result = None
-            
-            if position['type'] == 'buy':
-                actual_price = self.apply_slippage(current_price, 'sell')
-                
-                if actual_price >= position['take_profit']:
-                    exit_price = position['take_profit']
-                    status = 'take_profit'
-                elif actual_price <= position['stop_loss']:
-                    exit_price = position['stop_loss']
-                    status = 'stop_loss'
-                else:
-                    continue
-                
-                exit_fee = self.calculate_fee(exit_price * position['size'])
-                profit = (
-                    (exit_price - position['entry_price']) * position['size'] * LEVERAGE
-                    - position['entry_fee']
-                    - exit_fee
-                )
-                
-                result = {
-                    'status': status,
-                    'profit': profit,
-                    'exit_price': exit_price,
-                    'exit_fee': exit_fee
-                }
-                
-            else:  # sell position
-                actual_price = self.apply_slippage(current_price, 'buy')
-                
-                if actual_price <= position['take_profit']:
-                    exit_price = position['take_profit']
-                    status = 'take_profit'
-                elif actual_price >= position['stop_loss']:
-                    exit_price = position['stop_loss']
-                    status = 'stop_loss'
-                else:
-                    continue
-                
-                exit_fee = self.calculate_fee(exit_price * position['size'])
-                profit = (
-                    (position['entry_price'] - exit_price) * position['size'] * LEVERAGE
-                    - position['entry_fee']
-                    - exit_fee
-                )
-                
-                result = {
-                    'status': status,
-                    'profit': profit,
-                    'exit_price': exit_price,
-                    'exit_fee': exit_fee
-                }
-            
-            if result:
-                # 펀딩비 총합 계산 및 반영
-                total_funding_fees = sum(f['fee'] for f in position.get('funding_fees', []))
-                result['profit'] -= total_funding_fees
-                
-                trade = {
-                    **position,
-                    **result,
-                    'exit_time': candle['timestamp'],
-                    'holding_time': (pd.to_datetime(candle['timestamp']) - 
-                                   pd.to_datetime(position['entry_time'])).total_seconds() / 3600,
-                    'total_funding_fees': total_funding_fees,
-                    'total_fees': position['entry_fee'] + exit_fee + total_funding_fees
-                }
-                
-                self.trades_history.append(trade)
-                closed_positions.append(position)
-                self.balance += result['profit']
+        closed, status, exit_price, exit_fee, profit = self.book.evaluate_exits(
+            current_price, self._draw_slippage(n), self.taker_fee, LEVERAGE
+        )
+        if not len(closed):
+            return
+        
+        for j, index in enumerate(closed.tolist()):
+            result = {
+                'status': str(status[j]),
+                'profit': float(profit[j]),
+                'exit_price': float(exit_price[j]),
+                'exit_fee': float(exit_fee[j])
+            }
+            self._close_position(
+                self.book.records[index], result, exit_time, float(self.book.funding[index])
+            )
+        self.book.remove(closed)
+    
+    def _close_position(self, position, result, exit_time, total_funding_fees):
+        """청산 결과를 거래 기록과 잔고에 반영 (result['profit']은 펀딩비 차감 후)"""
+        trade = {
+            **position,
+            **result,
+            'exit_time': exit_time,
+            'holding_time': (pd.to_datetime(exit_time) - 
+                           pd.to_datetime(position['entry_time'])).total_seconds() / 3600,
+            'total_funding_fees': total_funding_fees,
+            'total_fees': position['entry_fee'] + result['exit_fee'] + total_funding_fees
+        }
         
-        for position in closed_positions:
-            self.positions.remove(position)
+        self.trades_history.append(trade)
+        self.stats.add_trade(trade)
+        self.balance += result['profit']
     
     def process_signals(self, candle, signals):
         """시그널 처리 및 거래 실행"""
         for signal in signals:
-            if len(self.positions) >= MAX_POSITIONS:
+            if self.book.count >= MAX_POSITIONS:
                 continue
             
-            entry_price = self.apply_slippage(float(candle['close']), signal['type'])
-            stop_loss = self.strategy.calculate_stop_loss(candle, signal['type'])
-            take_profit = self.strategy.calculate_take_profit(
-                entry_price, stop_loss, signal['type']
-            )
-            
-            # 포지션 크기 계산
-            max_size = (self.initial_balance * MAX_CAPITAL_USAGE) / entry_price
-            risk_based_size = self.strategy.calculate_position_size(
-                entry_price, stop_loss, self.balance, self.initial_balance
-            )
-            position_size = min(max_size, risk_based_size)
-            
-            # 최소 주문 금액 체크
-            if position_size * entry_price < self.min_order_amount:
+            position = self._build_position(candle, signal)
+            if position is None:
                 continue
             
-            # 진입 수수료 계산 및 차감
-            entry_fee = self.calculate_fee(entry_price * position_size)
-            self.balance -= entry_fee
-            
-            position = {
-                'type': signal['type'],
-                'entry_price': entry_price,
-                'stop_loss': stop_loss,
-                'take_profit': take_profit,
-                'size': position_size,
-                'entry_time': candle['timestamp'],
-                'pattern': signal['pattern'],
-                'entry_fee': entry_fee,
-                'funding_fees': []
-            }
-            
-            self.positions.append(position)
+            # 진입 수수료 차감
+            self.balance -= position['entry_fee']
+            self.book.open(position)
     
-    def run_backtest(self, csv_filename):
-        """백테스트 실행"""
-        print(f"Starting backtest on {csv_filename}...")
+    def _build_position(self, candle, signal):
+        """시그널 하나로 진입 가격, 손절/익절, 크기, 수수료를 정한 포지션 dict (최소 주문 미달이면 None)"""
+        entry_price = self.apply_slippage(float(candle['close']), signal['type'])
+        stop_loss = self.strategy.calculate_stop_loss(candle, signal['type'])
+        take_profit = self.strategy.calculate_take_profit(
+            entry_price, stop_loss, signal['type']
+        )
         
-        df = self.load_data(csv_filename)
-        df = add_indicators(df)
+        # 포지션 크기 계산 (리스크 기준 크기, 자본 사용 한도 이내)
+        position_size = entry_position_size(entry_price, stop_loss, self.balance, self.initial_balance)
         
-        print(f"Processing {len(df)} candles...")
+        # 최소 주문 금액 체크
+        if position_size * entry_price < self.min_order_amount:
+            return None
         
-        for i, row in df.iterrows():
-            # 잔고 기록
-            self.equity_curve.append({
-                'timestamp': row['timestamp'],
-                'balance': self.balance
-            })
+        # 진입 수수료 계산
+        entry_fee = self.calculate_fee(entry_price * position_size)
+        
+        return {
+            'type': signal['type'],
+            'entry_price': entry_price,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'size': position_size,
+            'entry_time': candle['timestamp'],
+            'pattern': signal['pattern'],
+            'entry_fee': entry_fee,
+            'funding_fees': []
+        }
+    
+    def run_backtest(self, csv_filename, engine='array'):
+        """백테스트 실행
+        
+        engine='array'는 컬럼을 NumPy 배열로 한 번만 추출해 스칼라로 순회하고,
+        engine='iterrows'는 기존의 행 단위 Series 경로를 사용한다.
+        engine='event'는 시그널 후보 봉과 TP/SL 도달 봉 사이를 건너뛴다.
+        세 엔진은 동일한 거래 결과를 만든다.
+        TREND_TIMEFRAME 봉은 CSV 옆의 리샘플 캐시에서 읽는다 (새 봉만 다시 집계).
+        """
+        self._log(f"Starting backtest on {csv_filename}...")
+        
+        with self._stage('load_data'):
+            df = self.load_data(csv_filename)
+            higher = None
+            if TREND_TIMEFRAME is not None:
+                higher = load_resampled_candles(csv_filename, TREND_TIMEFRAME)
+        return self.run_on_data(df, engine=engine, higher=higher)
+    
+    def run_on_data(self, df, engine='array', warmup_bars=0, compute_indicators=True, higher=None):
+        """이미 로드된 캔들 DataFrame으로 백테스트 실행
+        
+        앞쪽 warmup_bars개 캔들은 거래 없이 지지/저항 상태만 갱신한다.
+        compute_indicators=False이면 df에 이미 계산된 지표 컬럼을 그대로 쓴다
+        (더 긴 과거 구간에서 지표를 계산한 뒤 잘라낸 경우).
+        TREND_TIMEFRAME이 설정되어 있으면 추세는 상위 타임프레임 봉(higher, 없으면
+        df에서 리샘플링)에서 가져온다.
+        """
+        if compute_indicators:
+            with self._stage('add_indicators'):
+                df = add_strategy_indicators(df, higher)
+        
+        self._log(f"Processing {len(df)} candles...")
+        self._run_engine(df, engine, warmup_bars)
+        
+        self._log("\nBacktest completed.")
+        return self.calculate_statistics()
+    
+    def run_streaming_backtest(self, csv_filename, engine='array', chunk_bars=STREAM_CHUNK_BARS,
+                               warmup_bars=0, use_cache=True):
+        """CSV를 chunk_bars개씩 읽어 백테스트 (전체 캔들을 메모리에 올리지 않음)
+        
+        캔들은 바이너리 캐시(use_cache=True) 또는 CSV에서 청크 단위로 읽는다.
+        지표는 StreamingIndicators로 청크 경계를 넘어 이어서 계산하고, 지지/저항,
+        포지션, 펀딩 상태는 백테스터에 남아 다음 청크로 이어지므로 run_backtest와
+        같은 결과가 나온다. 메모리는 청크 크기와 자산 곡선(equity_decimation으로
+        줄일 수 있음), 거래 기록에만 비례한다.
+        TREND_TIMEFRAME이 설정되어 있으면 상위 타임프레임 봉도 청크를 따라 이어서
+        만들어 추세를 가져온다.
+        """
+        self._log(f"Streaming backtest on {csv_filename} ({chunk_bars} candles per chunk)...")
+        indicators = StreamingIndicators()
+        higher_trend = StreamingHigherTimeframeTrend(TREND_TIMEFRAME) if TREND_TIMEFRAME is not None else None
+        bars = 0
+        for chunk in iter_candle_chunks(csv_filename, chunk_bars, use_cache=use_cache):
+            with self._stage('add_indicators'):
+                chunk = indicators.add_to_chunk(chunk)
+                if higher_trend is not None:
+                    chunk = higher_trend.add_to_chunk(chunk)
+                    chunk['trend'] = chunk[f'trend_{TREND_TIMEFRAME}']
+            chunk_warmup = min(max(warmup_bars - bars, 0), len(chunk))
+            self._run_engine(chunk, engine, chunk_warmup)
+            bars += len(chunk)
+            self._log(f"Processed {bars} candles...")
+        
+        self._log("\nBacktest completed.")
+        return self.calculate_statistics()
+    
+    def _run_engine(self, df, engine, warmup_bars):
+        """df 구간에 엔진 실행 (백테스터 상태는 이전 구간에서 이어짐)"""
+        engines = {
+            'array': self._run_array_engine,
+            'iterrows': self._run_iterrows_engine,
+            'event': self._run_event_engine
+        }
+        if engine not in engines:
+            raise ValueError(f"Unknown engine: {engine}")
+        
+        tz = df['timestamp'].dt.tz
+        self.equity_curve.reserve(
+            len(df) - min(warmup_bars, len(df)), tz=str(tz) if tz is not None else None
+        )
+        
+        if self.profiler is not None:
+            self._instrument()
+        with self._stage('backtest'):
+            engines[engine](df, warmup_bars)
+    
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+    
+    def _stage(self, name):
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+    
+    def _instrument(self):
+        """캔들 단위 단계를 시간 측정 래퍼로 교체 (엔진이 메서드를 꺼내 쓰기 전에 호출)
+        
+        엔진마다 같은 이름으로 모이도록 analyze_candle은 시그널 생성만,
+        update_levels는 지지/저항 갱신만 잰다.
+        """
+        profiler = self.profiler
+        profiler.instrument(self, 'apply_funding_fee')
+        profiler.instrument(self, '_apply_funding_event', 'apply_funding_fee')
+        profiler.instrument(self, '_check_exits', 'check_positions')
+        profiler.instrument(self, 'process_signals')
+        profiler.instrument(self.sr_tracker, 'update_levels_from_prices', 'update_levels')
+        profiler.instrument(self.sr_tracker, 'update_levels_batch', 'update_levels')
+        profiler.instrument(self.strategy, 'generate_signals', 'analyze_candle')
+    
+    def _run_iterrows_engine(self, df, warmup_bars=0):
+        """행마다 Series를 만들어 처리하는 기준 엔진"""
+        for n, (i, row) in enumerate(df.iterrows()):
+            if n < warmup_bars:
+                self.sr_tracker.update_levels(row)
+                continue
+            
+            # 잔고 및 평가 자산 기록
+            self.equity_curve.append(
+                row['timestamp'].value, self.balance, self.mark_to_market(float(row['close']))
+            )
             
             # 펀딩비 적용
             self.apply_funding_fee(row)
@@ -263,107 +429,251 @@ class Backtester:
             self.process_signals(row, signals)
             
             if i % 1000 == 0:
-                print(f"Processed {i} candles...")
-        
-        print("\nBacktest completed.")
-        return self.calculate_statistics()
+                self._log(f"Processed {i} candles...")
     
-    def calculate_statistics(self):
-        """백테스팅 결과 통계 계산"""
-        if not self.trades_history:
-            return self._get_empty_stats()
-        
-        trades_df = pd.DataFrame(self.trades_history)
-        
-        # 시간 데이터 변환
-        trades_df['entry_time'] = pd.to_datetime(trades_df['entry_time'])
-        trades_df['exit_time'] = pd.to_datetime(trades_df['exit_time'])
-        trades_df['date'] = trades_df['exit_time'].dt.date
-        
-        # 일별 수익률 계산
-        daily_returns = trades_df.groupby('date')['profit'].sum() / self.initial_balance
-        
-        # 샤프 비율 계산
-        risk_free_rate = 0.02  # 2% 연간 무위험 수익률
-        daily_rf_rate = (1 + risk_free_rate) ** (1/252) - 1
-        excess_returns = daily_returns - daily_rf_rate
-        sharpe_ratio = np.sqrt(252) * (excess_returns.mean() / excess_returns.std()) if len(excess_returns) > 1 else 0
-        
-        # 거래 통계
-        total_trades = len(trades_df)
-        profitable_trades = len(trades_df[trades_df['profit'] > 0])
-        
-        # 비용 분석
-        total_entry_fees = trades_df['entry_fee'].sum()
-        total_exit_fees = trades_df['exit_fee'].sum()
-        total_funding_fees = trades_df['total_funding_fees'].sum()
-        total_fees = total_entry_fees + total_exit_fees + total_funding_fees
-        
-        stats = {
-            'initial_balance': self.initial_balance,
-            'final_balance': self.balance,
-            'total_return': ((self.balance - self.initial_balance) / self.initial_balance) * 100,
-            'total_trades': total_trades,
-            'profitable_trades': profitable_trades,
-            'win_rate': (profitable_trades / total_trades) * 100 if total_trades > 0 else 0,
-            'average_profit': trades_df['profit'].mean(),
-            'max_profit': trades_df['profit'].max(),
-            'max_loss': trades_df['profit'].min(),
-            'average_holding_time': trades_df['holding_time'].mean(),
-            'profit_factor': abs(trades_df[trades_df['profit'] > 0]['profit'].sum() / 
-                               trades_df[trades_df['profit'] < 0]['profit'].sum()) 
-                               if len(trades_df[trades_df['profit'] < 0]) > 0 else float('inf'),
-            'max_drawdown': self._calculate_max_drawdown(trades_df),
-            'win_loss_ratio': (trades_df[trades_df['profit'] > 0]['profit'].mean() / 
-                              abs(trades_df[trades_df['profit'] < 0]['profit'].mean()))
-                              if len(trades_df[trades_df['profit'] < 0]) > 0 else float('inf'),
-            'sharpe_ratio': sharpe_ratio,
-            'annualized_return': ((1 + daily_returns.mean()) ** 252 - 1) * 100,
-            'annualized_volatility': daily_returns.std() * np.sqrt(252) * 100,
-            'total_fees': total_fees,
-            'total_entry_fees': total_entry_fees,
-            'total_exit_fees': total_exit_fees,
-            'total_funding_fees': total_funding_fees,
-            'fees_to_profit_ratio': (total_fees / trades_df['profit'].sum()) * 100 if trades_df['profit'].sum() != 0 else float('inf')
-        }
+    def _run_array_engine(self, df, warmup_bars=0):
+        """배열 기반 엔진: 컬럼을 한 번만 추출하고 int64 ns 타임스탬프로 순회
+        
+        지지/저항은 update_levels_batch로 구간 전체를 한 번에 갱신하고 (봉별로는
+        이중 천장/바닥 판정에 쓰는 값만 받음), 슬리피지 난수는 블록 단위로 뽑고,
+        잔고 기록은 모았다가 구간 끝에 한 번에 넣는다.
+        """
+        n = len(df)
+        tz = df['timestamp'].dt.tz  # Timestamp는 청산/시그널 봉에서만 만든다
+        timestamp_array = df['timestamp'].dt.as_unit('ns').astype('int64').to_numpy()
+        timestamps_ns = timestamp_array.tolist()
+        open_array = df['open'].to_numpy(dtype=np.float64)
+        high_array = df['high'].to_numpy(dtype=np.float64)
+        low_array = df['low'].to_numpy(dtype=np.float64)
+        close_array = df['close'].to_numpy(dtype=np.float64)
+        opens, highs, lows, closes = (a.tolist() for a in (open_array, high_array, low_array, close_array))
+        trends = df['trend'].tolist()
+        
+        # 캔들 패턴은 전체 배열에 대해 한 번에 계산
+        hammers = is_hammer_batch(open_array, high_array, low_array, close_array, 'down').tolist()
+        shooting_stars = is_shooting_star_batch(open_array, high_array, low_array, close_array, 'up').tolist()
+        
+        # 지지/저항 상태는 잔고나 포지션에 의존하지 않으므로 워밍업 포함 전체 구간을 먼저 갱신
+        previous_resistance, previous_support = self.sr_tracker.update_levels_batch(
+            high_array, low_array, timestamps_ns
+        )
+        double_tops, double_bottoms = (
+            mask.tolist() for mask in self.strategy.double_patterns_batch(
+                high_array, low_array, previous_resistance, previous_support
+            )
+        )
         
-        return stats
+        # 펀딩 시점은 전체 구간에 대해 한 번만 계산
+        warmup_bars = min(warmup_bars, n)
+        funding_times_ns, funding_bars, funding_rates = self.funding_schedule(timestamp_array, warmup_bars)
+        funding_events = list(zip(funding_bars.tolist(), funding_times_ns.tolist(), funding_rates.tolist()))
+        funding_events.append((n, None, None))  # 종료 표시
+        funding_ptr = 0
+        next_funding_bar = funding_events[0][0]
+        
+        generate_signals = self.strategy.generate_signals
+        book = self.book
+        unrealized_pnl = book.unrealized_pnl
+        balances, equities = [], []
+        
+        # 이 범위 안의 가격에서는 어떤 슬리피지로도 TP/SL에 닿지 않음 (포지션이 바뀔 때만 다시 계산)
+        max_slippage = self.avg_slippage * 2
+        quiet_low, quiet_high = book.quiet_range(max_slippage)
+        
+        draws = self._slippage_draws = UniformBuffer(max_slippage)
+        skipped = 0  # 청산 검사를 건너뛴 봉에서 소비할 난수 개수 (다음 실제 추출 전에 넘김)
+        try:
+            for i in range(warmup_bars, n):
+                close = closes[i]
+                
+                # 잔고 및 평가 자산 기록
+                balance = self.balance
+                balances.append(balance)
+                equities.append(balance + unrealized_pnl(close, LEVERAGE) if book.count else balance)
+                
+                # 펀딩비 적용 (미리 계산한 펀딩 봉에서만)
+                while next_funding_bar == i:
+                    _, funding_ns, funding_rate = funding_events[funding_ptr]
+                    self._apply_funding_event(funding_ns, close, funding_rate)
+                    funding_ptr += 1
+                    next_funding_bar = funding_events[funding_ptr][0]
+                
+                # 포지션 체크 (TP/SL에 닿을 수 없는 가격이면 난수만 소비)
+                if book.count:
+                    if quiet_low < close < quiet_high:
+                        skipped += book.count
+                    else:
+                        draws.skip(skipped)
+                        skipped = 0
+                        self._check_exits(close, pd.Timestamp(timestamps_ns[i], tz=tz))
+                        quiet_low, quiet_high = book.quiet_range(max_slippage)
+                
+                # 새로운 시그널 분석 (해머/슈팅스타가 없는 봉에서는 시그널이 나오지 않음)
+                if hammers[i] or shooting_stars[i]:
+                    candle = {
+                        'timestamp': pd.Timestamp(timestamps_ns[i], tz=tz),
+                        'open': opens[i],
+                        'high': highs[i],
+                        'low': lows[i],
+                        'close': close
+                    }
+                    signals = generate_signals(
+                        candle, trends[i],
+                        hammer=hammers[i], shooting_star=shooting_stars[i],
+                        double_top=double_tops[i], double_bottom=double_bottoms[i]
+                    )
+                    
+                    # 시그널 처리
+                    if signals:
+                        draws.skip(skipped)
+                        skipped = 0
+                        self.process_signals(candle, signals)
+                        quiet_low, quiet_high = book.quiet_range(max_slippage)
+                
+                if i % 1000 == 0:
+                    self._log(f"Processed {i} candles...")
+        finally:
+            # 전역 난수 상태를 봉마다 뽑았을 때와 같은 위치로 되돌림
+            draws.skip(skipped)
+            draws.close()
+            self._slippage_draws = None
+            self.equity_curve.extend(
+                timestamp_array[warmup_bars:warmup_bars + len(balances)], balances, equities
+            )
     
-    def _calculate_max_drawdown(self, trades_df):
-        """최대 낙폭 계산"""
-        if trades_df.empty:
-            return 0
+    def _run_event_engine(self, df, warmup_bars=0, chunk_bars=1024):
+        """이벤트 기반 엔진: 시그널 후보 봉과 TP/SL 도달 봉 사이를 건너뛴다
+        
+        시그널은 해머/슈팅스타 봉에서만 나올 수 있으므로 후보 봉을 미리 구하고,
+        포지션이 있는 구간은 슬리피지 난수를 블록 단위로 뽑아 첫 TP/SL 도달 봉을
+        벡터화 검색한다. 건너뛴 봉의 난수 소비, 펀딩비, 잔고 기록은 그대로
+        재현하므로 array 엔진과 같은 결과가 나온다.
+        """
+        n = len(df)
+        warmup_bars = min(warmup_bars, n)
+        timestamps = df['timestamp'].array
+        timestamps_ns = df['timestamp'].dt.as_unit('ns').astype('int64').to_numpy()
+        opens = df['open'].to_numpy(dtype=np.float64)
+        highs = df['high'].to_numpy(dtype=np.float64)
+        lows = df['low'].to_numpy(dtype=np.float64)
+        closes = df['close'].to_numpy(dtype=np.float64)
+        trends = df['trend'].to_numpy()
+        hammers = is_hammer_batch(opens, highs, lows, closes, 'down')
+        shooting_stars = is_shooting_star_batch(opens, highs, lows, closes, 'up')
+        
+        # 시그널 후보 봉 (해머 또는 슈팅스타가 없으면 어떤 패턴도 나오지 않음)
+        candidates = np.flatnonzero(hammers | shooting_stars)
+        candidates = candidates[candidates >= warmup_bars]
+        
+        # 지지/저항 상태는 잔고나 포지션에 의존하지 않으므로 전체 구간을 먼저 갱신
+        previous_resistance, previous_support = self.sr_tracker.update_levels_batch(
+            highs, lows, timestamps_ns.tolist()
+        )
+        double_tops, double_bottoms = self.strategy.double_patterns_batch(
+            highs, lows, previous_resistance, previous_support
+        )
+        
+        funding_times_ns, funding_bars, funding_rates = self.funding_schedule(timestamps_ns, warmup_bars)
+        funding_ptr = 0
+        
+        def charge_funding_until(end):
+            # end 이전 봉들의 펀딩비 부과, 잔고 기록은 봉 시작 시점 기준
+            nonlocal funding_ptr
+            while funding_ptr < len(funding_bars) and funding_bars[funding_ptr] < end:
+                self._apply_funding_event(
+                    int(funding_times_ns[funding_ptr]),
+                    float(closes[funding_bars[funding_ptr]]),
+                    float(funding_rates[funding_ptr])
+                )
+                funding_ptr += 1
+        
+        def record_bars(start, end):
+            # 구간 전체의 잔고와 평가 자산을 한 번에 기록
+            if end <= start:
+                return
+            equity = self.balance
+            if self.book.count:
+                equity = self.balance + self.book.unrealized_pnl(closes[start:end, None], LEVERAGE)
+            self.equity_curve.extend(timestamps_ns[start:end], self.balance, equity)
         
-        cumulative_returns = (trades_df['profit'] / self.initial_balance).cumsum()
-        rolling_max = cumulative_returns.expanding().max()
-        drawdowns = cumulative_returns - rolling_max
-        return abs(drawdowns.min()) * 100
+        def skip_bars(start, end):
+            # 이벤트 없는 구간: 잔고 기록과 펀딩비만 처리
+            segment = start
+            while funding_ptr < len(funding_bars) and funding_bars[funding_ptr] < end:
+                bar = int(funding_bars[funding_ptr])
+                record_bars(segment, bar + 1)
+                charge_funding_until(bar + 1)
+                segment = bar + 1
+            record_bars(max(segment, start), end)
+        
+        def find_exit_bar(start, limit):
+            # 열린 포지션의 첫 TP/SL 도달 봉 검색; 그 전까지의 난수 소비를 재현
+            m = self.book.count
+            position = start
+            while position < limit:
+                block = min(chunk_bars, limit - position)
+                state = np.random.get_state()
+                slippage = np.random.uniform(0, self.avg_slippage * 2, (block, m))
+                tp_hit, sl_hit = self.book.exit_hits(closes[position:position + block, None], slippage)
+                hit_rows = np.flatnonzero((tp_hit | sl_hit).any(axis=1))
+                if len(hit_rows):
+                    skipped = int(hit_rows[0])
+                    np.random.set_state(state)
+                    if skipped:
+                        np.random.uniform(0, self.avg_slippage * 2, skipped * m)
+                    return position + skipped
+                position += block
+            return limit
+        
+        if self.profiler is not None:
+            find_exit_bar = self.profiler.wrap('check_positions', find_exit_bar)
+        
+        i = warmup_bars
+        candidate_ptr = 0
+        while i < n:
+            next_candidate = int(candidates[candidate_ptr]) if candidate_ptr < len(candidates) else n
+            if self.book.count:
+                event = find_exit_bar(i, next_candidate)
+            else:
+                event = next_candidate
+            
+            skip_bars(i, event)
+            if event >= n:
+                break
+            
+            # 이벤트 봉은 array 엔진과 같은 순서로 전부 처리
+            self.equity_curve.append(
+                timestamps_ns[event], self.balance, self.mark_to_market(float(closes[event]))
+            )
+            charge_funding_until(event + 1)
+            
+            if self.book.count:
+                self._check_exits(float(closes[event]), timestamps[event])
+            
+            if event == next_candidate:
+                candidate_ptr += 1
+                candle = {
+                    'timestamp': timestamps[event],
+                    'open': float(opens[event]),
+                    'high': float(highs[event]),
+                    'low': float(lows[event]),
+                    'close': float(closes[event])
+                }
+                signals = self.strategy.generate_signals(
+                    candle, trends[event],
+                    hammer=bool(hammers[event]), shooting_star=bool(shooting_stars[event]),
+                    double_top=bool(double_tops[event]), double_bottom=bool(double_bottoms[event])
+                )
+                if signals:
+                    self.process_signals(candle, signals)
+            
+            i = event + 1
+        
+        self._log(f"Processed {n} candles ({len(candidates)} signal candidates)")
     
-    def _get_empty_stats(self):
-        """거래가 없을 때의 빈 통계"""
-        return {
-            'initial_balance': self.initial_balance,
-            'final_balance': self.balance,
-            'total_return': 0,
-            'total_trades': 0,
-            'profitable_trades': 0,
-            'win_rate': 0,
-            'average_profit': 0,
-            'max_profit': 0,
-            'max_loss': 0,
-            'average_holding_time': 0,
-            'profit_factor': 0,
-            'max_drawdown': 0,
-            'win_loss_ratio': 0,
-            'sharpe_ratio': 0,
-            'annualized_return': 0,
-            'annualized_volatility': 0,
-            'total_fees': 0,
-            'total_entry_fees': 0,
-            'total_exit_fees': 0,
-            'total_funding_fees': 0,
-            'fees_to_profit_ratio': 0
-        }
+    def calculate_statistics(self):
+        """백테스팅 결과 통계 (청산 시점마다 누적한 값에서 O(1)로 읽음)"""
+        return self.stats.snapshot(self.balance)
 
 def print_comparison(metric, in_sample_value, out_sample_value, format_str='.2f'):
     """인샘플과 아웃샘플 결과 비교 출력"""
@@ -373,25 +683,31 @@ def print_comparison(metric, in_sample_value, out_sample_value, format_str='.2f'
 
 def main():
     # 백테스터 초기화
-    backtester = Backtester(initial_balance=10000)
+    backtester = Backtester(initial_balance=10000, profile=PROFILE_STAGES)
     
     # 인샘플 백테스트 실행
     print("\nRunning In-Sample Backtest:")
     print("==========================")
     in_sample_file = f"{SYMBOL}_{TIMEFRAME}_{IN_SAMPLE_START.strftime('%Y%m%d')}_{IN_SAMPLE_END.strftime('%Y%m%d')}_UTC_in_sample.csv"
     in_sample_stats = backtester.run_backtest(in_sample_file)
+    if backtester.profiler is not None:
+        print(backtester.profiler.report())
+        backtester.profiler.to_json('profile_in_sample.json')
     
     # 인샘플 결과 저장
     in_sample_backtester = backtester
     
     # 아웃샘플 테스트를 위한 초기화
-    backtester = Backtester(initial_balance=10000)
+    backtester = Backtester(initial_balance=10000, profile=PROFILE_STAGES)
     
     # 아웃샘플 백테스트 실행
     print("\nRunning Out-of-Sample Backtest:")
     print("==============================")
     out_sample_file = f"{SYMBOL}_{TIMEFRAME}_{OUT_OF_SAMPLE_START.strftime('%Y%m%d')}_{OUT_OF_SAMPLE_END.strftime('%Y%m%d')}_UTC_out_of_sample.csv"
     out_sample_stats = backtester.run_backtest(out_sample_file)
+    if backtester.profiler is not None:
+        print(backtester.profiler.report())
+        backtester.profiler.to_json('profile_out_of_sample.json')
     
     # 아웃샘플 결과 저장
     out_sample_backtester = backtester
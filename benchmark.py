@@ -0,0 +1,239 @@
+# benchmark.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import config
+from backtest import Backtester
+from candle_store import load_candles, load_columns
+from indicators import (
+    SortedSupportResistanceTracker, SupportResistanceTracker,
+    add_indicators, calculate_bollinger_bands
+)
+from patterns import (
+    is_doji, is_doji_batch, is_hammer, is_hammer_batch,
+    is_shooting_star, is_shooting_star_batch
+)
+from synthetic_data import CSV_COLUMNS, SyntheticMarket, format_csv_rows
+
+BARS_PER_DAY = 288  # 5m bars
+SIZES = {'1m': 31 * BARS_PER_DAY, '1y': 365 * BARS_PER_DAY, '10y': 3650 * BARS_PER_DAY}
+DEFAULT_SIZES = ('1m', '1y')
+DEQUE_MAX_LENS = (50, 100, 500)
+BASELINE_FILE = 'benchmark_baseline.json'
+REGRESSION_THRESHOLD = 0.2  # Fail when throughput drops more than 20% below baseline
+
+def tile_candles(df, n_bars):
+    """n_bars candles made by repeating df end to end.
+    
+    Each repeat is rescaled so its first open continues from the previous
+    close and timestamps keep the original bar spacing, so the series has
+    realistic bar shapes without jumps at the seams.
+    """
+    step = df['timestamp'].iloc[1] - df['timestamp'].iloc[0]
+    prices = df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    
+    repeats = -(-n_bars // len(df))
+    growth = prices[-1, 3] / prices[0, 0]  # Close of one repeat over its first open
+    scale = np.repeat(growth ** np.arange(repeats), len(df))[:n_bars, None]
+    tiled = np.tile(prices, (repeats, 1))[:n_bars] * scale
+    
+    return pd.DataFrame({
+        'timestamp': df['timestamp'].iloc[0] + step * np.arange(n_bars),
+        'open': tiled[:, 0],
+        'high': tiled[:, 1],
+        'low': tiled[:, 2],
+        'close': tiled[:, 3],
+        'volume': np.tile(volume, repeats)[:n_bars]
+    })
+
+def _candle_dicts(df):
+    """Candle dicts built lazily, so long runs don't hold a million dicts at once."""
+    columns = [df[c].tolist() for c in ('open', 'high', 'low', 'close')]
+    for timestamp, o, h, l, c in zip(df['timestamp'], *columns):
+        yield {'timestamp': timestamp, 'open': o, 'high': h, 'low': l, 'close': c}
+
+def measure(setup, func, min_time=0.5, max_repeats=5, memory=True):
+    """Best wall time of func(setup()) over repeats, plus traced peak memory.
+    
+    setup runs outside the timed region. Repeats stop once min_time has been
+    spent; peak memory comes from one extra run under tracemalloc, since
+    tracing slows the code it measures.
+    """
+    best, spent, repeats = float('inf'), 0.0, 0
+    while repeats < max_repeats and (repeats == 0 or spent < min_time):
+        state = setup()
+        start = time.perf_counter()
+        func(state)
+        elapsed = time.perf_counter() - start
+        best, spent, repeats = min(best, elapsed), spent + elapsed, repeats + 1
+    
+    peak_mb = None
+    if memory:
+        state = setup()
+        tracemalloc.start()
+        try:
+            func(state)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return {'seconds': best, 'repeats': repeats, 'peak_mb': peak_mb}
+
+def benchmark_cases(df, csv_filename, deque_max_lens=DEQUE_MAX_LENS):
+    """(name, setup, func) for every benchmark on one data size."""
+    opens, highs, lows, closes = (df[c].to_numpy(dtype=np.float64) for c in ('open', 'high', 'low', 'close'))
+    
+    def run_trackers(tracker):
+        for candle in _candle_dicts(df):
+            tracker.update_levels(candle)
+    
+    def run_patterns(_):
+        for candle in _candle_dicts(df):
+            is_hammer(candle, 'down')
+            is_shooting_star(candle, 'up')
+            is_doji(candle)
+    
+    def run_batch_patterns(_):
+        is_hammer_batch(opens, highs, lows, closes, 'down')
+        is_shooting_star_batch(opens, highs, lows, closes, 'up')
+        is_doji_batch(opens, highs, lows, closes)
+    
+    def backtest_setup():
+        np.random.seed(0)
+        return Backtester(verbose=False)
+    
+    cases = [
+        ('calculate_bollinger_bands', lambda: df,
+         lambda data: calculate_bollinger_bands(data, 'close', config.CLOSE_BB_PERIOD, config.CLOSE_BB_STD)),
+        ('add_indicators', lambda: df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].copy(),
+         add_indicators),
+        ('patterns', lambda: None, run_patterns),
+        ('patterns_batch', lambda: None, run_batch_patterns),
+    ]
+    for tracker_class in (SupportResistanceTracker, SortedSupportResistanceTracker):
+        for max_len in deque_max_lens:
+            cases.append((
+                f'{tracker_class.__name__}.update_levels(max_len={max_len})',
+                lambda tracker_class=tracker_class, max_len=max_len: tracker_class(max_len=max_len),
+                run_trackers
+            ))
+    for engine in ('array', 'event'):
+        cases.append((
+            f'run_backtest(engine={engine})', backtest_setup,
+            lambda backtester, engine=engine: backtester.run_backtest(csv_filename, engine=engine)
+        ))
+    return cases
+
+def run_benchmarks(csv_filename=None, sizes=DEFAULT_SIZES, only=None, memory=True, verbose=True, seed=0):
+    """Run every benchmark at each size.
+    
+    Candles come from SyntheticMarket(seed), or are tiled from csv_filename
+    when given. Returns one dict per (benchmark, size) with bars/second
+    throughput and peak traced memory.
+    """
+    source = load_candles(csv_filename) if csv_filename is not None else None
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            n_bars = SIZES[size]
+            if source is not None:
+                df = tile_candles(source, n_bars)
+            else:
+                df = SyntheticMarket(seed=seed).next_chunk(n_bars)
+            sized_csv = os.path.join(tmp, f'{config.SYMBOL}_{config.TIMEFRAME}_{size}.csv')
+            with open(sized_csv, 'w') as f:
+                f.write(','.join(CSV_COLUMNS) + '\n')
+                f.write(format_csv_rows(df))
+            load_columns(sized_csv)  # Cache build is not part of run_backtest's steady state
+            
+            for name, setup, func in benchmark_cases(df, sized_csv):
+                if only and only not in name:
+                    continue
+                result = {'name': name, 'size': size, 'bars': n_bars, **measure(setup, func, memory=memory)}
+                result['bars_per_second'] = n_bars / result['seconds']
+                results.append(result)
+                if verbose:
+                    print(format_result(result), flush=True)
+    return results
+
+def result_key(result):
+    return f"{result['name']}[{result['size']}]"
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(results, path=BASELINE_FILE):
+    """Store results as the new baseline, keeping entries for benchmarks not rerun."""
+    baseline = load_baseline(path)
+    baseline.update({
+        result_key(r): {'bars_per_second': r['bars_per_second'], 'peak_mb': r['peak_mb']}
+        for r in results
+    })
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Results whose throughput fell more than threshold below their baseline."""
+    regressions = []
+    for result in results:
+        reference = baseline.get(result_key(result))
+        if reference is None:
+            continue
+        change = result['bars_per_second'] / reference['bars_per_second'] - 1
+        if change < -threshold:
+            regressions.append({**result, 'baseline_bars_per_second': reference['bars_per_second'],
+                                'change': change})
+    return regressions
+
+def missing_baselines(results, baseline):
+    """Keys of results that have no baseline entry to compare against."""
+    return [result_key(r) for r in results if result_key(r) not in baseline]
+
+def format_result(result):
+    memory = f"{result['peak_mb']:9.1f} MB" if result['peak_mb'] is not None else ''
+    return (f"{result_key(result):62} {result['seconds']:9.4f}s "
+            f"{result['bars_per_second']:14,.0f} bars/s{memory}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time indicators, patterns, level tracking and backtests.")
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help=f"comma-separated, from {list(SIZES)}")
+    parser.add_argument('--only', help="run benchmarks whose name contains this")
+    parser.add_argument('--csv', help="tile candles from this CSV instead of generating synthetic ones")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    args = parser.parse_args()
+    
+    results = run_benchmarks(args.csv, args.sizes.split(','), only=args.only, memory=not args.no_memory)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    
+    # A benchmark without a baseline cannot be checked, so it fails the run too
+    baseline = load_baseline(args.baseline)
+    missing = missing_baselines(results, baseline)
+    if not baseline:
+        print(f"WARNING: no baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr)
+    for key in missing:
+        print(f"MISSING BASELINE {key}", file=sys.stderr)
+    
+    regressions = find_regressions(results, baseline, args.threshold)
+    for r in regressions:
+        print(f"REGRESSION {result_key(r)}: {r['bars_per_second']:,.0f} bars/s vs baseline "
+              f"{r['baseline_bars_per_second']:,.0f} ({r['change']:+.0%})")
+    if regressions or missing:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
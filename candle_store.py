@@ -0,0 +1,189 @@
+# candle_store.py
+import json
+import os
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+META_FILENAME = "meta.json"
+STREAM_CHUNK_BARS = 100_000  # Rows per chunk when building the cache or streaming candles
+
+def cache_dir_for(csv_filename):
+    """Directory holding the binary columnar cache for a CSV file."""
+    return f"{csv_filename}{CACHE_SUFFIX}"
+
+def _source_signature(csv_filename):
+    stat = os.stat(csv_filename)
+    return {'source_mtime_ns': stat.st_mtime_ns, 'source_size': stat.st_size}
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_cache_valid(csv_filename):
+    """Check that the cache exists and was built from the current CSV (mtime and size)."""
+    meta = _read_meta(cache_dir_for(csv_filename))
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False
+    
+    signature = _source_signature(csv_filename)
+    return (
+        meta.get('source_mtime_ns') == signature['source_mtime_ns'] and
+        meta.get('source_size') == signature['source_size']
+    )
+
+def _atomic_save(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+def _stream_columns(csv_filename, cache_dir, chunk_bars):
+    """Parse the CSV chunk by chunk into raw per-column files; returns (columns, tz, raw paths)."""
+    columns, tz, raw, files = None, None, {}, {}
+    try:
+        for chunk in pd.read_csv(csv_filename, chunksize=chunk_bars):
+            timestamps = pd.to_datetime(chunk['timestamp'])
+            if columns is None:
+                columns = [c for c in chunk.columns if c != 'timestamp']
+                tz = str(timestamps.dt.tz) if timestamps.dt.tz is not None else None
+                for column in ['timestamp'] + columns:
+                    raw[column] = os.path.join(cache_dir, f'{column}.{os.getpid()}.raw')
+                    files[column] = open(raw[column], 'wb')
+            
+            # Epoch nanoseconds (UTC for tz-aware timestamps)
+            files['timestamp'].write(timestamps.dt.as_unit('ns').astype('int64').to_numpy().tobytes())
+            for column in columns:
+                files[column].write(chunk[column].to_numpy(dtype=np.float64).tobytes())
+    except BaseException:
+        for f in files.values():
+            f.close()
+        for path in raw.values():
+            os.remove(path)
+        raise
+    
+    for f in files.values():
+        f.close()
+    return columns, tz, raw
+
+def write_cache(csv_filename, df=None, chunk_bars=STREAM_CHUNK_BARS):
+    """Write int64 epoch-ns timestamps and float64 value columns next to the CSV.
+    
+    Without df the CSV is parsed chunk_bars rows at a time, so building the
+    cache of a file larger than memory stays within a chunk. Column files are
+    written first and meta.json last (each via rename), so a concurrent
+    reader never sees a half-written cache as valid.
+    """
+    signature = _source_signature(csv_filename)
+    cache_dir = cache_dir_for(csv_filename)
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    raw = {}
+    if df is None:
+        columns, tz, raw = _stream_columns(csv_filename, cache_dir, chunk_bars)
+        if columns is None:  # Header only
+            df = pd.read_csv(csv_filename)
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+    if df is not None:
+        timestamps = df['timestamp']
+        tz = str(timestamps.dt.tz) if timestamps.dt.tz is not None else None
+        columns = [c for c in df.columns if c != 'timestamp']
+        arrays = {'timestamp': timestamps.dt.as_unit('ns').astype('int64').to_numpy()}
+        arrays.update({column: df[column].to_numpy(dtype=np.float64) for column in columns})
+    else:
+        arrays = {
+            column: np.memmap(path, dtype=np.int64 if column == 'timestamp' else np.float64, mode='r')
+            for column, path in raw.items()
+        }
+    
+    for column, values in arrays.items():
+        _atomic_save(os.path.join(cache_dir, f'{column}.npy'), values)
+    rows = len(arrays['timestamp'])
+    del arrays
+    for path in raw.values():
+        os.remove(path)
+    
+    meta = {
+        'version': CACHE_VERSION,
+        **signature,
+        'rows': rows,
+        'columns': ['timestamp'] + columns,
+        'tz': tz
+    }
+    tmp_meta = os.path.join(cache_dir, f"{META_FILENAME}.{os.getpid()}.tmp")
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(cache_dir, META_FILENAME))
+    
+    return meta
+
+def load_columns(csv_filename, rebuild=False):
+    """Return ({column: read-only memmap array}, meta), building the cache if stale.
+    
+    Timestamps are int64 epoch nanoseconds (UTC); every other column is float64.
+    Processes that map the same cache share its pages through the OS cache.
+    """
+    if rebuild or not is_cache_valid(csv_filename):
+        write_cache(csv_filename)
+    
+    cache_dir = cache_dir_for(csv_filename)
+    meta = _read_meta(cache_dir)
+    columns = {
+        column: np.load(os.path.join(cache_dir, f'{column}.npy'), mmap_mode='r')
+        for column in meta['columns']
+    }
+    return columns, meta
+
+def columns_to_frame(columns, tz='UTC'):
+    """Build a candle DataFrame from cached columns without copying values."""
+    timestamps = pd.DatetimeIndex(np.asarray(columns['timestamp']).view('datetime64[ns]'))
+    if tz is not None:
+        timestamps = timestamps.tz_localize('UTC').tz_convert(tz)
+    
+    data = {'timestamp': timestamps}
+    data.update({c: v for c, v in columns.items() if c != 'timestamp'})
+    return pd.DataFrame(data, copy=False)
+
+def load_candles(csv_filename, use_cache=True):
+    """Load a candle CSV, going through the memory-mapped cache when possible.
+    
+    Falls back to plain CSV parsing when the cache is disabled or the CSV has
+    non-numeric columns that the columnar format can't hold.
+    """
+    if use_cache:
+        try:
+            columns, meta = load_columns(csv_filename)
+        except (ValueError, TypeError, OSError):
+            pass
+        else:
+            return columns_to_frame(columns, meta['tz'])
+    
+    df = pd.read_csv(csv_filename)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+def iter_candle_chunks(csv_filename, chunk_bars=STREAM_CHUNK_BARS, use_cache=True):
+    """Yield a candle CSV as DataFrames of at most chunk_bars rows, in order.
+    
+    With use_cache the chunks are slices of the memory-mapped cache (built
+    chunk by chunk if stale), so only the current chunk's pages need to be
+    resident; otherwise, or if the CSV can't be cached, the CSV itself is
+    parsed chunk by chunk.
+    """
+    if use_cache:
+        try:
+            columns, meta = load_columns(csv_filename)
+        except (ValueError, TypeError, OSError):
+            pass
+        else:
+            for lo in range(0, meta['rows'], chunk_bars):
+                yield columns_to_frame({c: v[lo:lo + chunk_bars] for c, v in columns.items()}, meta['tz'])
+            return
+    
+    for df in pd.read_csv(csv_filename, chunksize=chunk_bars):
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        yield df
@@ -0,0 +1,159 @@
+# chart_tiles.py
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import mplfinance as mpf
+from candle_store import cache_dir_for, columns_to_frame, load_columns
+from config import SYMBOL
+from data_collector import chart_style, timeframe_to_ms
+from resample import OHLCV, base_step_ns, load_resampled
+
+TILE_VERSION = 1
+ZOOM_LEVELS = ('5m', '1h', '1d')
+TILE_BARS = 288  # Candles per tile at every level: a day of 5m, 12 days of 1h, ~10 months of 1d
+TILE_SIZE = (12, 6)  # Inches
+TILE_DPI = 100
+INDEX_FILENAME = 'index.json'
+
+def tiles_dir_for(csv_filename):
+    return os.path.join(cache_dir_for(csv_filename), 'tiles')
+
+def level_columns(csv_filename, timeframe):
+    """({column: array}, tz) candles of one zoom level.
+    
+    The base timeframe comes straight from the candle cache; coarser levels
+    from resample's incremental cache.
+    """
+    base, meta = load_columns(csv_filename)
+    if timeframe_to_ms(timeframe) * 1_000_000 == base_step_ns(base['timestamp']):
+        return base, meta['tz']
+    columns, meta = load_resampled(csv_filename, timeframe)
+    return columns, meta['tz']
+
+def tile_slices(timestamps_ns, timeframe, tile_bars=TILE_BARS):
+    """(tile start ns, first row, end row) of each epoch-aligned tile window holding candles."""
+    timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+    if not len(timestamps_ns):
+        return []
+    window = timeframe_to_ms(timeframe) * 1_000_000 * tile_bars
+    tiles = timestamps_ns // window
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(tiles)) + 1])
+    ends = np.append(starts[1:], len(tiles))
+    return list(zip((tiles[starts] * window).tolist(), starts.tolist(), ends.tolist()))
+
+def _tile_digest(columns, start, end, settings):
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode())
+    for column in ('timestamp', *OHLCV):
+        digest.update(np.ascontiguousarray(columns[column][start:end]).tobytes())
+    return digest.hexdigest()
+
+def _init_render_worker():
+    plt.switch_backend('Agg')
+
+def _render_tile(job):
+    path, columns, tz, title, figsize, dpi = job
+    df = columns_to_frame(columns, tz).set_index('timestamp')
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    mpf.plot(
+        df, type='candle', volume=True, title=title, style=chart_style(),
+        figsize=figsize, panel_ratios=(3, 1), tight_layout=True,
+        savefig=dict(fname=tmp_path, dpi=dpi)
+    )
+    plt.close('all')
+    os.replace(tmp_path, path)
+    return path
+
+def _read_index(index_path):
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def build_tiles(csv_filename, levels=ZOOM_LEVELS, output_dir=None, tile_bars=TILE_BARS,
+                figsize=TILE_SIZE, dpi=TILE_DPI, processes=None, symbol=SYMBOL, verbose=True):
+    """Render missing or changed candlestick tiles for every zoom level; returns the index.
+    
+    Each level's candles are cut into epoch-aligned windows of tile_bars
+    candles, one fixed-size PNG per window under output_dir/<level>/
+    (default: the CSV's cache directory). index.json records each tile's
+    path, time range and a hash of its candles, and a tile is only rendered
+    again when that hash changes, so after new bars are appended only the
+    last tile of each level is redrawn.
+    """
+    output_dir = output_dir or tiles_dir_for(csv_filename)
+    index_path = os.path.join(output_dir, INDEX_FILENAME)
+    old_index = _read_index(index_path)
+    settings = {'version': TILE_VERSION, 'tile_bars': tile_bars, 'figsize': list(figsize), 'dpi': dpi, 'symbol': symbol}
+    
+    index, jobs = {}, []
+    for level in levels:
+        columns, tz = level_columns(csv_filename, level)
+        level_dir = os.path.join(output_dir, level)
+        os.makedirs(level_dir, exist_ok=True)
+        old_tiles = old_index.get(level, {})
+        tiles = index[level] = {}
+        
+        for tile_ns, start, end in tile_slices(columns['timestamp'], level, tile_bars):
+            name = pd.Timestamp(tile_ns, tz='UTC').strftime('%Y%m%dT%H%M')
+            path = os.path.join(level_dir, f'{name}.png')
+            first, last = (pd.Timestamp(int(columns['timestamp'][i]), tz='UTC').tz_convert(tz) for i in (start, end - 1))
+            digest = _tile_digest(columns, start, end, {**settings, 'level': level})
+            tiles[name] = {
+                'path': os.path.relpath(path, output_dir),
+                'first': first.isoformat(),
+                'last': last.isoformat(),
+                'bars': end - start,
+                'digest': digest
+            }
+            if old_tiles.get(name, {}).get('digest') == digest and os.path.exists(path):
+                continue
+            
+            tile_columns = {c: np.array(columns[c][start:end]) for c in ('timestamp', *OHLCV)}
+            title = f"\n{symbol} {level} {first:%Y-%m-%d %H:%M} - {last:%Y-%m-%d %H:%M}"
+            jobs.append((path, tile_columns, tz, title, figsize, dpi))
+        
+        # Windows that no longer hold candles (the source shrank)
+        for name in old_tiles.keys() - tiles.keys():
+            stale = os.path.join(output_dir, old_tiles[name]['path'])
+            if os.path.exists(stale):
+                os.remove(stale)
+    
+    if processes == 1 or len(jobs) <= 1:
+        for job in jobs:
+            _render_tile(job)
+    else:
+        workers = processes or min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as executor:
+            for _ in executor.map(_render_tile, jobs, chunksize=4):
+                pass
+    
+    tmp_index = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_index, index_path)
+    
+    if verbose:
+        total = sum(len(tiles) for tiles in index.values())
+        print(f"{csv_filename}: rendered {len(jobs)} of {total} tiles in {output_dir}")
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Render level-of-detail candlestick chart tiles for candle CSVs.")
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--levels', default=','.join(ZOOM_LEVELS), help="comma-separated zoom timeframes")
+    parser.add_argument('--output', help="tile directory (default: next to the CSV cache)")
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+    
+    for csv_filename in args.csv:
+        output_dir = os.path.join(args.output, os.path.basename(csv_filename)) if args.output else None
+        build_tiles(csv_filename, args.levels.split(','), output_dir, processes=args.processes)
+
+if __name__ == "__main__":
+    main()
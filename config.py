@@ -31,4 +31,14 @@ PRICE_THRESHOLD = 0.002  # 0.2% threshold for price comparison
 
 # Candlestick Pattern Parameters
 BODY_TO_SHADOW_RATIO = 2  # Minimum ratio of shadow to body for hammer/shooting star
-DOJI_THRESHOLD = 0.1  # Maximum body size relative to total range for doji
\ No newline at end of file
+DOJI_THRESHOLD = 0.1  # Maximum body size relative to total range for doji
+
+# Multi-timeframe
+TREND_TIMEFRAME = None  # e.g. "1h" to take the trend from higher-timeframe bars (see resample.py)
+
+# Feature store
+FEATURE_STORE_DIR = None  # e.g. ".feature_store" to cache indicator columns on disk (see feature_store.py)
+FEATURE_STORE_MAX_BYTES = 1 << 30  # Least recently used entries are evicted beyond this size
+
+# Instrumentation
+PROFILE_STAGES = False  # Time each backtest stage (see profiler.py)
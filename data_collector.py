@@ -1,10 +1,15 @@
 # data_collector.py
+import asyncio
+import io
+import os
 import ccxt
+import numpy as np
 import pandas as pd
 import mplfinance as mpf
 import matplotlib.pyplot as plt
 from datetime import datetime, timezone, timedelta
 import time
+from candle_store import load_columns
 from config import (
     SYMBOL, TIMEFRAME,
     IN_SAMPLE_START, IN_SAMPLE_END,
@@ -47,19 +52,305 @@ def fetch_data_in_batches(exchange, symbol, timeframe, start_date, end_date, bat
     
     return all_candles
 
-def fetch_and_save_data(start_date, end_date, period_name=""):
-    """Fetch historical data from Binance and save to CSV."""
-    print(f"Fetching {SYMBOL} data from {start_date} to {end_date} (UTC)")
+def timeframe_to_ms(timeframe):
+    """Convert a ccxt-style timeframe string ('5m', '1h', '1d', ...) to milliseconds."""
+    units = {'s': 1000, 'm': 60 * 1000, 'h': 60 * 60 * 1000, 'd': 24 * 60 * 60 * 1000, 'w': 7 * 24 * 60 * 60 * 1000}
+    return int(timeframe[:-1]) * units[timeframe[-1]]
+
+class RequestBudget:
+    """Request budget shared by concurrent fetches: max in flight plus a minimum spacing."""
     
-    # Initialize Binance client
-    exchange = ccxt.binance({
-        'enableRateLimit': True,
+    def __init__(self, max_concurrency=8, min_interval_ms=0):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval_ms / 1000
+        self._semaphore = None
+        self._lock = None
+        self._next_slot = 0.0
+    
+    async def __aenter__(self):
+        # Created lazily so the budget binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._lock = asyncio.Lock()
+        
+        await self._semaphore.acquire()
+        if self.min_interval > 0:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                now = loop.time()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.min_interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+def split_time_range(start_ms, end_ms, n_parts, step_ms):
+    """Split [start_ms, end_ms) into up to n_parts candle-aligned sub-ranges."""
+    total_bars = max(0, -(-(end_ms - start_ms) // step_ms))
+    n_parts = max(1, min(n_parts, total_bars))
+    bars_per_part = -(-total_bars // n_parts) if total_bars else 0
+    
+    ranges = []
+    part_start = start_ms
+    while part_start < end_ms:
+        part_end = min(end_ms, part_start + bars_per_part * step_ms)
+        ranges.append((part_start, part_end))
+        part_start = part_end
+    return ranges
+
+async def fetch_range_async(client, symbol, timeframe, start_ms, end_ms, budget,
+                            batch_size=1000, max_retries=5):
+    """Fetch [start_ms, end_ms) page by page from an async client with fetch_ohlcv."""
+    step_ms = timeframe_to_ms(timeframe)
+    candles = []
+    since = start_ms
+    retries = 0
+    
+    while since < end_ms:
+        try:
+            async with budget:
+                batch = await client.fetch_ohlcv(
+                    symbol,
+                    timeframe,
+                    since,
+                    limit=min(batch_size, -(-(end_ms - since) // step_ms))
+                )
+        except Exception as e:
+            retries += 1
+            if retries > max_retries:
+                raise
+            print(f"Error fetching batch from {since}: {e}")
+            await asyncio.sleep(budget.min_interval or 1)
+            continue
+        
+        retries = 0
+        if not batch:
+            break
+        
+        candles.extend(c for c in batch if c[0] < end_ms)
+        next_since = max(c[0] for c in batch) + step_ms
+        if next_since <= since:
+            break  # No progress; avoid re-requesting the same page forever
+        since = next_since
+    
+    return candles
+
+def merge_candles(candle_batches, start_ms=None, end_ms=None):
+    """Merge raw OHLCV lists into one list, deduplicated and sorted by timestamp."""
+    merged = {}
+    for batch in candle_batches:
+        for candle in batch:
+            if start_ms is not None and candle[0] < start_ms:
+                continue
+            if end_ms is not None and candle[0] >= end_ms:
+                continue
+            merged[candle[0]] = candle
+    return [merged[ts] for ts in sorted(merged)]
+
+async def fetch_data_concurrently(client, symbol, timeframe, start_date, end_date,
+                                  n_parts=8, max_concurrency=8, min_interval_ms=None,
+                                  batch_size=1000):
+    """Download [start_date, end_date) as independent sub-ranges fetched concurrently.
+    
+    client is anything with an async fetch_ohlcv(symbol, timeframe, since, limit)
+    (a ccxt.async_support exchange, or a stub pointed at a local server). All
+    sub-ranges share one RequestBudget; min_interval_ms defaults to the client's
+    rateLimit when it has one.
+    """
+    if min_interval_ms is None:
+        min_interval_ms = getattr(client, 'rateLimit', 0) or 0
+    budget = RequestBudget(max_concurrency, min_interval_ms)
+    
+    start_ms = int(start_date.timestamp() * 1000)
+    end_ms = int(end_date.timestamp() * 1000)
+    ranges = split_time_range(start_ms, end_ms, n_parts, timeframe_to_ms(timeframe))
+    
+    print(f"Fetching {len(ranges)} sub-ranges concurrently (max {max_concurrency} in flight)")
+    batches = await asyncio.gather(*(
+        fetch_range_async(client, symbol, timeframe, lo, hi, budget, batch_size)
+        for lo, hi in ranges
+    ))
+    
+    return merge_candles(batches, start_ms, end_ms)
+
+async def _fetch_from_binance_async(symbol, timeframe, start_date, end_date, **kwargs):
+    import ccxt.async_support as ccxt_async
+    
+    exchange = ccxt_async.binance({
+        'enableRateLimit': False,  # RequestBudget does the pacing
     })
+    try:
+        kwargs.setdefault('min_interval_ms', exchange.rateLimit)
+        return await fetch_data_concurrently(
+            exchange, symbol, timeframe, start_date, end_date, **kwargs
+        )
+    finally:
+        await exchange.close()
+
+async def fetch_ranges_async(client, symbol, timeframe, ranges, max_concurrency=8,
+                             min_interval_ms=None, batch_size=1000):
+    """Fetch several [start_ms, end_ms) ranges concurrently under one RequestBudget."""
+    if min_interval_ms is None:
+        min_interval_ms = getattr(client, 'rateLimit', 0) or 0
+    budget = RequestBudget(max_concurrency, min_interval_ms)
     
-    # Fetch all data in batches
-    all_candles = fetch_data_in_batches(
-        exchange, SYMBOL, TIMEFRAME, start_date, end_date
-    )
+    batches = await asyncio.gather(*(
+        fetch_range_async(client, symbol, timeframe, lo, hi, budget, batch_size)
+        for lo, hi in ranges
+    ))
+    return merge_candles(batches)
+
+def _fetch_ranges_from_binance(symbol, timeframe, ranges):
+    async def run():
+        import ccxt.async_support as ccxt_async
+        
+        exchange = ccxt_async.binance({'enableRateLimit': False})
+        try:
+            return await fetch_ranges_async(exchange, symbol, timeframe, ranges)
+        finally:
+            await exchange.close()
+    
+    return asyncio.run(run())
+
+def find_missing_ranges(timestamps_ms, start_ms, end_ms, step_ms):
+    """Missing candle intervals in [start_ms, end_ms), as (start_ms, end_ms) ranges.
+    
+    Covers leading and trailing edges as well as interior gaps; timestamps_ms
+    must be sorted.
+    """
+    timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+    timestamps_ms = timestamps_ms[(timestamps_ms >= start_ms) & (timestamps_ms < end_ms)]
+    
+    # Bracket the data with virtual candles one step outside the range
+    bounds = np.concatenate(([start_ms - step_ms], timestamps_ms, [end_ms]))
+    gap_idx = np.flatnonzero(np.diff(bounds) > step_ms)
+    
+    return [
+        (int(bounds[i] + step_ms), int(bounds[i + 1]))
+        for i in gap_idx
+    ]
+
+def _format_rows(candles):
+    """Format raw OHLCV lists exactly like fetch_and_save_data writes them."""
+    df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, lineterminator='\n')
+    return buffer.getvalue().encode()
+
+def _row_offsets(csv_filename):
+    """Byte offset at which each data row (after the header) starts."""
+    data = np.memmap(csv_filename, dtype=np.uint8, mode='r')
+    return np.flatnonzero(data == ord('\n')) + 1
+
+def sync_data(csv_filename, end_date=None, start_date=None, symbol=SYMBOL,
+              timeframe=TIMEFRAME, fetch_ranges=None):
+    """Bring a candle CSV up to date by fetching only what is missing.
+    
+    Finds interior gaps and the trailing edge (and a leading edge if start_date
+    is earlier than the file), fetches only those ranges, and writes them back
+    without rewriting the whole file: candles past the last row are appended,
+    and for interior gaps only the bytes from the first gap onward are
+    rewritten. end_date defaults to the start of the still-open candle.
+    fetch_ranges(ranges) -> list of OHLCV lists can be swapped for a stub.
+    """
+    step_ms = timeframe_to_ms(timeframe)
+    if fetch_ranges is None:
+        def fetch_ranges(ranges):
+            return _fetch_ranges_from_binance(symbol, timeframe, ranges)
+    
+    columns, _ = load_columns(csv_filename)
+    timestamps_ms = np.asarray(columns['timestamp']) // 1_000_000
+    if len(timestamps_ms) == 0:
+        raise ValueError(f"{csv_filename} has no candles to sync from")
+    
+    start_ms = int(start_date.timestamp() * 1000) if start_date else int(timestamps_ms[0])
+    if end_date is None:
+        end_ms = int(time.time() * 1000) // step_ms * step_ms
+    else:
+        end_ms = int(end_date.timestamp() * 1000)
+    
+    missing = find_missing_ranges(timestamps_ms, start_ms, end_ms, step_ms)
+    summary = {'missing_ranges': missing, 'fetched': 0, 'mode': 'up_to_date', 'remaining_gaps': []}
+    if not missing:
+        print(f"{csv_filename} is up to date")
+        return summary
+    
+    print(f"Fetching {len(missing)} missing range(s) for {csv_filename}")
+    new_candles = merge_candles([fetch_ranges(missing)])
+    new_candles = [
+        c for c in new_candles
+        if any(lo <= c[0] < hi for lo, hi in missing)
+    ]
+    summary['fetched'] = len(new_candles)
+    
+    if new_candles:
+        new_ts = np.array([c[0] for c in new_candles], dtype=np.int64)
+        first_row = int(np.searchsorted(timestamps_ms, new_ts[0]))
+        
+        if first_row == len(timestamps_ms):
+            # Only the trailing edge: plain append
+            with open(csv_filename, 'ab') as f:
+                if os.path.getsize(csv_filename) and not _ends_with_newline(csv_filename):
+                    f.write(b'\n')
+                f.write(_format_rows(new_candles))
+            summary['mode'] = 'appended'
+        else:
+            # Patch: keep everything before the first gap, merge the rest by timestamp
+            offsets = _row_offsets(csv_filename)
+            patch_offset = int(offsets[first_row])
+            with open(csv_filename, 'rb') as f:
+                f.seek(patch_offset)
+                existing_lines = f.read().splitlines(keepends=True)
+            if existing_lines and not existing_lines[-1].endswith(b'\n'):
+                existing_lines[-1] += b'\n'
+            new_lines = _format_rows(new_candles).splitlines(keepends=True)
+            
+            # Both sides are sorted, so this is a single linear merge
+            order = np.argsort(
+                np.concatenate((timestamps_ms[first_row:], new_ts)), kind='stable'
+            )
+            lines = existing_lines + new_lines
+            with open(csv_filename, 'r+b') as f:
+                f.seek(patch_offset)
+                f.write(b''.join(lines[i] for i in order))
+                f.truncate()
+            summary['mode'] = 'patched'
+    
+    # Whatever the exchange could not fill stays reported as a gap
+    all_ts = np.union1d(timestamps_ms, [c[0] for c in new_candles]) if new_candles else timestamps_ms
+    summary['remaining_gaps'] = find_missing_ranges(all_ts, start_ms, end_ms, step_ms)
+    print(f"Synced {summary['fetched']} candles ({summary['mode']}); "
+          f"{len(summary['remaining_gaps'])} gap(s) remain")
+    return summary
+
+def _ends_with_newline(filename):
+    with open(filename, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+def fetch_and_save_data(start_date, end_date, period_name="", concurrent=False):
+    """Fetch historical data from Binance and save to CSV."""
+    print(f"Fetching {SYMBOL} data from {start_date} to {end_date} (UTC)")
+    
+    if concurrent:
+        # Fetch sub-ranges concurrently under a shared request budget
+        all_candles = asyncio.run(
+            _fetch_from_binance_async(SYMBOL, TIMEFRAME, start_date, end_date)
+        )
+    else:
+        # Initialize Binance client
+        exchange = ccxt.binance({
+            'enableRateLimit': True,
+        })
+        
+        # Fetch all data in batches
+        all_candles = fetch_data_in_batches(
+            exchange, SYMBOL, TIMEFRAME, start_date, end_date
+        )
     
     # Convert to DataFrame
     df = pd.DataFrame(
@@ -88,13 +379,35 @@ def fetch_and_save_data(start_date, end_date, period_name=""):
     
     return df, filename
 
-def create_chart(df, suffix=""):
-    """Create and save candlestick chart as PNG."""
-    # Set the timestamp as index
-    df_plot = df.copy()
-    df_plot.set_index('timestamp', inplace=True)
+def fetch_and_save_funding_rates(start_date, end_date, symbol=SYMBOL):
+    """Fetch perpetual funding-rate history from Binance and save it for funding.load_funding_rates."""
+    exchange = ccxt.binance({
+        'enableRateLimit': True,
+        'options': {'defaultType': 'future'}
+    })
+    
+    rows = []
+    since = int(start_date.timestamp() * 1000)
+    end_ms = int(end_date.timestamp() * 1000)
+    while since < end_ms:
+        history = exchange.fetch_funding_rate_history(symbol, since, limit=1000)
+        if not history:
+            break
+        rows.extend((entry['timestamp'], entry['fundingRate']) for entry in history)
+        since = history[-1]['timestamp'] + 1
+    
+    df = pd.DataFrame(rows, columns=['timestamp', 'funding_rate'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+    df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp')
+    df = df[(df['timestamp'] >= start_date) & (df['timestamp'] < end_date)]
+    
+    filename = f"{symbol}_funding_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}_UTC.csv"
+    df.to_csv(filename, index=False)
+    print(f"Funding rates saved to {filename} ({len(df)} rows)")
+    return df, filename
 
-    # Create figure with custom style
+def chart_style():
+    """mplfinance style shared by the full chart and the chart tiles."""
     mc = mpf.make_marketcolors(
         up='red',
         down='blue',
@@ -103,7 +416,7 @@ def create_chart(df, suffix=""):
         volume='in'
     )
     
-    s = mpf.make_mpf_style(
+    return mpf.make_mpf_style(
         marketcolors=mc,
         figcolor='white',
         facecolor='white',
@@ -112,6 +425,13 @@ def create_chart(df, suffix=""):
         gridstyle=':',
         rc={'font.size': 10}
     )
+
+def create_chart(df, suffix=""):
+    """Create and save candlestick chart as PNG."""
+    # Set the timestamp as index
+    df_plot = df.copy()
+    df_plot.set_index('timestamp', inplace=True)
+    s = chart_style()
     
     # Set figure size and title
     kwargs = dict(
@@ -148,6 +468,15 @@ def print_data_summary(df):
     print(f"\nExpected number of candles: {int(expected_candles)}")
     print(f"Actual number of candles: {len(df)}")
     print(f"Coverage: {(len(df) / expected_candles) * 100:.2f}%")
+    
+    # List missing intervals so they can be repaired with sync_data
+    step_ms = timeframe_to_ms(TIMEFRAME)
+    timestamps_ms = df['timestamp'].sort_values().dt.as_unit('ms').astype('int64').to_numpy()
+    gaps = find_missing_ranges(timestamps_ms, timestamps_ms[0], timestamps_ms[-1] + step_ms, step_ms)
+    print(f"Gaps: {len(gaps)}")
+    for lo, hi in gaps[:10]:
+        print(f"  {pd.to_datetime(lo, unit='ms', utc=True)} to {pd.to_datetime(hi, unit='ms', utc=True)} "
+              f"({(hi - lo) // step_ms} candles)")
 
 def main():
     # Fetch in-sample data
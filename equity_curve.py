@@ -0,0 +1,131 @@
+# equity_curve.py
+import numpy as np
+import pandas as pd
+
+class EquityCurve:
+    """Per-bar realized balance and mark-to-market equity in preallocated arrays.
+    
+    With decimation=k only every k-th bar is kept, plus the most recent bar,
+    which bounds memory on very long runs. Iterating yields
+    {'timestamp', 'balance', 'equity'} dicts like the old list-based curve.
+    """
+    
+    def __init__(self, decimation=1, tz='UTC', capacity=0):
+        self.decimation = max(1, int(decimation))
+        self.tz = tz
+        self.bars = 0  # Bars seen, including those dropped by decimation
+        self.size = 0  # Bars stored
+        self._has_tail = False  # Latest bar held in the slot after the stored ones
+        self._allocate(capacity)
+    
+    def _allocate(self, capacity):
+        self._timestamps_ns = np.empty(capacity + 1, dtype=np.int64)
+        self._balance = np.empty(capacity + 1)
+        self._equity = np.empty(capacity + 1)
+    
+    def _ensure_capacity(self, slots):
+        if slots <= len(self._balance):
+            return
+        
+        n = self.size + self._has_tail
+        old = (self._timestamps_ns, self._balance, self._equity)
+        self._allocate(max(slots, 2 * len(self._balance)))
+        for new_array, old_array in zip((self._timestamps_ns, self._balance, self._equity), old):
+            new_array[:n] = old_array[:n]
+    
+    def reserve(self, n_bars, tz=None):
+        """Preallocate room for n_bars more bars (after decimation)."""
+        if tz is not None:
+            self.tz = tz
+        self._ensure_capacity(self.size + -(-n_bars // self.decimation) + 1)
+    
+    def append(self, timestamp_ns, balance, equity):
+        """Record one bar."""
+        slot = self.size
+        self._ensure_capacity(slot + 2)
+        self._timestamps_ns[slot] = timestamp_ns
+        self._balance[slot] = balance
+        self._equity[slot] = equity
+        
+        if self.bars % self.decimation == 0:
+            self.size += 1
+            self._has_tail = False
+        else:
+            self._has_tail = True
+        self.bars += 1
+    
+    def extend(self, timestamps_ns, balance, equity):
+        """Record consecutive bars; balance and equity may be scalars or arrays."""
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        n = len(timestamps_ns)
+        if n == 0:
+            return
+        balance = np.broadcast_to(np.asarray(balance, dtype=np.float64), (n,))
+        equity = np.broadcast_to(np.asarray(equity, dtype=np.float64), (n,))
+        
+        first = -self.bars % self.decimation
+        kept = slice(first, n, self.decimation)
+        kept_count = len(range(first, n, self.decimation))
+        self._ensure_capacity(self.size + kept_count + 2)
+        
+        stop = self.size + kept_count
+        self._timestamps_ns[self.size:stop] = timestamps_ns[kept]
+        self._balance[self.size:stop] = balance[kept]
+        self._equity[self.size:stop] = equity[kept]
+        self.size = stop
+        
+        # The last bar stays visible as the tail when decimation drops it
+        self._has_tail = (n - 1 - first) % self.decimation != 0 or kept_count == 0
+        if self._has_tail:
+            self._timestamps_ns[stop] = timestamps_ns[-1]
+            self._balance[stop] = balance[-1]
+            self._equity[stop] = equity[-1]
+        self.bars += n
+    
+    def __len__(self):
+        return self.size + self._has_tail
+    
+    @property
+    def timestamps_ns(self):
+        return self._timestamps_ns[:len(self)]
+    
+    @property
+    def balance(self):
+        return self._balance[:len(self)]
+    
+    @property
+    def equity(self):
+        return self._equity[:len(self)]
+    
+    def timestamps(self):
+        index = pd.DatetimeIndex(self.timestamps_ns.view('datetime64[ns]'))
+        return index.tz_localize('UTC').tz_convert(self.tz) if self.tz is not None else index
+    
+    def __getitem__(self, i):
+        i = range(len(self))[i]
+        return {
+            'timestamp': pd.Timestamp(int(self._timestamps_ns[i]), tz='UTC').tz_convert(self.tz)
+            if self.tz is not None else pd.Timestamp(int(self._timestamps_ns[i])),
+            'balance': float(self._balance[i]),
+            'equity': float(self._equity[i])
+        }
+    
+    def __iter__(self):
+        for timestamp, balance, equity in zip(self.timestamps(), self.balance.tolist(), self.equity.tolist()):
+            yield {'timestamp': timestamp, 'balance': balance, 'equity': equity}
+    
+    def to_frame(self):
+        """DataFrame with timestamp, balance (realized) and equity (mark-to-market)."""
+        return pd.DataFrame({
+            'timestamp': self.timestamps(),
+            'balance': self.balance.copy(),
+            'equity': self.equity.copy()
+        })
+    
+    def max_drawdown(self, column='equity'):
+        """Largest peak-to-trough drop of the balance or equity column, in percent."""
+        values = self.equity if column == 'equity' else self.balance
+        if not len(values):
+            return 0
+        peaks = np.maximum.accumulate(values)
+        return float(((peaks - values) / peaks).max() * 100)
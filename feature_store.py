@@ -0,0 +1,119 @@
+# feature_store.py
+import hashlib
+import json
+import os
+import numpy as np
+import config
+
+STORE_VERSION = 1
+ENTRY_SUFFIX = '.npy'
+
+def fingerprint(values):
+    """Content hash of a numeric column (float64 bytes), independent of where it came from."""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    return hashlib.sha1(values.tobytes()).hexdigest()
+
+class FeatureStore:
+    """Content-addressed on-disk cache of computed feature columns.
+    
+    An entry is a set of equal-length named float64 arrays stored as one
+    structured .npy file (a field per array), named by the hash of its key:
+    a JSON-able dict, normally the fingerprint of the input column plus the
+    feature parameters. Reads refresh the file's mtime and writes evict least
+    recently used entries once the directory grows past max_bytes. Writes go
+    through a temporary file and a rename, so sweep workers can share one
+    directory.
+    """
+    
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = config.FEATURE_STORE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        digest = hashlib.sha1(json.dumps({'version': STORE_VERSION, **key}, sort_keys=True).encode())
+        return os.path.join(self.directory, digest.hexdigest() + ENTRY_SUFFIX)
+    
+    def get(self, key):
+        """{name: array} stored under key, or None."""
+        path = self._path(key)
+        try:
+            entry = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return {name: entry[name] for name in entry.dtype.names}
+    
+    def put(self, key, arrays):
+        path = self._path(key)
+        entry = np.empty(len(next(iter(arrays.values()))), dtype=[(name, np.float64) for name in arrays])
+        for name, values in arrays.items():
+            entry[name] = values
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, entry)
+        os.replace(tmp_path, path)
+        self.evict()
+    
+    def get_or_compute(self, key, compute):
+        """Stored arrays for key, computing and storing them with compute() on a miss."""
+        arrays = self.get(key)
+        if arrays is not None:
+            self.hits += 1
+            return arrays
+        self.misses += 1
+        arrays = compute()
+        self.put(key, arrays)
+        return arrays
+    
+    def entries(self):
+        """(path, size, mtime) of every entry, least recently used first."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Evicted by another process
+                entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        entries.sort(key=lambda e: e[2])
+        return entries
+    
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+    
+    def evict(self):
+        """Delete least recently used entries until the store fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    
+    def clear(self):
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+_default_stores = {}
+
+def default_feature_store():
+    """FeatureStore at config.FEATURE_STORE_DIR, or None when the store is disabled (read at call time)."""
+    directory = config.FEATURE_STORE_DIR
+    if directory is None:
+        return None
+    key = (os.path.abspath(directory), config.FEATURE_STORE_MAX_BYTES)
+    if key not in _default_stores:
+        _default_stores[key] = FeatureStore(directory, config.FEATURE_STORE_MAX_BYTES)
+    return _default_stores[key]
@@ -0,0 +1,84 @@
+# funding.py
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+DEFAULT_FUNDING_INTERVAL = timedelta(hours=8)
+DEFAULT_FUNDING_RATE = 0.01/100/3  # 0.01% per day, per 8h interval
+
+def load_funding_rates(csv_filename):
+    """Read a funding-rate CSV (timestamp, funding_rate) into a time-sorted Series."""
+    df = pd.read_csv(csv_filename)
+    index = pd.DatetimeIndex(pd.to_datetime(df['timestamp'], utc=True))
+    rates = pd.Series(df['funding_rate'].to_numpy(dtype=np.float64), index=index, name='funding_rate')
+    return rates[~rates.index.duplicated(keep='last')].sort_index()
+
+class FundingSchedule:
+    """Funding events for a bar series, with a constant or time-varying rate.
+    
+    Events fall every `interval` from the boundary at or before the first bar;
+    each is charged at the first bar whose timestamp is at or after it. With a
+    `rates` series, each event takes the latest rate stamped at or before the
+    event (plus `tolerance`, since exchange funding timestamps drift a few ms
+    past the boundary); events before the first row use the constant `rate`.
+    """
+    
+    def __init__(self, interval=DEFAULT_FUNDING_INTERVAL, rate=DEFAULT_FUNDING_RATE,
+                 rates=None, tolerance=timedelta(minutes=1)):
+        if isinstance(rates, str):
+            rates = load_funding_rates(rates)
+        self.interval = interval
+        self.rate = rate
+        self.rates = rates
+        self.tolerance = tolerance
+        self._rate_arrays = None  # (rates, times ns, values), rebuilt if rates is replaced
+    
+    @property
+    def interval_ns(self):
+        return int(self.interval.total_seconds()) * 1_000_000_000
+    
+    def floor(self, timestamp_ns):
+        """Last funding boundary at or before timestamp_ns (int64 epoch ns)."""
+        return timestamp_ns - timestamp_ns % self.interval_ns
+    
+    def rates_at(self, funding_times_ns):
+        """Vectorized as-of lookup of the rate for each funding time (int64 ns)."""
+        funding_times_ns = np.asarray(funding_times_ns, dtype=np.int64)
+        if self.rates is None or len(self.rates) == 0:
+            return np.full(len(funding_times_ns), self.rate)
+        
+        if self._rate_arrays is None or self._rate_arrays[0] is not self.rates:
+            self._rate_arrays = (
+                self.rates, self.rates.index.as_unit('ns').asi8, self.rates.to_numpy(dtype=np.float64)
+            )
+        _, rate_times_ns, values = self._rate_arrays
+        tolerance_ns = int(self.tolerance.total_seconds() * 1_000_000_000)
+        positions = np.searchsorted(rate_times_ns, funding_times_ns + tolerance_ns, side='right') - 1
+        return np.where(positions >= 0, values[np.maximum(positions, 0)], self.rate)
+    
+    def rate_at(self, funding_time):
+        """Rate for a single funding time."""
+        return float(self.rates_at([pd.Timestamp(funding_time).value])[0])
+    
+    def events(self, timestamps_ns, start=0, last_funding_ns=None):
+        """Funding events for bars [start, len) after last_funding_ns.
+        
+        Returns (last_funding_ns, funding_times_ns, funding_bars, funding_rates).
+        When last_funding_ns is None it is the boundary at or before bar start,
+        which is not charged.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        if len(timestamps_ns) <= start:
+            empty = np.empty(0, dtype=np.int64)
+            return last_funding_ns, empty, empty, np.empty(0)
+        
+        if last_funding_ns is None:
+            last_funding_ns = self.floor(int(timestamps_ns[start]))
+        
+        funding_times_ns = np.arange(
+            last_funding_ns + self.interval_ns, timestamps_ns[-1] + 1, self.interval_ns
+        )
+        funding_bars = np.maximum(
+            np.searchsorted(timestamps_ns, funding_times_ns, side='left'), start
+        )
+        return last_funding_ns, funding_times_ns, funding_bars, self.rates_at(funding_times_ns)
@@ -1,12 +1,15 @@
 # indicators.py
+import math
 import pandas as pd
 import numpy as np
+from bisect import bisect_left, bisect_right
 from collections import deque
 from config import (
     CLOSE_BB_PERIOD, CLOSE_BB_STD,
     OPEN_BB_PERIOD, OPEN_BB_STD,
     DEQUE_MAX_LEN
 )
+from feature_store import default_feature_store, fingerprint
 
 def calculate_bollinger_bands(data, column, period, std_dev):
     """Calculate Bollinger Bands without look-ahead bias."""
@@ -22,8 +25,144 @@ def calculate_bollinger_bands(data, column, period, std_dev):
     
     return sma, upper_band, lower_band
 
+class StreamingBollingerBands:
+    """Incremental version of calculate_bollinger_bands with O(1) updates.
+    
+    Keeps a compensated running sum for the mean and Welford accumulators for
+    the variance, mirroring pandas' expanding-window kernels so a full history
+    fed one value at a time reproduces the batch output.
+    """
+    
+    def __init__(self, period, std_dev):
+        self.period = period
+        self.std_dev = std_dev
+        self.nobs = 0
+        # Compensated (Kahan) sum for the mean
+        self._sum = 0.0
+        self._sum_comp = 0.0
+        self._neg_count = 0
+        # Welford mean / sum of squared deviations for the variance
+        self._mean = 0.0
+        self._mean_comp = 0.0
+        self._ssqdm = 0.0
+        # Runs of identical values are reported exactly, as pandas does
+        self._prev_value = float('nan')
+        self._same_count = 0
+    
+    def update(self, value):
+        """Return (sma, upper_band, lower_band) from prior values, then add value."""
+        sma, upper_band, lower_band = self.current()
+        self._add(float(value))
+        return sma, upper_band, lower_band
+    
+    def current(self):
+        """Bands for the next bar, based on every value added so far."""
+        if self.nobs < self.period or self.nobs == 0:
+            nan = float('nan')
+            return nan, nan, nan
+        
+        sma = self._sum / self.nobs
+        if self._same_count >= self.nobs:
+            sma = self._prev_value
+        elif self._neg_count == 0 and sma < 0:
+            sma = 0.0
+        elif self._neg_count == self.nobs and sma > 0:
+            sma = 0.0
+        
+        if self.nobs < 2:
+            std = float('nan')
+        elif self._same_count >= self.nobs:
+            std = 0.0
+        else:
+            variance = self._ssqdm / (self.nobs - 1)
+            std = math.sqrt(variance) if variance > 0 else 0.0
+        
+        return sma, sma + (std * self.std_dev), sma - (std * self.std_dev)
+    
+    def _add(self, value):
+        if value != value:  # NaN values are skipped, like pandas
+            return
+        
+        self.nobs += 1
+        if value == self._prev_value:
+            self._same_count += 1
+        else:
+            self._same_count = 1
+        self._prev_value = value
+        if math.copysign(1.0, value) < 0:
+            self._neg_count += 1
+        
+        y = value - self._sum_comp
+        t = self._sum + y
+        self._sum_comp = t - self._sum - y
+        self._sum = t
+        
+        prev_mean = self._mean - self._mean_comp
+        y = value - self._mean_comp
+        delta = y - self._mean
+        self._mean_comp = delta + self._mean - y
+        self._mean = self._mean + delta / self.nobs
+        self._ssqdm += (value - prev_mean) * (value - self._mean)
+
+class StreamingIndicators:
+    """Per-candle equivalent of add_indicators for live/appended data."""
+    
+    def __init__(self):
+        self.close_bands = StreamingBollingerBands(CLOSE_BB_PERIOD, CLOSE_BB_STD)
+        self.open_bands = StreamingBollingerBands(OPEN_BB_PERIOD, OPEN_BB_STD)
+        self.prev_close_sma = float('nan')
+    
+    def update(self, candle):
+        """Return the indicator columns for one candle (same keys as add_indicators)."""
+        return self.update_from_prices(float(candle['open']), float(candle['close']))
+    
+    def update_from_prices(self, open_price, close_price):
+        """Same as update, from plain open/close values."""
+        close_sma, close_upper, close_lower = self.close_bands.update(close_price)
+        open_sma, open_upper, open_lower = self.open_bands.update(open_price)
+        
+        # Trend compares against the previous bar's (already shifted) SMA
+        trend = 'up' if close_price > self.prev_close_sma else 'down'
+        self.prev_close_sma = close_sma
+        
+        return {
+            'close_sma': close_sma,
+            'close_upper_band': close_upper,
+            'close_lower_band': close_lower,
+            'open_sma': open_sma,
+            'open_upper_band': open_upper,
+            'open_lower_band': open_lower,
+            'trend': trend
+        }
+    
+    def add_to_chunk(self, df):
+        """add_indicators for the next chunk of a series, continuing from the chunks before it."""
+        close_update, open_update = self.close_bands.update, self.open_bands.update
+        close_bands, open_bands, trends = [], [], []
+        prev_close_sma = self.prev_close_sma
+        for open_price, close_price in zip(df['open'].to_numpy(dtype=np.float64).tolist(),
+                                           df['close'].to_numpy(dtype=np.float64).tolist()):
+            bands = close_update(close_price)
+            close_bands.append(bands)
+            open_bands.append(open_update(open_price))
+            trends.append('up' if close_price > prev_close_sma else 'down')
+            prev_close_sma = bands[0]
+        self.prev_close_sma = prev_close_sma
+        
+        close_bands = np.array(close_bands, dtype=np.float64).reshape(-1, 3)
+        open_bands = np.array(open_bands, dtype=np.float64).reshape(-1, 3)
+        df['close_sma'], df['close_upper_band'], df['close_lower_band'] = close_bands.T
+        df['open_sma'], df['open_upper_band'], df['open_lower_band'] = open_bands.T
+        df['trend'] = trends
+        return df
+
 class SupportResistanceTracker:
-    def __init__(self, max_len=DEQUE_MAX_LEN, lookback_period=20):
+    TOUCH_THRESHOLD = 0.001  # 0.1% threshold for level touch
+    MIN_TOUCHES = 2  # Minimum number of touches required
+    
+    def __init__(self, max_len=None, lookback_period=20):
+        if max_len is None:
+            max_len = DEQUE_MAX_LEN  # Read at call time so sweeps can override it
         self.support_levels = deque(maxlen=max_len)
         self.resistance_levels = deque(maxlen=max_len)
         self.lookback_period = lookback_period
@@ -33,10 +172,14 @@ class SupportResistanceTracker:
     
     def update_levels(self, candle):
         """Update support and resistance levels using only past data."""
-        high = float(candle['high'])
-        low = float(candle['low'])
-        timestamp = pd.to_datetime(candle['timestamp'])
-        
+        self.update_levels_from_prices(
+            float(candle['high']),
+            float(candle['low']),
+            pd.to_datetime(candle['timestamp'])
+        )
+    
+    def update_levels_from_prices(self, high, low, timestamp):
+        """Update levels from plain high/low values (no per-candle parsing)."""
         # Add current prices to history but don't use them for level identification
         self.price_history.append({
             'high': high,
@@ -44,28 +187,25 @@ class SupportResistanceTracker:
             'timestamp': timestamp
         })
         
-        if len(self.price_history) < 3:  # Need at least 3 candles for pattern
+        history = self.price_history
+        if len(history) < 3:  # Need at least 3 candles for pattern
             return
         
-        # Use only past data for level identification
-        past_highs = [p['high'] for p in list(self.price_history)[:-1]]
-        past_lows = [p['low'] for p in list(self.price_history)[:-1]]
-        
-        # Look for local maxima and minima in past data
-        if len(past_highs) >= 3:
+        # Use only past data for level identification (the three candles before this one)
+        if len(history) >= 4:
+            before, middle, after = history[-4], history[-3], history[-2]
+            
             # Check if second-to-last point is a local maximum
-            if past_highs[-2] > past_highs[-3] and past_highs[-2] > past_highs[-1]:
-                level = past_highs[-2]
+            if middle['high'] > before['high'] and middle['high'] > after['high']:
+                level = middle['high']
                 if not self._is_level_exists(level, self.resistance_levels):
-                    self.resistance_levels.append(level)
-                    self.resistance_touches[level] = 1
+                    self._add_level(level, self.resistance_levels, self.resistance_touches)
             
             # Check if second-to-last point is a local minimum
-            if past_lows[-2] < past_lows[-3] and past_lows[-2] < past_lows[-1]:
-                level = past_lows[-2]
+            if middle['low'] < before['low'] and middle['low'] < after['low']:
+                level = middle['low']
                 if not self._is_level_exists(level, self.support_levels):
-                    self.support_levels.append(level)
-                    self.support_touches[level] = 1
+                    self._add_level(level, self.support_levels, self.support_touches)
         
         # Update level touches using current candle
         self._update_level_touches(high, low, timestamp)
@@ -73,6 +213,30 @@ class SupportResistanceTracker:
         # Remove weak levels
         self._remove_weak_levels(timestamp)
     
+    def update_levels_batch(self, highs, lows, timestamps):
+        """update_levels_from_prices over a run of bars.
+        
+        Returns the second most recent resistance and support level after each
+        bar (NaN while there are fewer than two), which is all the double
+        top/bottom checks read.
+        """
+        n = len(highs)
+        previous_resistance = np.full(n, np.nan)
+        previous_support = np.full(n, np.nan)
+        # The class method, so a profiler-wrapped instance attribute is not timed twice
+        update_bar = SupportResistanceTracker.update_levels_from_prices
+        for k, (high, low, timestamp) in enumerate(zip(highs, lows, timestamps)):
+            update_bar(self, float(high), float(low), timestamp)
+            previous_resistance[k], previous_support[k] = self._previous_levels()
+        return previous_resistance, previous_support
+    
+    def _previous_levels(self):
+        resistance, support = self.resistance_levels, self.support_levels
+        return (
+            resistance[-2] if len(resistance) >= 2 else np.nan,
+            support[-2] if len(support) >= 2 else np.nan
+        )
+    
     def _identify_new_levels(self):
         """Identify new support and resistance levels."""
         highs = [p['high'] for p in self.price_history]
@@ -84,19 +248,22 @@ class SupportResistanceTracker:
             if highs[i] > highs[i-1] and highs[i] > highs[i+1]:
                 level = highs[i]
                 if not self._is_level_exists(level, self.resistance_levels):
-                    self.resistance_levels.append(level)
-                    self.resistance_touches[level] = 1
+                    self._add_level(level, self.resistance_levels, self.resistance_touches)
             
             # Potential support level
             if lows[i] < lows[i-1] and lows[i] < lows[i+1]:
                 level = lows[i]
                 if not self._is_level_exists(level, self.support_levels):
-                    self.support_levels.append(level)
-                    self.support_touches[level] = 1
+                    self._add_level(level, self.support_levels, self.support_touches)
+    
+    def _add_level(self, level, levels, touches):
+        """Start tracking a new level with a single touch."""
+        levels.append(level)
+        touches[level] = 1
     
     def _update_level_touches(self, high, low, timestamp):
         """Update the number of times price touches each level."""
-        touch_threshold = 0.001  # 0.1% threshold for level touch
+        touch_threshold = self.TOUCH_THRESHOLD
         
         # Check resistance touches
         for level in list(self.resistance_levels):
@@ -110,7 +277,7 @@ class SupportResistanceTracker:
     
     def _remove_weak_levels(self, current_time):
         """Remove levels that haven't been touched recently."""
-        min_touches = 2  # Minimum number of touches required
+        min_touches = self.MIN_TOUCHES
         
         # Remove weak resistance levels
         for level in list(self.resistance_levels):
@@ -124,7 +291,7 @@ class SupportResistanceTracker:
                 self.support_levels.remove(level)
                 self.support_touches.pop(level, None)
     
-    def _is_level_exists(self, new_level, levels, threshold=0.001):
+    def _is_level_exists(self, new_level, levels, threshold=TOUCH_THRESHOLD):
         """Check if a similar price level already exists."""
         for level in levels:
             if abs(new_level - level) / level <= threshold:
@@ -148,15 +315,403 @@ class SupportResistanceTracker:
         
         return support, resistance
 
-def add_indicators(df):
-    """Add all technical indicators to the dataframe."""
+def level_candidates(highs, lows, threshold=SupportResistanceTracker.TOUCH_THRESHOLD,
+                     min_touches=SupportResistanceTracker.MIN_TOUCHES):
+    """New-level events SupportResistanceTracker would see on one symbol's bars.
+    
+    At bar k the bar k-2 high (low) becomes a resistance (support) candidate
+    when it is a local maximum (minimum) of bars k-3..k-1. A candidate counts
+    one touch when added and survives pruning only if bar k touches it too.
+    Returns (resistance, resistance_keep, resistance_price, support,
+    support_keep, support_price) arrays aligned with the input bars.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    n = len(highs)
+    resistance = np.zeros(n, dtype=bool)
+    support = np.zeros(n, dtype=bool)
+    resistance_keep = np.zeros(n, dtype=bool)
+    support_keep = np.zeros(n, dtype=bool)
+    resistance_price = np.full(n, np.nan)
+    support_price = np.full(n, np.nan)
+    if n < 4:
+        return resistance, resistance_keep, resistance_price, support, support_keep, support_price
+    
+    h1, h2, h3 = highs[2:-1], highs[1:-2], highs[:-3]
+    l1, l2, l3 = lows[2:-1], lows[1:-2], lows[:-3]
+    resistance[3:] = (h2 > h3) & (h2 > h1)
+    support[3:] = (l2 < l3) & (l2 < l1)
+    resistance_keep[3:] = 1 + (np.abs(highs[3:] - h2) / h2 <= threshold) >= min_touches
+    support_keep[3:] = 1 + (np.abs(lows[3:] - l2) / l2 <= threshold) >= min_touches
+    resistance_price[3:] = h2
+    support_price[3:] = l2
+    return resistance, resistance_keep, resistance_price, support, support_keep, support_price
+
+class SortedPriceLevels:
+    """Price levels kept in insertion order plus a sorted, array-backed index.
+    
+    Behaves like the bounded deque SupportResistanceTracker uses (len, indexing
+    and iteration follow insertion order, the oldest level is evicted at
+    max_len), while range queries and touch counting go through bisect on the
+    sorted array instead of scanning every level.
+    """
+    
+    # Candidate windows are widened slightly and then re-checked with the exact
+    # relative-distance test, so rounding never changes which levels match.
+    _WINDOW_SLACK = 1e-9
+    
+    def __init__(self, max_len=DEQUE_MAX_LEN):
+        self.maxlen = max_len
+        self._order = deque()
+        self._prices = []
+        self._touches = []
+        self._pending = []  # Levels added since the last prune
+    
+    def __len__(self):
+        return len(self._order)
+    
+    def __iter__(self):
+        return iter(self._order)
+    
+    def __getitem__(self, index):
+        return self._order[index]
+    
+    def __repr__(self):
+        return f"SortedPriceLevels({list(self._order)!r}, maxlen={self.maxlen})"
+    
+    def sorted_levels(self):
+        """Levels in ascending price order."""
+        return list(self._prices)
+    
+    def touches(self):
+        """Touch counts keyed by level price."""
+        return dict(zip(self._prices, self._touches))
+    
+    def append(self, level, touches=1):
+        """Add a level, evicting the oldest one when full."""
+        if self.maxlen is not None and len(self._order) >= self.maxlen:
+            self._discard(self._order.popleft())
+        
+        self._order.append(level)
+        index = bisect_right(self._prices, level)
+        self._prices.insert(index, level)
+        self._touches.insert(index, touches)
+        self._pending.append(level)
+    
+    def has_level_near(self, price, threshold):
+        """True if any level is within threshold (relative to the level)."""
+        lo, hi = self._window(price, threshold)
+        for index in range(lo, hi):
+            level = self._prices[index]
+            if abs(price - level) / level <= threshold:
+                return True
+        return False
+    
+    def touch(self, price, threshold):
+        """Count a touch on every level within threshold of price."""
+        lo, hi = self._window(price, threshold)
+        if lo == hi:
+            return
+        prices, touches = self._prices, self._touches
+        for index in range(lo, hi):
+            level = prices[index]
+            if abs(price - level) / level <= threshold:
+                touches[index] += 1
+    
+    def remove_weak(self, min_touches):
+        """Drop levels with fewer than min_touches touches.
+        
+        Touch counts only grow, so only levels added since the last prune can
+        be below the minimum; established levels are never rescanned.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        for level in pending:
+            index = bisect_left(self._prices, level)
+            if index == len(self._prices) or self._prices[index] != level:
+                continue  # Already evicted
+            if self._touches[index] >= min_touches:
+                continue
+            
+            del self._prices[index]
+            del self._touches[index]
+            if self._order[-1] == level:
+                self._order.pop()
+            else:
+                self._order.remove(level)
+    
+    def matches(self, prices, threshold):
+        """Vectorized touch test of many prices against the current levels.
+        
+        Returns (price index, sorted level index) for every pair within
+        threshold (relative to the level).
+        """
+        levels = np.asarray(self._prices, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        lo = np.searchsorted(levels, prices / (1 + threshold) * (1 - self._WINDOW_SLACK), 'left')
+        hi = np.searchsorted(levels, prices / (1 - threshold) * (1 + self._WINDOW_SLACK), 'right')
+        width = np.maximum(hi - lo, 0)
+        total = int(width.sum())
+        if not total:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        
+        rows = np.repeat(np.arange(len(prices)), width)
+        offsets = np.arange(total) - np.repeat(np.cumsum(width) - width, width)
+        cols = np.repeat(lo, width) + offsets
+        level = levels[cols]
+        match = np.abs(prices[rows] - level) / level <= threshold
+        return rows[match], cols[match]
+    
+    def add_touches(self, counts):
+        """Add counts (aligned with sorted_levels()) to the touch counts."""
+        self._touches = [touches + count for touches, count in zip(self._touches, counts)]
+    
+    def nearest_below(self, price):
+        """Highest level strictly below price, or None."""
+        index = bisect_left(self._prices, price)
+        return self._prices[index - 1] if index > 0 else None
+    
+    def nearest_above(self, price):
+        """Lowest level strictly above price, or None."""
+        index = bisect_right(self._prices, price)
+        return self._prices[index] if index < len(self._prices) else None
+    
+    def _window(self, price, threshold):
+        # |price - level| / level <= threshold  <=>  price/(1+t) <= level <= price/(1-t)
+        prices = self._prices
+        low = price / (1 + threshold) * (1 - self._WINDOW_SLACK)
+        high = price / (1 - threshold) * (1 + self._WINDOW_SLACK)
+        lo = bisect_left(prices, low)
+        return lo, bisect_right(prices, high, lo)
+    
+    def _discard(self, level):
+        index = bisect_left(self._prices, level)
+        if index < len(self._prices) and self._prices[index] == level:
+            del self._prices[index]
+            del self._touches[index]
+
+class SortedSupportResistanceTracker(SupportResistanceTracker):
+    """SupportResistanceTracker backed by SortedPriceLevels.
+    
+    Produces the same levels and touch counts as the deque version, but
+    threshold checks, touch counting, pruning and nearest-level lookups are
+    logarithmic in the number of levels, so max_len can be raised into the
+    thousands.
+    """
+    
+    def __init__(self, max_len=None, lookback_period=20):
+        if max_len is None:
+            max_len = DEQUE_MAX_LEN
+        self.support_levels = SortedPriceLevels(max_len)
+        self.resistance_levels = SortedPriceLevels(max_len)
+        self.lookback_period = lookback_period
+        self.price_history = deque(maxlen=lookback_period)
+    
+    @property
+    def support_touches(self):
+        return self.support_levels.touches()
+    
+    @property
+    def resistance_touches(self):
+        return self.resistance_levels.touches()
+    
+    def update_levels_batch(self, highs, lows, timestamps):
+        """update_levels_from_prices over a run of bars, with the same end state.
+        
+        Candidates come from level_candidates in one pass, and the per-bar
+        update only runs on bars that can change a level list: a kept
+        candidate with no level near it, any candidate with no level near it
+        while the list is full (it evicts the oldest level even if pruned),
+        and candidates near a level that has since been evicted. On the other
+        bars only touch counts change, and those are added at the end for the
+        levels that survive.
+        """
+        history = self.price_history
+        if history.maxlen is None or history.maxlen < 4:
+            return super().update_levels_batch(highs, lows, timestamps)
+        
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        n = len(highs)
+        high_list, low_list = highs.tolist(), lows.tolist()
+        threshold = self.TOUCH_THRESHOLD
+        sides = (self.resistance_levels, self.support_levels)
+        born = ({}, {})  # Level -> bar it was added at, for levels added in this run
+        per_bar = np.zeros(n, dtype=bool)  # Bars run through update_levels_from_prices
+        mark_bars, mark_levels = [0], [self._previous_levels()]
+        earlier = list(history)
+        appended = 0
+        update_bar = SupportResistanceTracker.update_levels_from_prices
+        
+        def update(k):
+            nonlocal appended
+            for j in range(max(appended, k - 3), k):
+                history.append({'high': high_list[j], 'low': low_list[j], 'timestamp': timestamps[j]})
+            update_bar(self, high_list[k], low_list[k], timestamps[k])
+            appended = k + 1
+            per_bar[k] = True
+            mark_bars.append(k)
+            mark_levels.append(self._previous_levels())
+        
+        # Level identification needs three bars of history
+        start = 0
+        while start < n and len(history) < 3:
+            update(start)
+            start += 1
+        
+        if start < n:
+            recent = list(history)[-3:]
+            candidates = level_candidates(
+                np.concatenate(([p['high'] for p in recent], highs[start:])),
+                np.concatenate(([p['low'] for p in recent], lows[start:])),
+                threshold, self.MIN_TOUCHES
+            )
+            queues = []
+            for levels, (found, keep, price) in zip(sides, (candidates[:3], candidates[3:])):
+                index = np.flatnonzero(found[3:])
+                price = price[3:][index]
+                stale = np.zeros(len(index), dtype=bool)  # A level near it was evicted
+                free = ~stale
+                free[levels.matches(price, threshold)[0]] = False
+                by_price = np.argsort(price, kind='stable')
+                queues.append({
+                    'bars': index + start,
+                    'price': price,
+                    'by_price': by_price,
+                    'sorted_price': price[by_price],
+                    'stale': stale,
+                    'when_full': free.copy(),
+                    'when_not_full': free & keep[3:][index],
+                    'next': 0
+                })
+            
+            def next_update(levels, queue):
+                full = levels.maxlen is not None and len(levels) >= levels.maxlen
+                mask = queue['when_full'] if full else queue['when_not_full']
+                position, step = queue['next'], 32
+                while position < len(mask):
+                    window = mask[position:position + step]
+                    hit = int(window.argmax())
+                    if window[hit]:
+                        return int(queue['bars'][position + hit])
+                    position += step
+                    step *= 2
+                return n
+            
+            slack = SortedPriceLevels._WINDOW_SLACK
+            
+            def flag_near(queue, level, evicted):
+                # Later candidates within threshold of level (window by price, then the exact test)
+                sorted_price = queue['sorted_price']
+                lo = sorted_price.searchsorted(level * (1 - threshold) * (1 - slack), 'left')
+                hi = sorted_price.searchsorted(level * (1 + threshold) * (1 + slack), 'right')
+                hits = queue['by_price'][lo:hi]
+                hits = hits[hits >= queue['next']]
+                hits = hits[np.abs(queue['price'][hits] - level) / level <= threshold]
+                if evicted:
+                    queue['stale'][hits] = True
+                    queue['when_full'][hits] = True
+                    queue['when_not_full'][hits] = True
+                else:
+                    queue['when_full'][hits] = queue['stale'][hits]
+                    queue['when_not_full'][hits] = queue['stale'][hits]
+            
+            while True:
+                k = min(next_update(levels, queue) for levels, queue in zip(sides, queues))
+                if k >= n:
+                    break
+                
+                before = [(len(levels), levels[0] if len(levels) else None, levels[-1] if len(levels) else None)
+                          for levels in sides]
+                update(k)
+                for levels, queue, added_at, (count, first, last) in zip(sides, queues, born, before):
+                    queue['next'] = int(queue['bars'].searchsorted(k, 'right'))
+                    if (levels.maxlen is not None and count >= levels.maxlen
+                            and (not len(levels) or levels[0] != first)):
+                        flag_near(queue, first, evicted=True)
+                    if len(levels) and (not count or levels[-1] != last):
+                        added_at[levels[-1]] = k
+                        flag_near(queue, levels[-1], evicted=False)
+        
+        # Touches from the bars that skipped the per-bar update
+        bars = np.flatnonzero(~per_bar)
+        for levels, prices, added_at in zip(sides, (highs, lows), born):
+            if not len(bars) or not len(levels):
+                continue
+            rows, cols = levels.matches(prices[bars], threshold)
+            birth = np.array([added_at.get(level, -1) for level in levels.sorted_levels()])
+            counted = bars[rows] > birth[cols]
+            levels.add_touches(np.bincount(cols[counted], minlength=len(levels)).tolist())
+        
+        # The per-bar updates only appended the bars they needed
+        history.clear()
+        history.extend(earlier)
+        for j in range(max(n - history.maxlen, 0), n):
+            history.append({'high': high_list[j], 'low': low_list[j], 'timestamp': timestamps[j]})
+        
+        mark_levels = np.array(mark_levels, dtype=np.float64).reshape(-1, 2)
+        marks = np.searchsorted(mark_bars, np.arange(n), 'right') - 1
+        return mark_levels[marks, 0], mark_levels[marks, 1]
+    
+    def _add_level(self, level, levels, touches):
+        levels.append(level)
+    
+    def _update_level_touches(self, high, low, timestamp):
+        self.resistance_levels.touch(high, self.TOUCH_THRESHOLD)
+        self.support_levels.touch(low, self.TOUCH_THRESHOLD)
+    
+    def _remove_weak_levels(self, current_time):
+        self.resistance_levels.remove_weak(self.MIN_TOUCHES)
+        self.support_levels.remove_weak(self.MIN_TOUCHES)
+    
+    def _is_level_exists(self, new_level, levels, threshold=SupportResistanceTracker.TOUCH_THRESHOLD):
+        return levels.has_level_near(new_level, threshold)
+    
+    def get_nearest_levels(self, price):
+        return self.support_levels.nearest_below(price), self.resistance_levels.nearest_above(price)
+
+def cached_bollinger_bands(data, column, period, std_dev, store):
+    """calculate_bollinger_bands with the shifted expanding mean/std kept in a FeatureStore.
+    
+    Entries are keyed by the column's content and the period only, so runs
+    that differ in std_dev (or in the other band's parameters) reuse them.
+    """
+    key = {'feature': 'expanding_mean_std', 'data': fingerprint(data[column].to_numpy()), 'period': period}
+    
+    def compute():
+        values = data[column].astype(np.float64)
+        return {
+            'sma': values.expanding(min_periods=period).mean().shift(1).to_numpy(),
+            'std': values.expanding(min_periods=period).std().shift(1).to_numpy()
+        }
+    
+    arrays = store.get_or_compute(key, compute)
+    sma = pd.Series(arrays['sma'], index=data.index)
+    std = pd.Series(arrays['std'], index=data.index)
+    return sma, sma + (std * std_dev), sma - (std * std_dev)
+
+def add_indicators(df, store=None):
+    """Add all technical indicators to the dataframe.
+    
+    Band columns go through store (default: the config.FEATURE_STORE_DIR store,
+    if set), so unchanged prices and periods are loaded instead of recomputed.
+    """
+    if store is None:
+        store = default_feature_store()
+    
+    def bands(column, period, std_dev):
+        if store is None:
+            return calculate_bollinger_bands(df, column, period, std_dev)
+        return cached_bollinger_bands(df, column, period, std_dev, store)
+    
     # Calculate Bollinger Bands for close prices
     df['close_sma'], df['close_upper_band'], df['close_lower_band'] = \
-        calculate_bollinger_bands(df, 'close', CLOSE_BB_PERIOD, CLOSE_BB_STD)
+        bands('close', CLOSE_BB_PERIOD, CLOSE_BB_STD)
     
     # Calculate Bollinger Bands for open prices
     df['open_sma'], df['open_upper_band'], df['open_lower_band'] = \
-        calculate_bollinger_bands(df, 'open', OPEN_BB_PERIOD, OPEN_BB_STD)
+        bands('open', OPEN_BB_PERIOD, OPEN_BB_STD)
     
     # Calculate trend based on close SMA
     df['trend'] = np.where(
@@ -165,4 +720,4 @@ def add_indicators(df):
         'down'
     )
     
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,180 @@
+# live_trader.py
+import json
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+import config
+from backtest import Backtester
+from indicators import StreamingIndicators
+from resample import StreamingHigherTimeframeTrend
+
+def parse_kline_message(message):
+    """Candle dict for a closed kline in a Binance kline stream message, else None.
+    
+    Accepts raw JSON text or a decoded dict, with or without the combined
+    stream wrapper ({'stream': ..., 'data': {...}}). The candle timestamp is
+    the kline open time, as in the CSVs from data_collector.
+    """
+    data = json.loads(message) if isinstance(message, (str, bytes)) else message
+    data = data.get('data', data)
+    if data.get('e') != 'kline':
+        return None
+    
+    kline = data['k']
+    if not kline.get('x'):
+        return None  # Bar still forming
+    
+    return {
+        'symbol': kline.get('s', data.get('s')),
+        'timestamp': pd.Timestamp(kline['t'], unit='ms', tz='UTC'),
+        'open': float(kline['o']),
+        'high': float(kline['h']),
+        'low': float(kline['l']),
+        'close': float(kline['c']),
+        'volume': float(kline['v']),
+        'close_time_ms': kline['T'],
+        'event_time_ms': data.get('E')
+    }
+
+class PaperTrader:
+    """Paper trading on closed klines with Backtester's fee, slippage and funding model.
+    
+    Each closed candle goes through the same steps as the backtest loop
+    (funding, TP/SL checks, TradingStrategy.analyze_candle, process_signals),
+    with indicators from StreamingIndicators instead of a DataFrame recompute
+    (and the trend from StreamingHigherTimeframeTrend when config.TREND_TIMEFRAME is set).
+    Processing time per candle is checked against latency_budget_ms.
+    """
+    
+    def __init__(self, symbol=config.SYMBOL, initial_balance=10000, latency_budget_ms=50,
+                 funding_rates=None, verbose=True, history=10000):
+        self.symbol = symbol
+        self.latency_budget_ms = latency_budget_ms
+        self.verbose = verbose
+        self.backtester = Backtester(initial_balance, verbose=False, funding_rates=funding_rates)
+        self.indicators = StreamingIndicators()
+        timeframe = config.TREND_TIMEFRAME
+        self.higher_trend = StreamingHigherTimeframeTrend(timeframe) if timeframe is not None else None
+        self.last_timestamp = None
+        self.candles_processed = 0
+        self.budget_overruns = 0
+        self.skipped_messages = 0
+        self.latencies_ms = deque(maxlen=history)  # Candle processing time
+        self.delivery_lags_ms = deque(maxlen=history)  # Exchange event time to signal out
+    
+    def warm_up(self, df):
+        """Feed historical candles to indicators and levels without trading."""
+        for candle in df[['timestamp', 'open', 'high', 'low', 'close']].to_dict('records'):
+            self.indicators.update(candle)
+            self._update_higher_trend(candle)
+            self.backtester.sr_tracker.update_levels(candle)
+            self.last_timestamp = candle['timestamp']
+    
+    def on_candle(self, candle):
+        """Process one closed candle and return the signals it produced."""
+        if self.last_timestamp is not None and candle['timestamp'] <= self.last_timestamp:
+            self.skipped_messages += 1  # Duplicate or out-of-order bar
+            return []
+        
+        start = time.perf_counter()
+        backtester = self.backtester
+        close = float(candle['close'])
+        
+        backtester.equity_curve.append(
+            candle['timestamp'].value, backtester.balance, backtester.mark_to_market(close)
+        )
+        backtester.apply_funding_fee(candle)
+        backtester.check_positions(candle)
+        
+        trend = self.indicators.update(candle)['trend']
+        if self.higher_trend is not None:
+            trend = self._update_higher_trend(candle)
+        signals = backtester.strategy.analyze_candle(candle, trend)
+        backtester.process_signals(candle, signals)
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.latencies_ms.append(elapsed_ms)
+        if candle.get('event_time_ms') is not None:
+            self.delivery_lags_ms.append(time.time() * 1000 - candle['event_time_ms'])
+        if elapsed_ms > self.latency_budget_ms:
+            self.budget_overruns += 1
+            self._log(f"Latency budget exceeded: {elapsed_ms:.2f}ms for {candle['timestamp']}")
+        
+        self.last_timestamp = candle['timestamp']
+        self.candles_processed += 1
+        if signals:
+            self._log(f"{candle['timestamp']} {[s['pattern'] for s in signals]} "
+                      f"balance={backtester.balance:.2f} open={backtester.book.count}")
+        return signals
+    
+    def _update_higher_trend(self, candle):
+        if self.higher_trend is None:
+            return None
+        return self.higher_trend.update(
+            candle['timestamp'].value, float(candle['open']), float(candle['close'])
+        )
+    
+    def on_message(self, message):
+        """Handle one websocket message; non-kline, open-bar and other-symbol messages are ignored."""
+        candle = parse_kline_message(message)
+        if candle is None or (candle['symbol'] is not None and candle['symbol'] != self.symbol):
+            return []
+        return self.on_candle(candle)
+    
+    def latency_summary(self):
+        """Percentiles of candle processing time and delivery lag, in milliseconds."""
+        summary = {
+            'candles': self.candles_processed,
+            'budget_ms': self.latency_budget_ms,
+            'budget_overruns': self.budget_overruns,
+            'skipped_messages': self.skipped_messages
+        }
+        for name, values in (('processing', self.latencies_ms), ('delivery_lag', self.delivery_lags_ms)):
+            if values:
+                p50, p95, p99 = np.percentile(np.fromiter(values, float), [50, 95, 99])
+                summary.update({
+                    f'{name}_p50_ms': p50, f'{name}_p95_ms': p95,
+                    f'{name}_p99_ms': p99, f'{name}_max_ms': max(values)
+                })
+        return summary
+    
+    def statistics(self):
+        return self.backtester.calculate_statistics()
+    
+    def run(self, url, max_candles=None):
+        """Subscribe to a kline websocket stream (needs websocket-client) until closed."""
+        import websocket
+        
+        def on_message(ws, message):
+            self.on_message(message)
+            if max_candles is not None and self.candles_processed >= max_candles:
+                ws.close()
+        
+        def on_error(ws, error):
+            self._log(f"Websocket error: {error}")
+        
+        app = websocket.WebSocketApp(url, on_message=on_message, on_error=on_error)
+        app.run_forever()
+        return self.statistics()
+    
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+def binance_kline_url(symbol=config.SYMBOL, timeframe=config.TIMEFRAME):
+    """Binance USDT-M futures kline stream URL for one symbol."""
+    return f"wss://fstream.binance.com/ws/{symbol.lower()}@kline_{timeframe}"
+
+def main():
+    trader = PaperTrader()
+    print(f"Paper trading {trader.symbol} from {binance_kline_url()}")
+    try:
+        trader.run(binance_kline_url())
+    except KeyboardInterrupt:
+        pass
+    print(trader.statistics())
+    print(trader.latency_summary())
+
+if __name__ == "__main__":
+    main()
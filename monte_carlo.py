@@ -0,0 +1,284 @@
+# monte_carlo.py
+import numpy as np
+import pandas as pd
+import config
+from backtest import Backtester
+from candle_store import load_candles
+from patterns import is_hammer_batch, is_shooting_star_batch
+from resample import add_strategy_indicators
+from strategy import entry_position_size, stop_loss_price, take_profit_price
+
+# Metrics reported per slippage path (same definitions as Backtester.calculate_statistics)
+PATH_METRICS = ('final_balance', 'total_return', 'max_drawdown', 'sharpe_ratio', 'total_trades', 'win_rate')
+
+class SlippageStream:
+    """Seeded uniform slippage draws for many paths, pre-generated in blocks.
+    
+    Each draw() returns the next (n_paths, width) slab in [0, 2 * avg_slippage),
+    so a given seed always replays the same fills.
+    """
+    
+    def __init__(self, n_paths, width, avg_slippage, seed=None, block_size=256):
+        self.rng = np.random.default_rng(seed)
+        self.shape = (n_paths, width)
+        self.high = avg_slippage * 2
+        self.block_size = block_size
+        self._block = None
+        self._next = block_size
+    
+    def draw(self):
+        if self._next == self.block_size:
+            self._block = self.rng.uniform(0, self.high, (self.block_size,) + self.shape)
+            self._next = 0
+        slab = self._block[self._next]
+        self._next += 1
+        return slab
+
+def collect_signals(backtester, df, warmup_bars=0):
+    """Run the support/resistance tracker once and return {bar index: signals}.
+    
+    Signals depend only on the candles, not on fills, so one pass serves
+    every slippage path.
+    """
+    highs = df['high'].to_numpy(dtype=np.float64)
+    lows = df['low'].to_numpy(dtype=np.float64)
+    opens = df['open'].to_numpy(dtype=np.float64)
+    closes = df['close'].to_numpy(dtype=np.float64)
+    timestamps_ns = df['timestamp'].dt.as_unit('ns').astype('int64').tolist()
+    trends = df['trend'].tolist()
+    hammers = is_hammer_batch(opens, highs, lows, closes, 'down')
+    shooting_stars = is_shooting_star_batch(opens, highs, lows, closes, 'up')
+    
+    previous_resistance, previous_support = backtester.sr_tracker.update_levels_batch(highs, lows, timestamps_ns)
+    double_tops, double_bottoms = backtester.strategy.double_patterns_batch(
+        highs, lows, previous_resistance, previous_support
+    )
+    
+    high_list, low_list = highs.tolist(), lows.tolist()
+    signals_by_bar = {}
+    for i in np.flatnonzero(hammers | shooting_stars).tolist():
+        if i < warmup_bars:
+            continue
+        
+        candle = {'high': high_list[i], 'low': low_list[i]}
+        signals = backtester.strategy.generate_signals(
+            candle, trends[i],
+            hammer=bool(hammers[i]), shooting_star=bool(shooting_stars[i]),
+            double_top=bool(double_tops[i]), double_bottom=bool(double_bottoms[i])
+        )
+        if signals:
+            signals_by_bar[i] = signals
+    
+    return signals_by_bar
+
+def _sharpe_ratios(daily_profit, daily_trades, initial_balance):
+    """Per-path Sharpe over days with at least one closed trade."""
+    risk_free_rate = 0.02
+    daily_rf_rate = (1 + risk_free_rate) ** (1/252) - 1
+    
+    has_trades = daily_trades > 0
+    days = has_trades.sum(axis=1)
+    excess = np.where(has_trades, daily_profit / initial_balance - daily_rf_rate, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = excess.sum(axis=1) / days
+        deviation = np.where(has_trades, excess - mean[:, None], 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=1) / (days - 1))
+        sharpe = np.sqrt(252) * (mean / std)
+    return np.where(days > 1, sharpe, 0.0)
+
+def simulate_slippage_paths(df, n_paths=1000, seed=0, initial_balance=10000, warmup_bars=0,
+                            compute_indicators=True, block_size=256, funding_rates=None):
+    """Replay one signal sequence under n_paths independent slippage paths at once.
+    
+    Positions live in (n_paths, MAX_POSITIONS) slot arrays, so funding, TP/SL
+    checks and entries are one vectorized step per bar for all paths. Entry
+    and exit rules, fees and funding follow Backtester. Returns one row of
+    PATH_METRICS per path.
+    """
+    if compute_indicators:
+        df = add_strategy_indicators(df)
+    
+    backtester = Backtester(initial_balance=initial_balance, verbose=False, funding_rates=funding_rates)
+    n = len(df)
+    warmup_bars = min(warmup_bars, n)
+    signals_by_bar = collect_signals(backtester, df, warmup_bars)
+    
+    timestamps_ns = df['timestamp'].dt.as_unit('ns').astype('int64').to_numpy()
+    highs = df['high'].to_numpy(dtype=np.float64)
+    lows = df['low'].to_numpy(dtype=np.float64)
+    closes = df['close'].to_numpy(dtype=np.float64)
+    day_index, _ = pd.factorize(df['timestamp'].dt.date)
+    _, funding_bars, funding_rates = backtester.funding_schedule(timestamps_ns, warmup_bars)
+    funding_by_bar = {}
+    for bar, rate in zip(funding_bars.tolist(), funding_rates.tolist()):
+        funding_by_bar.setdefault(bar, []).append(rate)
+    
+    slots = config.MAX_POSITIONS
+    entry_seed, exit_seed = np.random.SeedSequence(seed).spawn(2)
+    entry_slippage = SlippageStream(n_paths, 1, backtester.avg_slippage, entry_seed, block_size)
+    exit_slippage = SlippageStream(n_paths, slots, backtester.avg_slippage, exit_seed, block_size)
+    
+    # Per-path state; slot arrays hold open positions, seq keeps entry order
+    balance = np.full(n_paths, float(initial_balance))
+    active = np.zeros((n_paths, slots), dtype=bool)
+    is_buy = np.zeros((n_paths, slots), dtype=bool)
+    entry_price = np.zeros((n_paths, slots))
+    stop_loss = np.zeros((n_paths, slots))
+    take_profit = np.zeros((n_paths, slots))
+    size = np.zeros((n_paths, slots))
+    entry_fee = np.zeros((n_paths, slots))
+    funding = np.zeros((n_paths, slots))
+    seq = np.zeros((n_paths, slots), dtype=np.int64)
+    next_seq = 0
+    
+    # Trade statistics accumulated in trade order
+    n_days = int(day_index.max()) + 1 if n else 0
+    daily_profit = np.zeros((n_paths, n_days))
+    daily_trades = np.zeros((n_paths, n_days), dtype=np.int64)
+    total_trades = np.zeros(n_paths, dtype=np.int64)
+    winning_trades = np.zeros(n_paths, dtype=np.int64)
+    cumulative_profit = np.zeros(n_paths)
+    peak_profit = np.full(n_paths, -np.inf)
+    max_drawdown = np.zeros(n_paths)
+    
+    rows = np.arange(n_paths)
+    fee_rate = backtester.taker_fee
+    
+    for i in range(warmup_bars, n):
+        close = closes[i]
+        any_open = active.any()
+        
+        # Funding at each 8h boundary mapped to this bar
+        if any_open:
+            for funding_rate in funding_by_bar.get(i, ()):
+                fees = np.where(active, size * close * np.where(is_buy, funding_rate, -funding_rate), 0.0)
+                funding += fees
+                balance -= fees.sum(axis=1)
+        
+        # TP/SL for every open slot on every path
+        if any_open:
+            slippage = exit_slippage.draw()
+            actual_price = np.where(is_buy, close * (1 - slippage), close * (1 + slippage))
+            tp_hit = np.where(is_buy, actual_price >= take_profit, actual_price <= take_profit)
+            sl_hit = np.where(is_buy, actual_price <= stop_loss, actual_price >= stop_loss)
+            closed = active & (tp_hit | sl_hit)
+            
+            if closed.any():
+                exit_price = np.where(tp_hit, take_profit, stop_loss)
+                exit_fee = exit_price * size * fee_rate
+                price_diff = np.where(is_buy, exit_price - entry_price, entry_price - exit_price)
+                profit = np.where(
+                    closed,
+                    price_diff * size * config.LEVERAGE - entry_fee - exit_fee - funding,
+                    0.0
+                )
+                
+                closed_count = closed.sum(axis=1)
+                balance += profit.sum(axis=1)
+                total_trades += closed_count
+                winning_trades += (closed & (profit > 0)).sum(axis=1)
+                daily_profit[:, day_index[i]] += profit.sum(axis=1)
+                daily_trades[:, day_index[i]] += closed_count
+                
+                # Drawdown of cumulative trade profit, walking trades in entry order
+                order = np.argsort(np.where(closed, seq, np.iinfo(np.int64).max), axis=1, kind='stable')
+                cumulative = cumulative_profit[:, None] + np.cumsum(
+                    np.take_along_axis(profit, order, axis=1), axis=1
+                )
+                running_peak = np.maximum(peak_profit[:, None], np.maximum.accumulate(cumulative, axis=1))
+                traded = closed_count > 0
+                max_drawdown = np.where(
+                    traded, np.minimum(max_drawdown, (cumulative - running_peak).min(axis=1)), max_drawdown
+                )
+                peak_profit = np.where(traded, running_peak[:, -1], peak_profit)
+                cumulative_profit = cumulative[:, -1]
+                
+                active &= ~closed
+                funding[closed] = 0.0
+        
+        # Entries: same signals on every path, filled only where a slot is free
+        for signal in signals_by_bar.get(i, ()):
+            can_open = active.sum(axis=1) < slots
+            if not can_open.any():
+                continue
+            
+            buy = signal['type'] == 'buy'
+            slip = entry_slippage.draw()[:, 0]
+            fill = close * (1 + slip) if buy else close * (1 - slip)
+            stop = stop_loss_price(float(lows[i]), float(highs[i]), signal['type'])
+            target = take_profit_price(fill, stop, signal['type'])
+            position_size = entry_position_size(fill, stop, balance, initial_balance)
+            
+            opening = can_open & (position_size * fill >= backtester.min_order_amount)
+            if not opening.any():
+                continue
+            
+            slot = np.argmin(active, axis=1)
+            fee = fill * position_size * fee_rate
+            balance -= np.where(opening, fee, 0.0)
+            
+            target_rows, target_slots = rows[opening], slot[opening]
+            active[target_rows, target_slots] = True
+            is_buy[target_rows, target_slots] = buy
+            entry_price[target_rows, target_slots] = fill[opening]
+            stop_loss[target_rows, target_slots] = stop
+            take_profit[target_rows, target_slots] = target[opening]
+            size[target_rows, target_slots] = position_size[opening]
+            entry_fee[target_rows, target_slots] = fee[opening]
+            funding[target_rows, target_slots] = 0.0
+            seq[target_rows, target_slots] = next_seq
+            next_seq += 1
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(total_trades > 0, winning_trades / total_trades * 100, 0.0)
+    
+    return pd.DataFrame({
+        'final_balance': balance,
+        'total_return': (balance - initial_balance) / initial_balance * 100,
+        'max_drawdown': np.abs(max_drawdown / initial_balance) * 100,
+        'sharpe_ratio': _sharpe_ratios(daily_profit, daily_trades, initial_balance),
+        'total_trades': total_trades,
+        'win_rate': win_rate
+    })
+
+def summarize_paths(paths, confidence=0.95):
+    """Mean, standard deviation and central confidence interval of each path metric."""
+    tail = (1 - confidence) / 2 * 100
+    summary = pd.DataFrame({
+        'mean': paths.mean(),
+        'std': paths.std(),
+        'lower': paths.quantile(tail / 100),
+        'median': paths.median(),
+        'upper': paths.quantile(1 - tail / 100)
+    })
+    summary.index.name = 'metric'
+    return summary.reset_index()
+
+def run_monte_carlo(csv_filename, n_paths=1000, seed=0, initial_balance=10000, confidence=0.95):
+    """Load a candle CSV, simulate n_paths slippage paths and summarize them."""
+    paths = simulate_slippage_paths(load_candles(csv_filename), n_paths, seed, initial_balance)
+    return paths, summarize_paths(paths, confidence)
+
+def main():
+    in_sample_file = (
+        f"{config.SYMBOL}_{config.TIMEFRAME}_{config.IN_SAMPLE_START.strftime('%Y%m%d')}_"
+        f"{config.IN_SAMPLE_END.strftime('%Y%m%d')}_UTC_in_sample.csv"
+    )
+    out_sample_file = (
+        f"{config.SYMBOL}_{config.TIMEFRAME}_{config.OUT_OF_SAMPLE_START.strftime('%Y%m%d')}_"
+        f"{config.OUT_OF_SAMPLE_END.strftime('%Y%m%d')}_UTC_out_of_sample.csv"
+    )
+    
+    summaries = []
+    for sample, csv_filename in (('in_sample', in_sample_file), ('out_of_sample', out_sample_file)):
+        _, summary = run_monte_carlo(csv_filename)
+        summary.insert(0, 'sample', sample)
+        summaries.append(summary)
+        print(f"\n{sample} (1000 slippage paths, 95% interval):")
+        print(summary.to_string(index=False))
+    
+    pd.concat(summaries, ignore_index=True).to_csv('monte_carlo_intervals.csv', index=False)
+    print("\nConfidence intervals saved to 'monte_carlo_intervals.csv'")
+
+if __name__ == "__main__":
+    main()
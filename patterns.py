@@ -1,4 +1,5 @@
 # patterns.py
+import numpy as np
 from config import BODY_TO_SHADOW_RATIO, DOJI_THRESHOLD
 
 def calculate_candle_properties(candle):
@@ -69,6 +70,74 @@ def is_shooting_star(candle, trend='up'):
         # In downtrend, inverted hammer can be bullish signal
         return is_star and props['is_bullish']
 
+def is_doji(candle):
+    """Identify doji pattern (body small relative to total range)."""
+    props = calculate_candle_properties(candle)
+    
+    if props['total_range'] == 0:
+        return False
+    
+    return props['body_size'] / props['total_range'] <= DOJI_THRESHOLD
+
+def calculate_candle_properties_batch(open_prices, high_prices, low_prices, close_prices):
+    """Calculate candlestick properties for whole arrays at once."""
+    open_prices = np.asarray(open_prices, dtype=np.float64)
+    high_prices = np.asarray(high_prices, dtype=np.float64)
+    low_prices = np.asarray(low_prices, dtype=np.float64)
+    close_prices = np.asarray(close_prices, dtype=np.float64)
+    
+    total_range = high_prices - low_prices
+    body_size = np.abs(close_prices - open_prices)
+    
+    # body_size / total_range, with zero-range candles left at 0 (they never match)
+    body_ratio = np.zeros_like(total_range)
+    np.divide(body_size, total_range, out=body_ratio, where=total_range != 0)
+    
+    return {
+        'body_size': body_size,
+        'upper_shadow': high_prices - np.maximum(open_prices, close_prices),
+        'lower_shadow': np.minimum(open_prices, close_prices) - low_prices,
+        'total_range': total_range,
+        'body_ratio': body_ratio,
+        'is_bullish': close_prices > open_prices
+    }
+
+def is_hammer_batch(open_prices, high_prices, low_prices, close_prices, trend='down'):
+    """Boolean mask version of is_hammer over whole arrays."""
+    props = calculate_candle_properties_batch(open_prices, high_prices, low_prices, close_prices)
+    
+    # Hammer and hanging man share the same shape, so trend does not change the mask
+    return (
+        (props['total_range'] != 0) &
+        (props['lower_shadow'] > props['body_size'] * BODY_TO_SHADOW_RATIO) &
+        (props['upper_shadow'] < props['body_size']) &
+        (props['body_ratio'] < 0.5)
+    )
+
+def is_shooting_star_batch(open_prices, high_prices, low_prices, close_prices, trend='up'):
+    """Boolean mask version of is_shooting_star over whole arrays."""
+    props = calculate_candle_properties_batch(open_prices, high_prices, low_prices, close_prices)
+    
+    is_star = (
+        (props['total_range'] != 0) &
+        (props['upper_shadow'] > props['body_size'] * BODY_TO_SHADOW_RATIO) &
+        (props['lower_shadow'] < props['body_size']) &
+        (props['body_ratio'] < 0.5)
+    )
+    
+    if trend == 'up':
+        # In uptrend, shooting star is bearish signal
+        return is_star & ~props['is_bullish']
+    else:
+        # In downtrend, inverted hammer can be bullish signal
+        return is_star & props['is_bullish']
+
+def is_doji_batch(open_prices, high_prices, low_prices, close_prices):
+    """Boolean mask version of is_doji over whole arrays."""
+    props = calculate_candle_properties_batch(open_prices, high_prices, low_prices, close_prices)
+    
+    return (props['total_range'] != 0) & (props['body_ratio'] <= DOJI_THRESHOLD)
+
 def detect_double_top(resistance_levels, current_high, price_threshold):
     """Detect double top pattern using resistance levels."""
     if len(resistance_levels) < 2:
@@ -91,4 +160,18 @@ def detect_double_bottom(support_levels, current_low, price_threshold):
     
     price_diff = abs(current_low - previous_support) / previous_support
     
-    return price_diff <= price_threshold
\ No newline at end of file
+    return price_diff <= price_threshold
+
+def detect_double_top_batch(previous_resistance, high_prices, price_threshold):
+    """Boolean mask version of detect_double_top, given the second most recent
+    resistance level at each bar (NaN where there are fewer than two)."""
+    previous_resistance = np.asarray(previous_resistance, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return np.abs(np.asarray(high_prices, dtype=np.float64) - previous_resistance) / previous_resistance <= price_threshold
+
+def detect_double_bottom_batch(previous_support, low_prices, price_threshold):
+    """Boolean mask version of detect_double_bottom, given the second most recent
+    support level at each bar (NaN where there are fewer than two)."""
+    previous_support = np.asarray(previous_support, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return np.abs(np.asarray(low_prices, dtype=np.float64) - previous_support) / previous_support <= price_threshold
\ No newline at end of file
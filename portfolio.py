@@ -0,0 +1,320 @@
+# portfolio.py
+import numpy as np
+import pandas as pd
+import config
+from backtest import Backtester
+from funding import FundingSchedule, load_funding_rates
+from indicators import SupportResistanceTracker, level_candidates
+from patterns import is_hammer_batch, is_shooting_star_batch
+from resample import add_strategy_indicators
+
+def align_symbols(candles):
+    """Put per-symbol candle frames on one merged, time-sorted bar clock.
+    
+    Returns (symbols, timestamps_ns, present, columns): present[t, s] says
+    whether symbol s has a bar at merged time t, and columns maps each numeric
+    column to a (bars, symbols) float array that is NaN where a bar is missing.
+    """
+    symbols = list(candles)
+    stamps = [df['timestamp'].dt.as_unit('ns').astype('int64').to_numpy() for df in candles.values()]
+    timestamps_ns = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+    
+    n_bars, n_symbols = len(timestamps_ns), len(symbols)
+    present = np.zeros((n_bars, n_symbols), dtype=bool)
+    rows = []
+    for s, symbol_stamps in enumerate(stamps):
+        row = np.searchsorted(timestamps_ns, symbol_stamps)
+        present[row, s] = True
+        rows.append(row)
+    
+    columns = {}
+    shared = set.intersection(*(set(df.columns) for df in candles.values())) - {'timestamp'} if candles else set()
+    for column in sorted(shared):
+        if not pd.api.types.is_numeric_dtype(next(iter(candles.values()))[column]):
+            continue
+        grid = np.full((n_bars, n_symbols), np.nan)
+        for s, df in enumerate(candles.values()):
+            grid[rows[s], s] = df[column].to_numpy(dtype=np.float64)
+        columns[column] = grid
+    
+    return symbols, timestamps_ns, present, columns
+
+class SymbolLevels:
+    """Bounded support or resistance level lists for many symbols in one ring array.
+    
+    Row s holds symbol s's levels in insertion order, evicting the oldest
+    once max_len is reached, with the same semantics as the deques in
+    SupportResistanceTracker.
+    """
+    
+    def __init__(self, n_symbols, max_len):
+        self.max_len = max_len
+        self.levels = np.full((n_symbols, max_len), np.nan)
+        self.start = np.zeros(n_symbols, dtype=np.int64)
+        self.count = np.zeros(n_symbols, dtype=np.int64)
+        self._slots = np.arange(max_len)
+    
+    def has_level_near(self, symbols, prices, threshold):
+        """For each (symbol, price), whether a level lies within threshold (relative to the level)."""
+        levels = self.levels[symbols]
+        valid = (self._slots - self.start[symbols, None]) % self.max_len < self.count[symbols, None]
+        with np.errstate(invalid='ignore'):
+            near = np.abs(prices[:, None] - levels) / levels <= threshold
+        return (near & valid).any(axis=1)
+    
+    def add(self, symbols, prices, keep):
+        """Append one level per symbol; levels with keep False are pruned right away.
+        
+        A pruned level still evicts the oldest level of a full list, as
+        appending to a bounded deque and then removing the new entry does.
+        """
+        full = self.count[symbols] == self.max_len
+        evicting = symbols[full]
+        self.start[evicting] = (self.start[evicting] + 1) % self.max_len
+        self.count[evicting] -= 1
+        
+        slots = (self.start[symbols] + self.count[symbols]) % self.max_len
+        self.levels[symbols, slots] = prices
+        self.count[symbols] += keep
+    
+    def recent(self, k):
+        """k-th most recent level of every symbol (k=1 is the newest), NaN if missing."""
+        rows = np.arange(len(self.count))
+        values = self.levels[rows, (self.start + self.count - k) % self.max_len]
+        return np.where(self.count >= k, values, np.nan)
+
+class PortfolioBacktester(Backtester):
+    """Backtest a basket of symbols that share one margin account.
+    
+    Symbols advance together on a merged bar clock. Trend, candle patterns and
+    support/resistance levels are kept per symbol in (bars, symbols) and
+    (symbols, levels) arrays and updated for all symbols in one vectorized
+    step per bar, so adding symbols does not add Python objects to the loop.
+    Balance, fees, funding and the position book are shared: max_positions
+    (default MAX_POSITIONS) caps open positions across the whole portfolio,
+    with optional per-symbol and gross-exposure limits. With one symbol and
+    no extra limits the trades match Backtester exactly.
+    """
+    
+    def __init__(self, initial_balance=10000, max_positions=None, max_positions_per_symbol=None,
+                 max_gross_exposure=None, verbose=True, funding_rates=None, equity_decimation=1,
+                 record_funding_history=False):
+        # Per-symbol funding rates ({symbol: Series or CSV path}) are resolved in run_portfolio
+        shared_rates = None if isinstance(funding_rates, dict) else funding_rates
+        super().__init__(
+            initial_balance, verbose=verbose, funding_rates=shared_rates,
+            equity_decimation=equity_decimation, record_funding_history=record_funding_history
+        )
+        self.symbol_funding_rates = funding_rates if isinstance(funding_rates, dict) else {}
+        self.max_positions = max_positions
+        self.max_positions_per_symbol = max_positions_per_symbol
+        self.max_gross_exposure = max_gross_exposure  # Open notional / initial balance
+        self.symbols = []
+    
+    def load_portfolio(self, csv_files, use_cache=True):
+        """Load {symbol: csv path} into {symbol: candle DataFrame}."""
+        return {
+            symbol: self.load_data(csv_filename, use_cache=use_cache)
+            for symbol, csv_filename in csv_files.items()
+        }
+    
+    def run_portfolio(self, candles, warmup_bars=0, compute_indicators=True):
+        """Run the basket {symbol: candle DataFrame} and return portfolio statistics.
+        
+        warmup_bars counts merged-clock bars that only feed the level state.
+        """
+        if compute_indicators:
+            candles = {symbol: add_strategy_indicators(df) for symbol, df in candles.items()}
+        
+        symbols, timestamps_ns, present, columns = align_symbols(candles)
+        self.symbols = symbols
+        n_bars, n_symbols = present.shape
+        warmup_bars = min(warmup_bars, n_bars)
+        self._log(f"Processing {n_bars} bars for {n_symbols} symbols...")
+        
+        opens, highs, lows, closes = columns['open'], columns['high'], columns['low'], columns['close']
+        # Trend is missing (neither up nor down) before the first TREND_TIMEFRAME bar closes
+        trend_up = np.zeros((n_bars, n_symbols), dtype=bool)
+        trend_down = np.zeros((n_bars, n_symbols), dtype=bool)
+        # Level candidates come from each symbol's own bar sequence
+        level_grids = [np.zeros((n_bars, n_symbols), dtype=bool) for _ in range(2)]
+        level_grids.append(np.full((n_bars, n_symbols), np.nan))
+        level_grids += [np.zeros((n_bars, n_symbols), dtype=bool) for _ in range(2)]
+        level_grids.append(np.full((n_bars, n_symbols), np.nan))
+        for s, df in enumerate(candles.values()):
+            rows = present[:, s]
+            trend_up[rows, s] = df['trend'].to_numpy() == 'up'
+            trend_down[rows, s] = df['trend'].to_numpy() == 'down'
+            events = level_candidates(df['high'].to_numpy(), df['low'].to_numpy())
+            for grid, values in zip(level_grids, events):
+                grid[rows, s] = values
+        resistance, resistance_keep, resistance_price, support, support_keep, support_price = level_grids
+        
+        with np.errstate(invalid='ignore'):
+            hammers = is_hammer_batch(opens, highs, lows, closes, 'down') & present
+            shooting_stars = is_shooting_star_batch(opens, highs, lows, closes, 'up') & present
+        
+        tz = next(iter(candles.values()))['timestamp'].dt.tz if candles else None
+        timestamps = pd.DatetimeIndex(timestamps_ns.view('datetime64[ns]')).tz_localize('UTC')
+        if tz is not None:
+            timestamps = timestamps.tz_convert(tz)
+        timestamps = timestamps.tolist()
+        self.equity_curve.reserve(n_bars - warmup_bars, tz=str(tz) if tz is not None else None)
+        
+        funding_events = self._portfolio_funding_events(timestamps_ns, warmup_bars)
+        funding_ptr = 0
+        
+        max_len = config.DEQUE_MAX_LEN
+        resistance_levels = SymbolLevels(n_symbols, max_len)
+        support_levels = SymbolLevels(n_symbols, max_len)
+        touch_threshold = SupportResistanceTracker.TOUCH_THRESHOLD
+        last_close = np.full(n_symbols, np.nan)
+        
+        for t in range(n_bars):
+            row_close = closes[t]
+            np.copyto(last_close, row_close, where=present[t])
+            
+            if t >= warmup_bars:
+                # Balance and mark-to-market equity (last known close per symbol)
+                equity = self.balance
+                if self.book.count:
+                    position_prices = last_close[self.book.symbol[:self.book.count]]
+                    equity += float(self.book.unrealized_pnl(position_prices, config.LEVERAGE))
+                self.equity_curve.append(timestamps_ns[t], self.balance, equity)
+                
+                # Funding for every open position at its symbol's latest close
+                while funding_ptr < len(funding_events) and funding_events[funding_ptr][0] == t:
+                    _, funding_ns, symbol_rates = funding_events[funding_ptr]
+                    position_symbols = self.book.symbol[:self.book.count]
+                    funding_time = pd.Timestamp(int(funding_ns), tz='UTC')
+                    self._charge_funding(
+                        funding_time, last_close[position_symbols], symbol_rates[position_symbols]
+                    )
+                    self.last_funding_time = funding_time
+                    funding_ptr += 1
+                
+                # TP/SL for every open position; symbols without a bar never hit (NaN price)
+                if self.book.count:
+                    self._check_exits(row_close[self.book.symbol[:self.book.count]], timestamps[t])
+            
+            # Support/resistance levels for every symbol with a new level candidate
+            for candidates, keep, prices, levels in (
+                (resistance[t], resistance_keep[t], resistance_price[t], resistance_levels),
+                (support[t], support_keep[t], support_price[t], support_levels)
+            ):
+                if not candidates.any():
+                    continue
+                candidate_symbols = np.flatnonzero(candidates)
+                candidate_prices = prices[candidate_symbols]
+                fresh = ~levels.has_level_near(candidate_symbols, candidate_prices, touch_threshold)
+                levels.add(candidate_symbols[fresh], candidate_prices[fresh], keep[candidate_symbols[fresh]])
+            
+            if t < warmup_bars:
+                continue
+            
+            candle_symbols = np.flatnonzero(hammers[t] | shooting_stars[t])
+            if not len(candle_symbols):
+                continue
+            
+            signals_by_symbol = self._portfolio_signals(
+                t, candle_symbols, trend_up, trend_down, hammers, shooting_stars, highs, lows,
+                resistance_levels, support_levels
+            )
+            for s, signals in signals_by_symbol:
+                candle = {
+                    'timestamp': timestamps[t],
+                    'open': float(opens[t, s]),
+                    'high': float(highs[t, s]),
+                    'low': float(lows[t, s]),
+                    'close': float(row_close[s])
+                }
+                self.process_symbol_signals(s, candle, signals)
+            
+            if t % 1000 == 0:
+                self._log(f"Processed {t} bars...")
+        
+        self._log("\nPortfolio backtest completed.")
+        return self.calculate_statistics()
+    
+    def run_portfolio_files(self, csv_files, warmup_bars=0):
+        """Load {symbol: csv path} and run the basket."""
+        return self.run_portfolio(self.load_portfolio(csv_files), warmup_bars)
+    
+    def _portfolio_signals(self, t, symbols, trend_up, trend_down, hammers, shooting_stars, highs, lows,
+                           resistance_levels, support_levels):
+        """Signals per symbol in TradingStrategy.generate_signals order."""
+        threshold = config.PRICE_THRESHOLD
+        previous_resistance = resistance_levels.recent(2)[symbols]
+        previous_support = support_levels.recent(2)[symbols]
+        with np.errstate(invalid='ignore'):
+            double_top = np.abs(highs[t, symbols] - previous_resistance) / previous_resistance <= threshold
+            double_bottom = np.abs(lows[t, symbols] - previous_support) / previous_support <= threshold
+        
+        result = []
+        for j, s in enumerate(symbols.tolist()):
+            hammer, star = hammers[t, s], shooting_stars[t, s]
+            signals = []
+            if trend_down[t, s] and hammer:
+                signals.append({'type': 'buy', 'pattern': 'hammer', 'strength': 1})
+            if trend_up[t, s] and star:
+                signals.append({'type': 'sell', 'pattern': 'shooting_star', 'strength': 1})
+            if star and double_top[j]:
+                signals.append({'type': 'sell', 'pattern': 'double_top_shooting_star', 'strength': 2})
+            if hammer and double_bottom[j]:
+                signals.append({'type': 'buy', 'pattern': 'double_bottom_hammer', 'strength': 2})
+            if signals:
+                result.append((s, signals))
+        return result
+    
+    def process_symbol_signals(self, symbol_index, candle, signals):
+        """Open positions for one symbol's signals under the portfolio-wide limits."""
+        max_positions = self.max_positions if self.max_positions is not None else config.MAX_POSITIONS
+        for signal in signals:
+            n = self.book.count
+            if n >= max_positions:
+                continue
+            if (self.max_positions_per_symbol is not None and
+                    np.count_nonzero(self.book.symbol[:n] == symbol_index) >= self.max_positions_per_symbol):
+                continue
+            
+            position = self._build_position(candle, signal)
+            if position is None:
+                continue
+            
+            if self.max_gross_exposure is not None:
+                open_notional = float(np.dot(self.book.entry_price[:n], self.book.size[:n]))
+                notional = position['entry_price'] * position['size']
+                if open_notional + notional > self.max_gross_exposure * self.initial_balance:
+                    continue
+            
+            position['symbol'] = self.symbols[symbol_index]
+            position['symbol_index'] = symbol_index
+            self.balance -= position['entry_fee']
+            self.book.open(position)
+    
+    def _portfolio_funding_events(self, timestamps_ns, start):
+        """[(bar, funding time ns, per-symbol rate array)] on the merged clock."""
+        funding_times_ns, funding_bars, shared_rates = self.funding_schedule(timestamps_ns, start)
+        rates = np.repeat(shared_rates[:, None], len(self.symbols), axis=1)
+        for s, symbol in enumerate(self.symbols):
+            symbol_rates = self.symbol_funding_rates.get(symbol)
+            if symbol_rates is None:
+                continue
+            if isinstance(symbol_rates, str):
+                symbol_rates = load_funding_rates(symbol_rates)
+            schedule = FundingSchedule(self.funding_interval, self.funding_rate, symbol_rates)
+            rates[:, s] = schedule.rates_at(funding_times_ns)
+        return list(zip(funding_bars.tolist(), funding_times_ns.tolist(), rates))
+
+def main():
+    in_sample_file = (
+        f"{config.SYMBOL}_{config.TIMEFRAME}_{config.IN_SAMPLE_START.strftime('%Y%m%d')}_"
+        f"{config.IN_SAMPLE_END.strftime('%Y%m%d')}_UTC_in_sample.csv"
+    )
+    backtester = PortfolioBacktester(initial_balance=10000)
+    stats = backtester.run_portfolio_files({config.SYMBOL: in_sample_file})
+    for metric in ('total_return', 'sharpe_ratio', 'max_drawdown', 'total_trades'):
+        print(f"{metric}: {stats[metric]}")
+
+if __name__ == "__main__":
+    main()
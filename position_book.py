@@ -0,0 +1,231 @@
+# position_book.py
+import numpy as np
+
+BUY = 1
+SELL = -1
+SMALL_BOOK = 7  # Up to this many positions per-bar checks loop over Python floats (NumPy call overhead dominates)
+
+class PositionBook:
+    """Open positions stored as parallel NumPy arrays (struct of arrays).
+    
+    Side, entry, stop, target, size, entry fee, accumulated funding and symbol live in
+    arrays so TP/SL checks, exit prices and PnL for every open position are
+    evaluated in one vectorized step per bar. Books of at most SMALL_BOOK
+    positions are evaluated with a scalar loop instead, which gives the same
+    floats (NumPy sums fewer than 8 values sequentially). The original
+    position dicts are kept alongside (in the same order) for trade records.
+    """
+    
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.records = []
+        self._rows = None  # Python-float copy of the open positions for the small-book path
+        self._quiet = None  # (max_slippage, low, high) from quiet_range
+        self._allocate(capacity)
+    
+    def _allocate(self, capacity):
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self.entry_price = np.zeros(capacity)
+        self.stop_loss = np.zeros(capacity)
+        self.take_profit = np.zeros(capacity)
+        self.size = np.zeros(capacity)
+        self.entry_fee = np.zeros(capacity)
+        self.funding = np.zeros(capacity)
+        self.symbol = np.zeros(capacity, dtype=np.int32)
+    
+    def _arrays(self):
+        return (self.side, self.entry_price, self.stop_loss, self.take_profit,
+                self.size, self.entry_fee, self.funding, self.symbol)
+    
+    def __len__(self):
+        return self.count
+    
+    def _grow(self):
+        old = self._arrays()
+        self._allocate(max(16, len(self.side) * 2))
+        for new_array, old_array in zip(self._arrays(), old):
+            new_array[:self.count] = old_array[:self.count]
+    
+    def open(self, position):
+        """Add a position dict (type, entry_price, stop_loss, take_profit, size, entry_fee).
+        
+        An optional 'symbol_index' key places the position in a multi-symbol
+        book, so per-position prices can be gathered with prices[book.symbol].
+        """
+        if self.count == len(self.side):
+            self._grow()
+        
+        i = self.count
+        self.side[i] = BUY if position['type'] == 'buy' else SELL
+        self.entry_price[i] = position['entry_price']
+        self.stop_loss[i] = position['stop_loss']
+        self.take_profit[i] = position['take_profit']
+        self.size[i] = position['size']
+        self.entry_fee[i] = position['entry_fee']
+        self.funding[i] = sum(f['fee'] for f in position.get('funding_fees', []))
+        self.symbol[i] = position.get('symbol_index', 0)
+        self.records.append(position)
+        self.count += 1
+        self._rows = None
+        self._quiet = None
+    
+    def funding_fees(self, price, funding_rate):
+        """Funding charge per open position at price (longs pay a positive rate)."""
+        n = self.count
+        rates = np.where(self.side[:n] == SELL, -funding_rate, funding_rate)
+        fees = self.size[:n] * price * rates
+        self.funding[:n] += fees
+        self._rows = None
+        return fees, rates
+    
+    def exit_hits(self, price, slippage):
+        """(take_profit_hit, stop_loss_hit) masks for the open positions.
+        
+        price can be a scalar with slippage of shape (n,), or a column of bar
+        prices (shape (bars, 1)) with slippage of shape (bars, n) to scan a
+        whole block of bars at once.
+        """
+        n = self.count
+        is_buy = self.side[:n] == BUY
+        take_profit = self.take_profit[:n]
+        stop_loss = self.stop_loss[:n]
+        
+        actual_price = np.where(is_buy, price * (1 - slippage), price * (1 + slippage))
+        tp_hit = np.where(is_buy, actual_price >= take_profit, actual_price <= take_profit)
+        sl_hit = np.where(is_buy, actual_price <= stop_loss, actual_price >= stop_loss)
+        return tp_hit, sl_hit
+    
+    def quiet_range(self, max_slippage):
+        """(low, high) such that a price strictly inside hits no TP or SL.
+        
+        Holds for any slippage draw in [0, max_slippage]: longs fill at or
+        below the price and shorts at or above it. The bounds are pulled in
+        by a relative margin far above rounding error, so prices outside the
+        range still have to go through evaluate_exits.
+        """
+        if self._quiet is None or self._quiet[0] != max_slippage:
+            n = self.count
+            low, high = -np.inf, np.inf
+            if n:
+                is_buy = self.side[:n] == BUY
+                take_profit = self.take_profit[:n]
+                stop_loss = self.stop_loss[:n]
+                margin = 1e-9
+                low = float((np.where(is_buy, stop_loss / (1 - max_slippage), take_profit) * (1 + margin)).max())
+                high = float((np.where(is_buy, take_profit, stop_loss / (1 + max_slippage)) * (1 - margin)).min())
+            self._quiet = (max_slippage, low, high)
+        return self._quiet[1], self._quiet[2]
+    
+    def unrealized_pnl(self, price, leverage):
+        """Total PnL of the open positions if closed at price with no exit costs.
+        
+        Uses the same formula as evaluate_exits (net of entry fee and funding).
+        price can be a scalar or a column of bar prices (shape (bars, 1)), which
+        gives one total per bar.
+        """
+        n = self.count
+        if n <= SMALL_BOOK and not isinstance(price, np.ndarray):
+            total = 0.0
+            for side, entry_price, _, _, size, entry_fee, funding in self._small_rows():
+                total += (price - entry_price) * side * size * leverage - entry_fee - funding
+            return total
+        
+        side = self.side[:n]
+        pnl = (
+            (price - self.entry_price[:n]) * side * self.size[:n] * leverage
+            - self.entry_fee[:n]
+            - self.funding[:n]
+        )
+        return pnl.sum(axis=-1)
+    
+    def evaluate_exits(self, price, slippage, fee_rate, leverage):
+        """Vectorized TP/SL check for all open positions at one bar.
+        
+        slippage holds one draw per open position. Longs are checked against a
+        sell fill and shorts against a buy fill; take profit wins over stop loss.
+        Returns (closed_index, status, exit_price, exit_fee, profit) for closed
+        positions, with profit already net of entry/exit fees and funding.
+        """
+        n = self.count
+        if n <= SMALL_BOOK and not isinstance(price, np.ndarray):
+            return self._evaluate_exits_small(price, slippage, fee_rate, leverage)
+        
+        is_buy = self.side[:n] == BUY
+        take_profit = self.take_profit[:n]
+        stop_loss = self.stop_loss[:n]
+        
+        tp_hit, sl_hit = self.exit_hits(price, slippage)
+        closed = np.flatnonzero(tp_hit | sl_hit)
+        
+        if len(closed) == 0:
+            return closed, None, None, None, None
+        
+        tp = tp_hit[closed]
+        exit_price = np.where(tp, take_profit[closed], stop_loss[closed])
+        size = self.size[closed]
+        entry_price = self.entry_price[closed]
+        exit_fee = exit_price * size * fee_rate
+        price_diff = np.where(is_buy[closed], exit_price - entry_price, entry_price - exit_price)
+        profit = (
+            price_diff * size * leverage
+            - self.entry_fee[closed]
+            - exit_fee
+            - self.funding[closed]
+        )
+        status = np.where(tp, 'take_profit', 'stop_loss')
+        return closed, status, exit_price, exit_fee, profit
+    
+    def _evaluate_exits_small(self, price, slippage, fee_rate, leverage):
+        """evaluate_exits for a small book, one position at a time in Python floats."""
+        rows = self._small_rows()
+        closed, take_profit_hits = [], []
+        for i, ((side, _, stop_loss, take_profit, _, _, _), slip) in enumerate(zip(rows, slippage.tolist())):
+            if side == BUY:
+                actual_price = price * (1 - slip)
+                tp_hit, sl_hit = actual_price >= take_profit, actual_price <= stop_loss
+            else:
+                actual_price = price * (1 + slip)
+                tp_hit, sl_hit = actual_price <= take_profit, actual_price >= stop_loss
+            if tp_hit or sl_hit:
+                closed.append(i)
+                take_profit_hits.append(tp_hit)
+        
+        if not closed:
+            return np.empty(0, dtype=np.intp), None, None, None, None
+        
+        status, exit_prices, exit_fees, profits = [], [], [], []
+        for i, tp in zip(closed, take_profit_hits):
+            side, entry_price, stop_loss, take_profit, size, entry_fee, funding = rows[i]
+            exit_price = take_profit if tp else stop_loss
+            exit_fee = exit_price * size * fee_rate
+            price_diff = exit_price - entry_price if side == BUY else entry_price - exit_price
+            status.append('take_profit' if tp else 'stop_loss')
+            exit_prices.append(exit_price)
+            exit_fees.append(exit_fee)
+            profits.append(price_diff * size * leverage - entry_fee - exit_fee - funding)
+        return np.array(closed, dtype=np.intp), status, exit_prices, exit_fees, profits
+    
+    def remove(self, indices):
+        """Drop the positions at indices, keeping the rest in order."""
+        if len(indices) == 0:
+            return
+        
+        n = self.count
+        keep = np.ones(n, dtype=bool)
+        keep[indices] = False
+        remaining = int(keep.sum())
+        for array in self._arrays():
+            array[:remaining] = array[:n][keep]
+        
+        drop = set(int(i) for i in indices)
+        self.records = [r for i, r in enumerate(self.records) if i not in drop]
+        self.count = remaining
+        self._rows = None
+        self._quiet = None
+    
+    def _small_rows(self):
+        """(side, entry_price, stop_loss, take_profit, size, entry_fee, funding) per position as Python values."""
+        if self._rows is None:
+            n = self.count
+            self._rows = list(zip(*(array[:n].tolist() for array in self._arrays()[:7])))
+        return self._rows
@@ -0,0 +1,135 @@
+# profiler.py
+import json
+import os
+import time
+from array import array
+from contextlib import contextmanager
+import numpy as np
+
+class StageProfiler:
+    """Cumulative time, call counts and latency percentiles per named stage.
+    
+    Stages are timed by wrapping callables (wrap/instrument) or with the
+    stage() context manager. Every call's duration is kept as int64
+    nanoseconds, so percentiles are exact; with trace=True start times are
+    kept too and can be exported as a Chrome trace (chrome://tracing, Perfetto).
+    """
+    
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.origin_ns = time.perf_counter_ns()
+        self._durations = {}  # Stage -> array('q') of call durations (ns)
+        self._starts = {}  # Stage -> array('q') of call start times (ns), trace only
+    
+    def _buffers(self, name):
+        if name not in self._durations:
+            self._durations[name] = array('q')
+            self._starts[name] = array('q')
+        return self._durations[name], self._starts[name]
+    
+    def wrap(self, name, func):
+        """func timed under stage name."""
+        durations, starts = self._buffers(name)
+        clock = time.perf_counter_ns
+        
+        if self.trace:
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    durations.append(clock() - start)
+                    starts.append(start)
+        else:
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    durations.append(clock() - start)
+        
+        timed.__wrapped__ = func
+        return timed
+    
+    def instrument(self, obj, method_name, name=None):
+        """Shadow obj.method_name with a timed instance attribute.
+        
+        The class method is wrapped, not the current attribute, so instrumenting
+        the same object again does not nest timers.
+        """
+        method = getattr(type(obj), method_name).__get__(obj, type(obj))
+        setattr(obj, method_name, self.wrap(name or method_name, method))
+    
+    @contextmanager
+    def stage(self, name):
+        durations, starts = self._buffers(name)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            durations.append(time.perf_counter_ns() - start)
+            if self.trace:
+                starts.append(start)
+    
+    def reset(self):
+        self.origin_ns = time.perf_counter_ns()
+        for buffers in (self._durations, self._starts):
+            for values in buffers.values():
+                del values[:]
+    
+    def summary(self):
+        """{stage: calls, total_ms, mean_us, p50_us, p95_us, p99_us, max_us}."""
+        summary = {}
+        for name, durations in self._durations.items():
+            if not durations:
+                continue
+            values = np.frombuffer(durations, dtype=np.int64) / 1000  # us
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[name] = {
+                'calls': len(values),
+                'total_ms': float(values.sum() / 1000),
+                'mean_us': float(values.mean()),
+                'p50_us': float(p50),
+                'p95_us': float(p95),
+                'p99_us': float(p99),
+                'max_us': float(values.max())
+            }
+        return summary
+    
+    def flat_summary(self, fields=('calls', 'total_ms', 'p99_us')):
+        """summary() as {'<stage>_<field>': value}, for one-row-per-run tables."""
+        return {
+            f'{name}_{field}': stats[field]
+            for name, stats in self.summary().items() for field in fields
+        }
+    
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+    
+    def to_chrome_trace(self, path):
+        """Write recorded calls as complete ('X') events in Chrome trace format."""
+        if not self.trace:
+            raise ValueError("StageProfiler(trace=True) is needed for a Chrome trace")
+        
+        pid = os.getpid()
+        events = []
+        for name, durations in self._durations.items():
+            starts = np.frombuffer(self._starts[name], dtype=np.int64)
+            starts_us = ((starts - self.origin_ns) / 1000).tolist()
+            durations_us = (np.frombuffer(durations, dtype=np.int64) / 1000).tolist()
+            events.extend(
+                {'name': name, 'ph': 'X', 'ts': ts, 'dur': dur, 'pid': pid, 'tid': 0}
+                for ts, dur in zip(starts_us, durations_us)
+            )
+        events.sort(key=lambda event: event['ts'])
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    
+    def report(self):
+        """Plain-text table of stages by total time."""
+        lines = [f"{'stage':20} {'calls':>9} {'total ms':>10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>10}"]
+        for name, s in sorted(self.summary().items(), key=lambda item: -item[1]['total_ms']):
+            lines.append(f"{name:20} {s['calls']:9d} {s['total_ms']:10.1f} {s['mean_us']:9.1f} "
+                         f"{s['p50_us']:9.1f} {s['p99_us']:9.1f} {s['max_us']:10.1f}")
+        return '\n'.join(lines)
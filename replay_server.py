@@ -0,0 +1,394 @@
+# replay_server.py
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import config
+from candle_store import load_columns
+from data_collector import timeframe_to_ms
+from live_trader import PaperTrader, parse_kline_message
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """Unmasked, unfragmented server-to-client websocket frame."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack('!BB', 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+    return header + payload
+
+async def read_frame(reader):
+    """(opcode, payload) of the next client frame, unmasked."""
+    head = await reader.readexactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    mask = await reader.readexactly(4) if head[1] & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return head[0] & 0x0F, payload
+
+def stream_name(symbol, timeframe=config.TIMEFRAME):
+    return f"{symbol.lower()}@kline_{timeframe}"
+
+def kline_payload(symbol, timeframe, open_ms, interval_ms, o, h, l, c, v):
+    """JSON of the 'k' object of a closed Binance kline, prices as strings."""
+    return json.dumps({
+        't': open_ms, 'T': open_ms + interval_ms - 1, 's': symbol, 'i': timeframe,
+        'f': 0, 'L': 0, 'o': repr(o), 'c': repr(c), 'h': repr(h), 'l': repr(l),
+        'v': repr(v), 'n': 0, 'x': True, 'q': '0', 'V': '0', 'Q': '0', 'B': '0'
+    }, separators=(',', ':'))
+
+class KlineReplay:
+    """Time-ordered closed klines of several symbols, with injected gaps and duplicates.
+    
+    sources maps symbol -> candle CSV (read through the candle_store cache);
+    one CSV may back several symbols to fake a wide universe. Each bar is
+    dropped with probability gap_rate and otherwise sent twice with
+    probability duplicate_rate, drawn once from seed so every consumer sees
+    the same faults.
+    """
+    
+    def __init__(self, sources, timeframe=config.TIMEFRAME, gap_rate=0.0, duplicate_rate=0.0,
+                 seed=0, max_bars=None):
+        self.timeframe = timeframe
+        self.interval_ms = timeframe_to_ms(timeframe)
+        self.symbols = list(sources)
+        self.klines = []  # Per symbol, pre-encoded 'k' objects by row
+        
+        open_ms, symbol_ids, rows = [], [], []
+        for s, (symbol, csv_filename) in enumerate(sources.items()):
+            columns, _ = load_columns(csv_filename)
+            stamps = np.asarray(columns['timestamp'][:max_bars]) // 1_000_000
+            values = [np.asarray(columns[c][:max_bars]).tolist() for c in ('open', 'high', 'low', 'close', 'volume')]
+            self.klines.append([
+                kline_payload(symbol, timeframe, t, self.interval_ms, *bar)
+                for t, *bar in zip(stamps.tolist(), *values)
+            ])
+            open_ms.append(stamps)
+            symbol_ids.append(np.full(len(stamps), s, dtype=np.int32))
+            rows.append(np.arange(len(stamps)))
+        
+        open_ms = np.concatenate(open_ms) if open_ms else np.empty(0, dtype=np.int64)
+        symbol_ids = np.concatenate(symbol_ids) if symbol_ids else np.empty(0, dtype=np.int32)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        order = np.lexsort((symbol_ids, open_ms))
+        
+        rng = np.random.default_rng(seed)
+        keep = rng.random(len(order)) >= gap_rate
+        duplicate = keep & (rng.random(len(order)) < duplicate_rate)
+        copies = keep.astype(np.int64) + duplicate
+        self.gaps = int((~keep).sum())
+        self.duplicates = int(duplicate.sum())
+        
+        self.close_ms = np.repeat(open_ms[order] + self.interval_ms, copies[order])
+        self.symbol_ids = np.repeat(symbol_ids[order], copies[order])
+        self.rows = np.repeat(rows[order], copies[order])
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def select(self, symbols=None):
+        """Message indices for the given symbols (all when None)."""
+        if symbols is None:
+            return np.arange(len(self))
+        wanted = [self.symbols.index(symbol) for symbol in symbols]
+        return np.flatnonzero(np.isin(self.symbol_ids, wanted))
+    
+    def message(self, i, event_ms, combined=False):
+        """Text of message i as a raw or combined-stream kline event."""
+        s = self.symbol_ids[i]
+        symbol = self.symbols[s]
+        text = f'{{"e":"kline","E":{event_ms},"s":"{symbol}","k":{self.klines[s][self.rows[i]]}}}'
+        if combined:
+            return f'{{"stream":"{stream_name(symbol, self.timeframe)}","data":{text}}}'
+        return text
+
+class ReplayServer:
+    """Local websocket server replaying a KlineReplay in Binance kline stream format.
+    
+    Paths follow Binance: /ws/<stream>[/<stream>...] for raw messages,
+    /stream?streams=<a>/<b> for the combined wrapper, / for every symbol.
+    speed is the replay speed-up (1 real time, 1000, ...) and None sends as
+    fast as the consumer reads; a ?speed= query overrides it per connection.
+    Bar close is shifted onto the wall clock at connect time and sent as the
+    event time E, so a consumer's E-to-processed lag is its lag behind bar close.
+    """
+    
+    def __init__(self, replay, speed=None, host='127.0.0.1', port=0, high_water_bytes=1 << 20,
+                 verbose=True):
+        self.replay = replay
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.high_water_bytes = high_water_bytes
+        self.verbose = verbose
+        self.reports = []
+        self._server = None
+        self._loop = None
+        self._thread = None
+    
+    def url(self, symbols=None, combined=False):
+        """Client URL for some symbols, or every symbol when None."""
+        if symbols is None:
+            return f"ws://{self.host}:{self.port}/"
+        streams = '/'.join(stream_name(symbol, self.replay.timeframe) for symbol in symbols)
+        if combined:
+            return f"ws://{self.host}:{self.port}/stream?streams={streams}"
+        return f"ws://{self.host}:{self.port}/ws/{streams}"
+    
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._log(f"Replaying {len(self.replay)} klines of {len(self.replay.symbols)} symbols on {self.url()}")
+        return self
+    
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    def start_in_thread(self):
+        """Run the server on its own event loop in a daemon thread; returns once listening."""
+        ready = threading.Event()
+        
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+        
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+    
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+    
+    def _route(self, target):
+        """(symbols or None, combined, speed) for a request target, or None if unknown."""
+        parts = urlsplit(target)
+        query = parse_qs(parts.query)
+        speed = self.speed
+        if 'speed' in query:
+            value = query['speed'][0]
+            speed = None if value in ('max', '0') else float(value)
+        
+        by_stream = {stream_name(symbol, self.replay.timeframe): symbol for symbol in self.replay.symbols}
+        path = parts.path.rstrip('/')
+        if path in ('', '/ws'):
+            return None, False, speed
+        if path.startswith('/ws/'):
+            streams, combined = path[len('/ws/'):].split('/'), False
+        elif path == '/stream' and 'streams' in query:
+            streams, combined = query['streams'][0].split('/'), True
+        else:
+            return None
+        symbols = [by_stream[stream] for stream in streams if stream in by_stream]
+        return (symbols, combined, speed) if symbols else None
+    
+    async def _handshake(self, reader, writer):
+        """Complete the HTTP upgrade; returns the route or None after an error reply."""
+        request = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+        lines = request.split('\r\n')
+        target = lines[0].split(' ')[1]
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        
+        route = self._route(target)
+        key = headers.get('sec-websocket-key')
+        if key is None or headers.get('upgrade', '').lower() != 'websocket' or route is None:
+            status = '400 Bad Request' if key is None else '404 Not Found'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            return None
+        
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return route
+    
+    async def _handle(self, reader, writer):
+        try:
+            route = await self._handshake(reader, writer)
+            if route is None:
+                return
+            
+            symbols, combined, speed = route
+            stream = asyncio.ensure_future(self._stream(writer, symbols, combined, speed))
+            closed_by_client = asyncio.ensure_future(self._read_until_close(reader, writer))
+            await asyncio.wait((stream, closed_by_client), return_when=asyncio.FIRST_COMPLETED)
+            if not stream.done():
+                stream.cancel()
+            else:
+                report = stream.result()
+                self.reports.append(report)
+                self._log(self.format_report(report))
+                writer.write(encode_frame(struct.pack('!H', 1000), OP_CLOSE))
+                await writer.drain()
+                await asyncio.wait_for(closed_by_client, timeout=1)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.CancelledError,
+                ConnectionError, IndexError):
+            pass  # Client went away, sent a bad request, or the server is stopping
+        finally:
+            writer.close()
+    
+    async def _read_until_close(self, reader, writer):
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == OP_CLOSE:
+                return
+            if opcode == OP_PING:
+                writer.write(encode_frame(payload, OP_PONG))
+    
+    async def _stream(self, writer, symbols, combined, speed):
+        """Send the selected klines at the replay speed and measure how far sends lag."""
+        replay = self.replay
+        loop = asyncio.get_running_loop()
+        indices = replay.select(symbols).tolist()
+        close_ms = replay.close_ms
+        first_close = close_ms[indices[0]] if indices else 0
+        start, wall_start_ms = loop.time(), time.time() * 1000
+        
+        sent_bytes = 0
+        max_buffer = 0
+        drain_seconds = 0.0
+        lateness_ms = []  # Send time behind schedule, once per bar close
+        previous_close = None
+        for n, i in enumerate(indices):
+            bar_close = close_ms[i]
+            if speed:
+                offset_ms = (bar_close - first_close) / speed
+                if bar_close != previous_close:
+                    delay = offset_ms / 1000 - (loop.time() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    lateness_ms.append(max(0.0, (loop.time() - start) * 1000 - offset_ms))
+                event_ms = int(wall_start_ms + offset_ms)
+            else:
+                event_ms = int(time.time() * 1000)
+            previous_close = bar_close
+            
+            frame = encode_frame(replay.message(i, event_ms, combined).encode())
+            writer.write(frame)
+            sent_bytes += len(frame)
+            buffered = writer.transport.get_write_buffer_size()
+            max_buffer = max(max_buffer, buffered)
+            if buffered > self.high_water_bytes:
+                drain_start = loop.time()
+                await writer.drain()  # Consumer is behind; wait for it
+                drain_seconds += loop.time() - drain_start
+            elif n % 1000 == 999:
+                await asyncio.sleep(0)
+        await writer.drain()
+        
+        elapsed = loop.time() - start
+        report = {
+            'symbols': len(symbols) if symbols is not None else len(replay.symbols),
+            'speed': speed,
+            'messages': len(indices),
+            'bytes': sent_bytes,
+            'seconds': elapsed,
+            'messages_per_second': len(indices) / elapsed if elapsed > 0 else float('inf'),
+            'max_write_buffer_bytes': max_buffer,
+            'drain_seconds': drain_seconds
+        }
+        if lateness_ms:
+            p50, p99 = np.percentile(lateness_ms, [50, 99])
+            report.update({'lag_p50_ms': p50, 'lag_p99_ms': p99, 'lag_max_ms': max(lateness_ms)})
+        return report
+    
+    @staticmethod
+    def format_report(report):
+        text = (f"Sent {report['messages']} klines ({report['symbols']} symbols) in {report['seconds']:.2f}s: "
+                f"{report['messages_per_second']:.0f} msg/s, blocked {report['drain_seconds']:.2f}s "
+                f"on a slow consumer")
+        if 'lag_p99_ms' in report:
+            text += f", send lag p99 {report['lag_p99_ms']:.1f}ms max {report['lag_max_ms']:.1f}ms"
+        return text
+    
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+def run_soak_test(csv_filename, n_symbols=10, speed=1000, gap_rate=0.0, duplicate_rate=0.0,
+                  max_bars=None, seed=0):
+    """Replay one CSV as n_symbols symbols into one PaperTrader per symbol in this process.
+    
+    Returns (server report, per-trader latency summaries, behind) where behind
+    is the share of candles processed more than one replayed bar after their
+    scheduled send time, i.e. after the next bar was already due. Without a
+    speed there is no schedule and behind is None. Needs websocket-client.
+    """
+    import websocket
+    
+    symbols = [config.SYMBOL] + [f"{config.SYMBOL}{i}" for i in range(1, n_symbols)]
+    replay = KlineReplay({symbol: csv_filename for symbol in symbols}, gap_rate=gap_rate,
+                         duplicate_rate=duplicate_rate, seed=seed, max_bars=max_bars)
+    server = ReplayServer(replay, speed=speed, verbose=False).start_in_thread()
+    traders = {symbol: PaperTrader(symbol, verbose=False) for symbol in symbols}
+    
+    def on_message(ws, message):
+        candle = parse_kline_message(message)
+        if candle is not None:
+            traders[candle['symbol']].on_candle(candle)
+    
+    try:
+        websocket.WebSocketApp(server.url(symbols, combined=True), on_message=on_message).run_forever()
+    finally:
+        server.stop()
+    
+    # With a speed, each kline's event time E is its slot on the send schedule,
+    # so a delivery lag is the time from when the bar was due to when it was processed
+    behind = None
+    if speed:
+        bar_ms = replay.interval_ms / speed
+        lags = np.concatenate([np.fromiter(t.delivery_lags_ms, float) for t in traders.values()])
+        behind = float((lags > bar_ms).mean()) if len(lags) else 0.0
+    report = server.reports[-1] if server.reports else {}
+    return report, {symbol: t.latency_summary() for symbol, t in traders.items()}, behind
+
+def main():
+    in_sample_file = (
+        f"{config.SYMBOL}_{config.TIMEFRAME}_{config.IN_SAMPLE_START.strftime('%Y%m%d')}_"
+        f"{config.IN_SAMPLE_END.strftime('%Y%m%d')}_UTC_in_sample.csv"
+    )
+    for n_symbols in (1, 10, 50):
+        report, summaries, behind = run_soak_test(in_sample_file, n_symbols=n_symbols, speed=10000,
+                                                  max_bars=2000)
+        worst_p99 = max(s.get('delivery_lag_p99_ms', 0) for s in summaries.values())
+        print(f"{n_symbols} symbols: {ReplayServer.format_report(report)}; "
+              f"consumer lag p99 {worst_p99:.1f}ms, {behind:.1%} of candles behind bar close")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# resample.py
+import json
+import os
+import numpy as np
+import pandas as pd
+import config
+from candle_store import META_FILENAME, _atomic_save, cache_dir_for, load_columns
+from data_collector import timeframe_to_ms
+from indicators import StreamingIndicators, add_indicators
+
+RESAMPLE_VERSION = 1
+OHLCV = ('open', 'high', 'low', 'close', 'volume')
+WEEK_OFFSET_NS = 4 * 24 * 60 * 60 * 10**9  # Exchange weeks start on Monday; the epoch was a Thursday
+HIGHER_TIMEFRAME_COLUMNS = ('close_sma', 'close_upper_band', 'close_lower_band', 'trend')
+
+def _bucket_offset_ns(timeframe):
+    return WEEK_OFFSET_NS if timeframe.endswith('w') else 0
+
+def base_step_ns(timestamps_ns):
+    """Bar spacing of a base series (median gap, so missing bars don't matter)."""
+    if len(timestamps_ns) < 2:
+        raise ValueError("Need at least two bars to infer the base timeframe")
+    return int(np.median(np.diff(np.asarray(timestamps_ns[:10000], dtype=np.int64))))
+
+def aggregate_ohlcv(timestamps_ns, opens, highs, lows, closes, volumes, timeframe):
+    """Aggregate time-sorted base bars into epoch-aligned timeframe buckets.
+    
+    Returns a dict of arrays: timestamp (bucket open, epoch ns), open, high,
+    low, close, volume and bars (base bars in the bucket).
+    """
+    timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+    step_ns = timeframe_to_ms(timeframe) * 1_000_000
+    offset = _bucket_offset_ns(timeframe)
+    if not len(timestamps_ns):
+        empty = {column: np.empty(0) for column in OHLCV}
+        return {'timestamp': np.empty(0, dtype=np.int64), **empty, 'bars': np.empty(0, dtype=np.int64)}
+    
+    buckets = (timestamps_ns - offset) // step_ns * step_ns + offset
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(buckets)) + 1])
+    ends = np.append(starts[1:], len(buckets))
+    return {
+        'timestamp': buckets[starts],
+        'open': np.asarray(opens, dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(np.asarray(highs, dtype=np.float64), starts),
+        'low': np.minimum.reduceat(np.asarray(lows, dtype=np.float64), starts),
+        'close': np.asarray(closes, dtype=np.float64)[ends - 1],
+        'volume': np.add.reduceat(np.asarray(volumes, dtype=np.float64), starts),
+        'bars': ends - starts
+    }
+
+def _frame(columns, tz='UTC'):
+    timestamps = pd.DatetimeIndex(np.asarray(columns['timestamp']).view('datetime64[ns]'))
+    if tz is not None:
+        timestamps = timestamps.tz_localize('UTC').tz_convert(tz)
+    data = {'timestamp': timestamps}
+    data.update({c: np.asarray(columns[c]) for c in (*OHLCV, 'bars')})
+    return pd.DataFrame(data)
+
+def resample_candles(df, timeframe):
+    """Higher-timeframe candles from an in-memory base candle DataFrame."""
+    timestamps = df['timestamp']
+    tz = timestamps.dt.tz
+    columns = aggregate_ohlcv(
+        timestamps.dt.as_unit('ns').astype('int64').to_numpy(),
+        *(df[c].to_numpy() for c in OHLCV), timeframe
+    )
+    return _frame(columns, str(tz) if tz is not None else None)
+
+def resampled_cache_dir(csv_filename, timeframe):
+    return os.path.join(cache_dir_for(csv_filename), 'resampled', timeframe)
+
+def _read_resampled(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILENAME)) as f:
+            meta = json.load(f)
+        columns = {c: np.load(os.path.join(cache_dir, f'{c}.npy')) for c in ('timestamp', *OHLCV, 'bars')}
+    except (OSError, ValueError):
+        return None, None
+    return (columns, meta) if meta.get('version') == RESAMPLE_VERSION else (None, None)
+
+def load_resampled(csv_filename, timeframe, rebuild=False):
+    """Return ({column: array}, meta) for timeframe bars derived from a base CSV.
+    
+    Bars are cached under the CSV's candle_store cache, keyed by timeframe.
+    When the base only grew at the end (as sync_data appends), just the last
+    cached bucket and the new base bars are re-aggregated; if earlier base
+    rows changed (e.g. a filled gap), everything is rebuilt.
+    """
+    base, base_meta = load_columns(csv_filename)
+    timestamps = base['timestamp']
+    n = len(timestamps)
+    base_step = base_step_ns(timestamps)
+    step_ns = timeframe_to_ms(timeframe) * 1_000_000
+    if step_ns % base_step:
+        raise ValueError(f"{timeframe} is not a multiple of the base bar spacing")
+    
+    cache_dir = resampled_cache_dir(csv_filename, timeframe)
+    cached, meta = (None, None) if rebuild else _read_resampled(cache_dir)
+    prefix_unchanged = (
+        meta is not None and 0 < meta['base_rows'] <= n and
+        int(timestamps[0]) == meta['base_first_ns'] and
+        int(timestamps[meta['base_rows'] - 1]) == meta['base_last_ns']
+    )
+    if prefix_unchanged and meta['base_rows'] == n:
+        return cached, meta
+    
+    if prefix_unchanged and len(cached['timestamp']):
+        # Re-aggregate from the start of the last (possibly partial) cached bucket
+        keep = len(cached['timestamp']) - 1
+        start = int(np.searchsorted(timestamps, cached['timestamp'][keep]))
+    else:
+        keep, start = 0, 0
+    
+    fresh = aggregate_ohlcv(timestamps[start:], *(base[c][start:] for c in OHLCV), timeframe)
+    columns = {
+        c: np.concatenate([cached[c][:keep], fresh[c]]) if keep else fresh[c]
+        for c in ('timestamp', *OHLCV, 'bars')
+    }
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    for column, values in columns.items():
+        _atomic_save(os.path.join(cache_dir, f'{column}.npy'), values)
+    meta = {
+        'version': RESAMPLE_VERSION,
+        'timeframe': timeframe,
+        'base_rows': n,
+        'base_first_ns': int(timestamps[0]) if n else None,
+        'base_last_ns': int(timestamps[-1]) if n else None,
+        'rows': len(columns['timestamp']),
+        'bars_per_bucket': step_ns // base_step,
+        'tz': base_meta['tz']
+    }
+    tmp_meta = os.path.join(cache_dir, f"{META_FILENAME}.{os.getpid()}.tmp")
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(cache_dir, META_FILENAME))
+    return columns, meta
+
+def load_resampled_candles(csv_filename, timeframe):
+    """Cached timeframe candles as a DataFrame (base schema plus a bars count)."""
+    columns, meta = load_resampled(csv_filename, timeframe)
+    return _frame(columns, meta['tz'])
+
+def align_to_base(base_timestamps_ns, base_step, higher_timestamps_ns, higher_step):
+    """Index of the latest higher-timeframe bar closed when each base bar closes (-1 if none).
+    
+    A base bar opening at t closes at t + base_step; a higher bar opening at
+    T is only known from T + higher_step on. Using it any earlier would leak
+    its close (and high/low) into bars still inside it.
+    """
+    higher_close = np.asarray(higher_timestamps_ns, dtype=np.int64) + higher_step
+    base_close = np.asarray(base_timestamps_ns, dtype=np.int64) + base_step
+    return np.searchsorted(higher_close, base_close, side='right') - 1
+
+def add_higher_timeframe_indicators(df, timeframe, higher=None, columns=HIGHER_TIMEFRAME_COLUMNS):
+    """Add '<column>_<timeframe>' indicator columns aligned to df without look-ahead.
+    
+    higher is the timeframe's candles (e.g. from load_resampled_candles);
+    by default they are resampled from df itself. Indicators are computed on
+    the higher bars with add_indicators, and each base row sees the values of
+    the last higher bar that had closed by the base bar's close; earlier rows
+    get NaN in every column, the string trend column included.
+    """
+    base_ns = df['timestamp'].dt.as_unit('ns').astype('int64').to_numpy()
+    if higher is None:
+        higher = resample_candles(df, timeframe)
+    higher = add_indicators(higher[['timestamp', *OHLCV]].copy())
+    
+    step = base_step_ns(base_ns)
+    higher_ns = higher['timestamp'].dt.as_unit('ns').astype('int64').to_numpy()
+    index = align_to_base(base_ns, step, higher_ns, timeframe_to_ms(timeframe) * 1_000_000)
+    missing = index < 0
+    for column in columns:
+        values = higher[column].to_numpy()[np.maximum(index, 0)]
+        if values.dtype == object:
+            values = values.copy()
+            values[missing] = None
+        else:
+            values = np.where(missing, np.nan, values)
+        df[f'{column}_{timeframe}'] = values
+    return df
+
+def add_strategy_indicators(df, higher=None):
+    """add_indicators, with the trend taken from config.TREND_TIMEFRAME bars when it is set.
+    
+    config is read at call time, so parameter sweeps apply. higher is the
+    trend timeframe's candles (e.g. from load_resampled_candles); by default
+    they are resampled from df.
+    """
+    df = add_indicators(df)
+    timeframe = config.TREND_TIMEFRAME
+    if timeframe is not None:
+        df = add_higher_timeframe_indicators(df, timeframe, higher)
+        df['trend'] = df[f'trend_{timeframe}']
+    return df
+
+class StreamingHigherTimeframeTrend:
+    """Chunk-by-chunk equivalent of the trend column of add_higher_timeframe_indicators.
+    
+    Base bars are folded into epoch-aligned timeframe buckets as they arrive.
+    A bucket's open/close go to StreamingIndicators once a base bar closes at
+    or after the bucket's end (or the next bucket starts), and every base row
+    gets the trend of the last bucket closed by its own close (NaN before
+    the first one), as align_to_base does. The base bar spacing comes from
+    base_timeframe (default: config.TIMEFRAME), so chunks of any size work.
+    """
+    
+    def __init__(self, timeframe, base_timeframe=None):
+        self.timeframe = timeframe
+        self.step_ns = timeframe_to_ms(timeframe) * 1_000_000
+        self.offset_ns = _bucket_offset_ns(timeframe)
+        self.base_step = timeframe_to_ms(base_timeframe or config.TIMEFRAME) * 1_000_000
+        self.indicators = StreamingIndicators()
+        self.bucket = None  # Open time (ns) of the bucket being built
+        self.bucket_open = self.bucket_close = float('nan')
+        self.bucket_closed = False
+        self.trend = None
+    
+    def _close_bucket(self):
+        self.trend = self.indicators.update_from_prices(self.bucket_open, self.bucket_close)['trend']
+        self.bucket_closed = True
+    
+    def update(self, timestamp_ns, open_price, close_price):
+        """Add one base bar (open time in epoch ns); returns the trend its row sees."""
+        step = self.step_ns
+        bucket = (timestamp_ns - self.offset_ns) // step * step + self.offset_ns
+        if bucket != self.bucket:
+            if self.bucket is not None and not self.bucket_closed:
+                self._close_bucket()
+            self.bucket, self.bucket_open, self.bucket_closed = bucket, open_price, False
+        self.bucket_close = close_price
+        if timestamp_ns + self.base_step >= bucket + step:
+            self._close_bucket()
+        return self.trend
+    
+    def add_to_chunk(self, df):
+        """Add the 'trend_<timeframe>' column to the next chunk of the base series."""
+        update = self.update
+        df[f'trend_{self.timeframe}'] = [
+            update(t, open_price, close_price)
+            for t, open_price, close_price in zip(
+                df['timestamp'].dt.as_unit('ns').astype('int64').tolist(),
+                df['open'].to_numpy(dtype=np.float64).tolist(),
+                df['close'].to_numpy(dtype=np.float64).tolist()
+            )
+        ]
+        return df
@@ -0,0 +1,166 @@
+# running_stats.py
+import math
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.02  # 2% annual risk-free rate
+
+def _ratio_or_inf(numerator, denominator):
+    if denominator == 0:
+        return math.nan if numerator == 0 else math.copysign(math.inf, numerator)
+    return numerator / denominator
+
+class RunningStatistics:
+    """Backtest performance metrics kept up to date one closed trade at a time.
+    
+    Holds running sums for win rate, profit factor, win/loss ratio and the fee
+    breakdown, a running peak of cumulative trade profit for max drawdown, and
+    Welford mean/variance of daily returns (trade profit summed per exit date)
+    for Sharpe. snapshot() returns the same metrics as
+    Backtester.calculate_statistics in O(1).
+    """
+    
+    def __init__(self, initial_balance=10000):
+        self.initial_balance = initial_balance
+        self.total_trades = 0
+        self.profitable_trades = 0
+        self.losing_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.total_profit = 0.0
+        self.total_holding_time = 0.0
+        self.max_profit = -math.inf
+        self.max_loss = math.inf
+        self.total_entry_fees = 0.0
+        self.total_exit_fees = 0.0
+        self.total_funding_fees = 0.0
+        
+        # Drawdown of cumulative trade returns, peak starting at the first trade
+        self.cumulative_return = 0.0
+        self.peak_return = -math.inf
+        self.max_drawdown = 0.0
+        
+        # Closed days (Welford) plus the day still accumulating trades
+        self.days = 0
+        self.daily_mean = 0.0
+        self.daily_m2 = 0.0
+        self.current_day = None
+        self.current_day_return = 0.0
+    
+    def add_trade(self, trade):
+        """Fold in one closed trade dict (profit, fees, holding_time, exit_time)."""
+        profit = trade['profit']
+        self.total_trades += 1
+        self.total_profit += profit
+        self.total_holding_time += trade['holding_time']
+        self.max_profit = max(self.max_profit, profit)
+        self.max_loss = min(self.max_loss, profit)
+        if profit > 0:
+            self.profitable_trades += 1
+            self.gross_profit += profit
+        elif profit < 0:
+            self.losing_trades += 1
+            self.gross_loss += profit
+        
+        self.total_entry_fees += trade['entry_fee']
+        self.total_exit_fees += trade['exit_fee']
+        self.total_funding_fees += trade['total_funding_fees']
+        
+        trade_return = profit / self.initial_balance
+        self.cumulative_return += trade_return
+        self.peak_return = max(self.peak_return, self.cumulative_return)
+        self.max_drawdown = min(self.max_drawdown, self.cumulative_return - self.peak_return)
+        
+        day = trade['exit_time'].date()
+        if day != self.current_day:
+            if self.current_day is not None:
+                self._close_day(self.current_day_return)
+            self.current_day = day
+            self.current_day_return = 0.0
+        self.current_day_return += trade_return
+    
+    def _close_day(self, daily_return):
+        self.days += 1
+        delta = daily_return - self.daily_mean
+        self.daily_mean += delta / self.days
+        self.daily_m2 += delta * (daily_return - self.daily_mean)
+    
+    def daily_return_moments(self):
+        """(days, mean, sample variance) of daily returns, counting the open day."""
+        days, mean, m2 = self.days, self.daily_mean, self.daily_m2
+        if self.current_day is not None:
+            days += 1
+            delta = self.current_day_return - mean
+            mean += delta / days
+            m2 += delta * (self.current_day_return - mean)
+        variance = m2 / (days - 1) if days > 1 else math.nan
+        return days, mean, variance
+    
+    def snapshot(self, balance):
+        """Current metrics, with final_balance/total_return taken from balance."""
+        if not self.total_trades:
+            return self.empty_snapshot(balance)
+        
+        days, mean, variance = self.daily_return_moments()
+        std = math.sqrt(variance) if days > 1 else math.nan
+        daily_rf_rate = (1 + RISK_FREE_RATE) ** (1 / TRADING_DAYS) - 1
+        sharpe_ratio = (
+            math.sqrt(TRADING_DAYS) * _ratio_or_inf(mean - daily_rf_rate, std)
+            if days > 1 else 0
+        )
+        total_fees = self.total_entry_fees + self.total_exit_fees + self.total_funding_fees
+        
+        return {
+            'initial_balance': self.initial_balance,
+            'final_balance': balance,
+            'total_return': ((balance - self.initial_balance) / self.initial_balance) * 100,
+            'total_trades': self.total_trades,
+            'profitable_trades': self.profitable_trades,
+            'win_rate': (self.profitable_trades / self.total_trades) * 100,
+            'average_profit': self.total_profit / self.total_trades,
+            'max_profit': self.max_profit,
+            'max_loss': self.max_loss,
+            'average_holding_time': self.total_holding_time / self.total_trades,
+            'profit_factor': abs(_ratio_or_inf(self.gross_profit, self.gross_loss))
+                             if self.losing_trades else float('inf'),
+            'max_drawdown': abs(self.max_drawdown) * 100,
+            'win_loss_ratio': (
+                _ratio_or_inf(self.gross_profit / self.profitable_trades if self.profitable_trades else math.nan,
+                              abs(self.gross_loss / self.losing_trades))
+                if self.losing_trades else float('inf')
+            ),
+            'sharpe_ratio': sharpe_ratio,
+            'annualized_return': ((1 + mean) ** TRADING_DAYS - 1) * 100,
+            'annualized_volatility': std * math.sqrt(TRADING_DAYS) * 100,
+            'total_fees': total_fees,
+            'total_entry_fees': self.total_entry_fees,
+            'total_exit_fees': self.total_exit_fees,
+            'total_funding_fees': self.total_funding_fees,
+            'fees_to_profit_ratio': (total_fees / self.total_profit) * 100
+                                    if self.total_profit != 0 else float('inf')
+        }
+    
+    def empty_snapshot(self, balance):
+        """Metrics before any trade has closed."""
+        return {
+            'initial_balance': self.initial_balance,
+            'final_balance': balance,
+            'total_return': 0,
+            'total_trades': 0,
+            'profitable_trades': 0,
+            'win_rate': 0,
+            'average_profit': 0,
+            'max_profit': 0,
+            'max_loss': 0,
+            'average_holding_time': 0,
+            'profit_factor': 0,
+            'max_drawdown': 0,
+            'win_loss_ratio': 0,
+            'sharpe_ratio': 0,
+            'annualized_return': 0,
+            'annualized_volatility': 0,
+            'total_fees': 0,
+            'total_entry_fees': 0,
+            'total_exit_fees': 0,
+            'total_funding_fees': 0,
+            'fees_to_profit_ratio': 0
+        }
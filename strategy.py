@@ -1,10 +1,48 @@
 # strategy.py
 from patterns import (
     is_hammer, is_shooting_star,
-    detect_double_top, detect_double_bottom
+    detect_double_top, detect_double_bottom,
+    detect_double_top_batch, detect_double_bottom_batch
 )
+import numpy as np
 from config import MAX_CAPITAL_USAGE, PRICE_THRESHOLD, RISK_PER_TRADE, RISK_REWARD_RATIO, LEVERAGE
 
+# Entry rules shared by TradingStrategy, Backtester and the Monte Carlo
+# simulator. Prices, balances and sizes may be scalars or NumPy arrays.
+
+def stop_loss_price(low, high, position_type):
+    """Stop loss 0.5% below the signal candle's low (buy) or above its high (sell)."""
+    if position_type == 'buy':
+        return low * 0.995
+    return high * 1.005
+
+def take_profit_price(entry_price, stop_loss, position_type):
+    """Take profit RISK_REWARD_RATIO times the stop distance away from entry."""
+    price_difference = abs(entry_price - stop_loss)
+    if position_type == 'buy':
+        return entry_price + (price_difference * RISK_REWARD_RATIO)
+    return entry_price - (price_difference * RISK_REWARD_RATIO)
+
+def risk_position_size(entry_price, stop_loss, balance, initial_balance):
+    """Size risking RISK_PER_TRADE of balance, capped at MAX_CAPITAL_USAGE of initial_balance."""
+    max_allowed_capital = initial_balance * MAX_CAPITAL_USAGE
+    risk_amount = balance * RISK_PER_TRADE
+    position_size = (risk_amount / abs(entry_price - stop_loss)) * LEVERAGE
+    
+    # If notional value exceeds max allowed capital, reduce position size
+    exceeds = position_size * entry_price > max_allowed_capital
+    if np.ndim(exceeds):
+        return np.where(exceeds, max_allowed_capital / entry_price, position_size)
+    return max_allowed_capital / entry_price if exceeds else position_size
+
+def entry_position_size(entry_price, stop_loss, balance, initial_balance):
+    """Size of a new position: the risk-based size, never above the capital limit."""
+    max_size = (initial_balance * MAX_CAPITAL_USAGE) / entry_price
+    risk_based_size = risk_position_size(entry_price, stop_loss, balance, initial_balance)
+    if np.ndim(risk_based_size):
+        return np.minimum(max_size, risk_based_size)
+    return min(max_size, risk_based_size)
+
 class TradingStrategy:
     def __init__(self, sr_tracker):
         self.sr_tracker = sr_tracker
@@ -12,13 +50,28 @@ class TradingStrategy:
     
     def analyze_candle(self, candle, trend):
         """Analyze current candle for trading signals."""
-        signals = []
-        
         # Update support/resistance levels
         self.sr_tracker.update_levels(candle)
         
+        return self.generate_signals(candle, trend)
+    
+    def generate_signals(self, candle, trend, hammer=None, shooting_star=None,
+                         double_top=None, double_bottom=None):
+        """Generate signals for a candle whose levels are already updated.
+        
+        hammer/shooting_star can be passed in precomputed (e.g. from the batch
+        detectors in patterns.py) to skip the per-candle pattern checks, and
+        double_top/double_bottom likewise to skip the level lookups.
+        """
+        signals = []
+        
+        if hammer is None:
+            hammer = is_hammer(candle, 'down')
+        if shooting_star is None:
+            shooting_star = is_shooting_star(candle, 'up')
+        
         # Check for hammer in downtrend
-        if trend == 'down' and is_hammer(candle, 'down'):
+        if trend == 'down' and hammer:
             signals.append({
                 'type': 'buy',
                 'pattern': 'hammer',
@@ -26,7 +79,7 @@ class TradingStrategy:
             })
         
         # Check for shooting star in uptrend
-        if trend == 'up' and is_shooting_star(candle, 'up'):
+        if trend == 'up' and shooting_star:
             signals.append({
                 'type': 'sell',
                 'pattern': 'shooting_star',
@@ -34,11 +87,13 @@ class TradingStrategy:
             })
         
         # Check for double top with shooting star
-        if detect_double_top(
-            self.sr_tracker.resistance_levels,
-            float(candle['high']),
-            PRICE_THRESHOLD
-        ) and is_shooting_star(candle, 'up'):
+        if double_top is None:
+            double_top = shooting_star and detect_double_top(
+                self.sr_tracker.resistance_levels,
+                float(candle['high']),
+                PRICE_THRESHOLD
+            )
+        if shooting_star and double_top:
             signals.append({
                 'type': 'sell',
                 'pattern': 'double_top_shooting_star',
@@ -46,11 +101,13 @@ class TradingStrategy:
             })
         
         # Check for double bottom with hammer
-        if detect_double_bottom(
-            self.sr_tracker.support_levels,
-            float(candle['low']),
-            PRICE_THRESHOLD
-        ) and is_hammer(candle, 'down'):
+        if double_bottom is None:
+            double_bottom = hammer and detect_double_bottom(
+                self.sr_tracker.support_levels,
+                float(candle['low']),
+                PRICE_THRESHOLD
+            )
+        if hammer and double_bottom:
             signals.append({
                 'type': 'buy',
                 'pattern': 'double_bottom_hammer',
@@ -59,37 +116,22 @@ class TradingStrategy:
         
         return signals
     
+    def double_patterns_batch(self, highs, lows, previous_resistance, previous_support):
+        """Double top/bottom masks over whole arrays, from the second most recent
+        levels at each bar (as returned by update_levels_batch)."""
+        return (
+            detect_double_top_batch(previous_resistance, highs, PRICE_THRESHOLD),
+            detect_double_bottom_batch(previous_support, lows, PRICE_THRESHOLD)
+        )
+    
     def calculate_position_size(self, entry_price, stop_loss, balance, initial_balance):
         """Calculate position size based on risk management rules."""
-        # Calculate maximum allowed capital based on initial balance
-        max_allowed_capital = initial_balance * MAX_CAPITAL_USAGE
-        
-        # Calculate position size based on risk
-        risk_amount = balance * RISK_PER_TRADE
-        price_difference = abs(entry_price - stop_loss)
-        position_size = (risk_amount / price_difference) * LEVERAGE
-        
-        # Calculate notional value of the position
-        notional_value = position_size * entry_price
-        
-        # If notional value exceeds max allowed capital, reduce position size
-        if notional_value > max_allowed_capital:
-            position_size = max_allowed_capital / entry_price
-            
-        return position_size
+        return risk_position_size(entry_price, stop_loss, balance, initial_balance)
     
     def calculate_take_profit(self, entry_price, stop_loss, position_type):
         """Calculate take profit level based on risk:reward ratio."""
-        price_difference = abs(entry_price - stop_loss)
-        
-        if position_type == 'buy':
-            return entry_price + (price_difference * RISK_REWARD_RATIO)
-        else:
-            return entry_price - (price_difference * RISK_REWARD_RATIO)
+        return take_profit_price(entry_price, stop_loss, position_type)
     
     def calculate_stop_loss(self, candle, position_type):
         """Calculate stop loss level based on candle properties."""
-        if position_type == 'buy':
-            return float(candle['low']) * 0.995  # 0.5% below low
-        else:
-            return float(candle['high']) * 1.005  # 0.5% above high
\ No newline at end of file
+        return stop_loss_price(float(candle['low']), float(candle['high']), position_type)
@@ -0,0 +1,153 @@
+# sweep.py
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import config
+from candle_store import load_columns, columns_to_frame
+
+# Strategy parameters from config.py that a sweep may vary. Only parameters the
+# backtest actually reads belong here: MIN_PATTERN_BARS is unused and
+# DOJI_THRESHOLD only affects is_doji, which the strategy never calls.
+SWEEPABLE_PARAMETERS = (
+    'LEVERAGE', 'RISK_REWARD_RATIO', 'MAX_CAPITAL_USAGE', 'RISK_PER_TRADE', 'MAX_POSITIONS',
+    'CLOSE_BB_PERIOD', 'CLOSE_BB_STD', 'OPEN_BB_PERIOD', 'OPEN_BB_STD',
+    'DEQUE_MAX_LEN', 'PRICE_THRESHOLD', 'BODY_TO_SHADOW_RATIO', 'TREND_TIMEFRAME'
+)
+
+# Modules that bind config values with `from config import ...`
+_PARAMETER_MODULES = ('config', 'indicators', 'patterns', 'strategy', 'backtest')
+
+def validate_parameters(params):
+    """Raise ValueError for names that are not sweepable config parameters."""
+    unknown = sorted(set(params) - set(SWEEPABLE_PARAMETERS))
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(unknown)}")
+
+@contextmanager
+def override_parameters(params):
+    """Temporarily replace config parameters everywhere they were imported."""
+    validate_parameters(params)
+    import backtest  # noqa: F401  (make sure every parameter module is loaded)
+    
+    saved = []
+    try:
+        for module_name in _PARAMETER_MODULES:
+            module = sys.modules[module_name]
+            for name, value in params.items():
+                if hasattr(module, name):
+                    saved.append((module, name, getattr(module, name)))
+                    setattr(module, name, value)
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
+
+def parameter_grid(space):
+    """Every combination of a {name: [values]} space, as a list of dicts."""
+    validate_parameters(space)
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+def random_parameter_sets(space, n_samples, seed=None):
+    """n_samples distinct random combinations drawn from a {name: [values]} space."""
+    validate_parameters(space)
+    rng = np.random.default_rng(seed)
+    names = list(space)
+    total = int(np.prod([len(space[n]) for n in names]))
+    n_samples = min(n_samples, total)
+    
+    seen = set()
+    parameter_sets = []
+    while len(parameter_sets) < n_samples:
+        choice = tuple(int(rng.integers(len(space[n]))) for n in names)
+        if choice in seen:
+            continue
+        seen.add(choice)
+        parameter_sets.append({n: space[n][i] for n, i in zip(names, choice)})
+    return parameter_sets
+
+# Per-worker data, loaded once by _init_worker and shared read-only via mmap
+_worker_columns = None
+_worker_tz = None
+
+def _init_worker(csv_filename):
+    global _worker_columns, _worker_tz
+    _worker_columns, meta = load_columns(csv_filename)
+    _worker_tz = meta['tz']
+
+def run_parameter_set(params, initial_balance=10000, engine='array', seed=0, columns=None, tz='UTC',
+                      profile=False):
+    """Run one backtest with the given parameter overrides and return its statistics.
+    
+    With profile=True the row also carries per-stage timings
+    (<stage>_calls, <stage>_total_ms, <stage>_p99_us).
+    """
+    from backtest import Backtester
+    
+    if columns is None:
+        columns, tz = _worker_columns, _worker_tz
+    
+    with override_parameters(params):
+        # Same slippage stream for every parameter set, so results are comparable
+        np.random.seed(seed)
+        backtester = Backtester(initial_balance=initial_balance, verbose=False, profile=profile)
+        stats = backtester.run_on_data(columns_to_frame(columns, tz), engine=engine)
+    
+    if backtester.profiler is not None:
+        stats.update(backtester.profiler.flat_summary())
+    return {**params, **stats}
+
+def _run_task(task):
+    params, initial_balance, engine, seed, profile = task
+    return run_parameter_set(params, initial_balance, engine, seed, profile=profile)
+
+def run_sweep(csv_filename, parameter_sets, max_workers=None, initial_balance=10000,
+              engine='array', seed=0, chunksize=None, profile=False):
+    """Backtest every parameter set across a process pool.
+    
+    The candle data is converted once into the memory-mapped columnar cache
+    next to the CSV; each worker maps it read-only at startup. Returns one row
+    of calculate_statistics metrics per parameter set, in input order;
+    profile=True adds per-stage timing columns from each worker.
+    """
+    for params in parameter_sets:
+        validate_parameters(params)
+    
+    load_columns(csv_filename)  # Build/refresh the cache before workers map it
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(parameter_sets) // (max_workers * 4))
+    
+    tasks = [(params, initial_balance, engine, seed, profile) for params in parameter_sets]
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(csv_filename,)
+    ) as executor:
+        results = list(executor.map(_run_task, tasks, chunksize=chunksize))
+    
+    return pd.DataFrame(results)
+
+def main():
+    in_sample_file = (
+        f"{config.SYMBOL}_{config.TIMEFRAME}_{config.IN_SAMPLE_START.strftime('%Y%m%d')}_"
+        f"{config.IN_SAMPLE_END.strftime('%Y%m%d')}_UTC_in_sample.csv"
+    )
+    space = {
+        'RISK_REWARD_RATIO': [2, 3, 5],
+        'PRICE_THRESHOLD': [0.001, 0.002, 0.003],
+        'BODY_TO_SHADOW_RATIO': [1.5, 2, 2.5],
+    }
+    results = run_sweep(in_sample_file, parameter_grid(space))
+    results = results.sort_values('sharpe_ratio', ascending=False)
+    results.to_csv('sweep_results.csv', index=False)
+    print(results[list(space) + ['total_return', 'sharpe_ratio', 'max_drawdown', 'total_trades']].head(10))
+    print("\nSweep results saved to 'sweep_results.csv'")
+
+if __name__ == "__main__":
+    main()
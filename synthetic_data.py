@@ -0,0 +1,238 @@
+# synthetic_data.py
+import math
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import config
+from data_collector import timeframe_to_ms
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+DEFAULT_CHUNK_BARS = 1_000_000
+CSV_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+PAGE_BARS = 1 << 16  # Internal generation unit; output never depends on requested chunk sizes
+ABS_NORMAL_MEAN = math.sqrt(2 / math.pi)  # E|z| for standard normal z
+
+def _ar1(noise, phi, x0, block=128):
+    """x[t] = phi * x[t-1] + noise[t] from x[-1] = x0; returns (x, last x).
+    
+    Solved in closed form inside blocks of `block` bars, with only a scalar
+    loop carrying state from one block to the next.
+    """
+    n = len(noise)
+    if n == 0:
+        return np.empty(0), x0
+    e = np.concatenate([noise, np.zeros(-n % block)]).reshape(-1, block)
+    decay = phi ** np.arange(block)
+    within = np.cumsum(e / decay, axis=1) * decay  # Block-local AR(1) from zero
+    
+    carry = np.empty(len(within))  # x at the end of the previous block
+    last, phi_block = x0, phi ** block
+    for b, block_end in enumerate(within[:, -1].tolist()):
+        carry[b] = last
+        last = block_end + phi_block * last
+    x = (within + phi * decay * carry[:, None]).ravel()[:n]
+    return x, float(x[-1])
+
+class SyntheticMarket:
+    """Deterministic OHLCV generator: GBM with volatility regimes, jumps and clustered volume.
+    
+    Log returns are GBM whose annualized volatility switches between regimes
+    with geometric durations, scaled by an intraday (hour-of-day) profile,
+    plus Poisson jumps. High/low are drawn from the Brownian bridge extremes
+    between open and close, and each open is the previous close, as in
+    exchange klines. Volume is log-AR(1) with a response to the bar's absolute
+    return and to the volatility level.
+    
+    Each random component draws from its own stream spawned from seed, and
+    bars are generated in fixed pages of PAGE_BARS that next_chunk slices, so
+    the series depends only on seed and parameters, not on the chunk sizes
+    asked for.
+    """
+    
+    def __init__(self, seed=0, timeframe=config.TIMEFRAME,
+                 start=datetime(2020, 1, 1, tzinfo=timezone.utc), initial_price=30000.0,
+                 drift=0.0, regime_volatility=(0.35, 0.7, 1.4), regime_days=(7, 3, 1),
+                 intraday_amplitude=0.3, jumps_per_day=0.5, jump_size=0.01,
+                 volume_base=50.0, volume_persistence=0.97, volume_noise=0.4,
+                 volume_response=0.5, price_decimals=2, volume_decimals=5):
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        streams = [np.random.default_rng(s) for s in seed_sequence.spawn(5)]
+        self._regime_rng, self._return_rng, self._jump_rng, self._extreme_rng, self._volume_rng = streams
+        
+        self.timeframe = timeframe
+        self.step_ns = timeframe_to_ms(timeframe) * 1_000_000
+        self.dt = self.step_ns / 1e9 / SECONDS_PER_YEAR
+        bars_per_day = 86400e9 / self.step_ns
+        self.regime_volatility = np.asarray(regime_volatility, dtype=np.float64)
+        self.regime_mean_bars = np.asarray(regime_days, dtype=np.float64) * bars_per_day
+        self.drift = drift
+        self.intraday_amplitude = intraday_amplitude
+        self.jump_rate = jumps_per_day / bars_per_day
+        self.jump_size = jump_size
+        self.volume_base = volume_base
+        self.volume_persistence = volume_persistence
+        self.volume_noise = volume_noise
+        self.volume_response = volume_response
+        self.price_decimals = price_decimals
+        self.volume_decimals = volume_decimals
+        
+        # Carried between chunks
+        self.next_timestamp_ns = pd.Timestamp(start).as_unit('ns').value
+        self.log_price = math.log(initial_price)
+        self.volume_state = 0.0
+        self.bars_generated = 0
+        self._pending = None  # Generated but not yet returned part of the last page
+        self.regime = int(self._regime_rng.integers(len(self.regime_volatility)))
+        self.regime_left = self._regime_duration()
+    
+    def _regime_duration(self):
+        return int(self._regime_rng.geometric(1 / self.regime_mean_bars[self.regime]))
+    
+    def _regimes(self, n):
+        """Regime index per bar, switching to a different regime when one runs out."""
+        regimes = np.empty(n, dtype=np.int64)
+        filled = 0
+        while filled < n:
+            if self.regime_left == 0:
+                shift = 1 + int(self._regime_rng.integers(len(self.regime_volatility) - 1))
+                self.regime = (self.regime + shift) % len(self.regime_volatility)
+                self.regime_left = self._regime_duration()
+            take = min(self.regime_left, n - filled)
+            regimes[filled:filled + take] = self.regime
+            filled += take
+            self.regime_left -= take
+        return regimes
+    
+    def next_chunk(self, n):
+        """The next n bars as a DataFrame in the data_collector CSV schema."""
+        pieces, have = [], 0
+        while have < n:
+            if self._pending is None:
+                self._pending = self._generate_page(PAGE_BARS)
+            take = min(n - have, len(self._pending['open']))
+            pieces.append({column: values[:take] for column, values in self._pending.items()})
+            self._pending = {column: values[take:] for column, values in self._pending.items()}
+            if not len(self._pending['open']):
+                self._pending = None
+            have += take
+        self.bars_generated += n
+        
+        columns = {
+            column: np.concatenate([piece[column] for piece in pieces]) if pieces else np.empty(0)
+            for column in CSV_COLUMNS
+        }
+        timestamps_ns = columns.pop('timestamp').astype(np.int64)
+        return pd.DataFrame({
+            'timestamp': pd.DatetimeIndex(timestamps_ns.view('datetime64[ns]')).tz_localize('UTC'),
+            **columns
+        })
+    
+    def _generate_page(self, n):
+        """Column arrays for the next n bars, advancing the carried state."""
+        timestamps_ns = self.next_timestamp_ns + self.step_ns * np.arange(n, dtype=np.int64)
+        
+        # Annualized volatility per bar: regime level times the hour-of-day profile (peak 15:00 UTC)
+        hours = (timestamps_ns // 1_000_000_000 % 86400) / 3600
+        intraday = 1 + self.intraday_amplitude * np.cos(2 * np.pi * (hours - 15) / 24)
+        sigma = self.regime_volatility[self._regimes(n)] * intraday
+        bar_std = sigma * math.sqrt(self.dt)
+        
+        z = self._return_rng.standard_normal(n)
+        jump_counts = self._jump_rng.poisson(self.jump_rate, n)
+        jumps = self._jump_rng.standard_normal(n) * self.jump_size * np.sqrt(jump_counts)
+        returns = (self.drift - 0.5 * sigma ** 2) * self.dt + bar_std * z + jumps
+        
+        log_close = self.log_price + np.cumsum(returns)
+        log_open = np.concatenate([[self.log_price], log_close[:-1]])
+        
+        # Max/min of a Brownian bridge from 0 to r with variance bar_std^2 (plus the jump)
+        path_var = bar_std ** 2 + jumps ** 2
+        up = np.sqrt(returns ** 2 - 2 * path_var * np.log1p(-self._extreme_rng.random(n)))
+        down = np.sqrt(returns ** 2 - 2 * path_var * np.log1p(-self._extreme_rng.random(n)))
+        high_move, low_move = (returns + up) / 2, (returns - down) / 2
+        
+        opens = np.round(np.exp(log_open), self.price_decimals)
+        closes = np.round(np.exp(log_close), self.price_decimals)
+        highs = np.maximum(np.round(np.exp(log_open + high_move), self.price_decimals), np.maximum(opens, closes))
+        lows = np.minimum(np.round(np.exp(log_open + low_move), self.price_decimals), np.minimum(opens, closes))
+        
+        # Volume: persistent log level, more on large moves and in volatile regimes
+        phi = self.volume_persistence
+        noise = self._volume_rng.standard_normal(n) * self.volume_noise * math.sqrt(1 - phi ** 2)
+        level, self.volume_state = _ar1(noise, phi, self.volume_state)
+        shock = np.abs(returns) / bar_std - ABS_NORMAL_MEAN
+        volumes = self.volume_base * sigma / self.regime_volatility[0] * np.exp(
+            level + self.volume_response * np.minimum(shock, 4)
+        )
+        
+        self.log_price = float(log_close[-1])
+        self.next_timestamp_ns = int(timestamps_ns[-1]) + self.step_ns
+        return {
+            'timestamp': timestamps_ns,
+            'open': opens,
+            'high': highs,
+            'low': lows,
+            'close': closes,
+            'volume': np.round(volumes, self.volume_decimals)
+        }
+    
+    def chunks(self, n_bars, chunk_bars=DEFAULT_CHUNK_BARS):
+        """Yield the next n_bars bars as DataFrames of at most chunk_bars rows."""
+        remaining = n_bars
+        while remaining > 0:
+            n = min(chunk_bars, remaining)
+            yield self.next_chunk(n)
+            remaining -= n
+
+def synthetic_filename(symbol, n_bars, timeframe=config.TIMEFRAME,
+                       start=datetime(2020, 1, 1, tzinfo=timezone.utc)):
+    """File name in fetch_and_save_data's pattern, tagged as synthetic."""
+    end = start + timedelta(milliseconds=timeframe_to_ms(timeframe) * n_bars)
+    return f"{symbol}_{timeframe}_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}_UTC_synthetic.csv"
+
+def format_csv_rows(chunk):
+    """CSV text of a UTC candle chunk, byte-identical to DataFrame.to_csv but ~3x faster."""
+    timestamps = np.datetime_as_string(chunk['timestamp'].dt.tz_convert(None).to_numpy(), unit='s')
+    timestamps = np.char.add(np.char.replace(timestamps, 'T', ' '), '+00:00').tolist()
+    values = [list(map(repr, chunk[column].tolist())) for column in CSV_COLUMNS[1:]]
+    return ''.join(f"{row}\n" for row in map(','.join, zip(timestamps, *values)))
+
+def write_synthetic_csv(filename, n_bars, seed=0, chunk_bars=DEFAULT_CHUNK_BARS, **params):
+    """Stream n_bars synthetic candles to a CSV one chunk at a time.
+    
+    Memory stays bounded by chunk_bars, so 100M+ bar files are fine. The file
+    is written under a temporary name and renamed when complete.
+    """
+    market = SyntheticMarket(seed=seed, **params)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'w') as f:
+        f.write(','.join(CSV_COLUMNS) + '\n')
+        for chunk in market.chunks(n_bars, chunk_bars):
+            f.write(format_csv_rows(chunk))
+    os.replace(tmp_filename, filename)
+    return filename
+
+def generate_universe(symbols, n_bars, seed=0, directory='.', chunk_bars=DEFAULT_CHUNK_BARS, **params):
+    """Write one synthetic CSV per symbol; returns {symbol: path}.
+    
+    Symbol seeds are spawned from seed by position, so adding symbols at the
+    end leaves the existing series unchanged.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(symbols))
+    start = params.get('start', datetime(2020, 1, 1, tzinfo=timezone.utc))
+    timeframe = params.get('timeframe', config.TIMEFRAME)
+    paths = {}
+    for symbol, symbol_seed in zip(symbols, seeds):
+        path = os.path.join(directory, synthetic_filename(symbol, n_bars, timeframe, start))
+        paths[symbol] = write_synthetic_csv(path, n_bars, seed=symbol_seed, chunk_bars=chunk_bars, **params)
+    return paths
+
+def main():
+    n_bars = 365 * 24 * 12  # One year of 5m bars
+    paths = generate_universe([config.SYMBOL], n_bars)
+    for symbol, path in paths.items():
+        print(f"{symbol}: {n_bars} bars written to {path}")
+
+if __name__ == "__main__":
+    main()
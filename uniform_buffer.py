@@ -0,0 +1,57 @@
+# uniform_buffer.py
+import numpy as np
+
+class UniformBuffer:
+    """np.random.uniform(0, high, ...) draws from the global NumPy generator, taken in blocks.
+    
+    The legacy generator computes each uniform as 0 + high * random_sample()
+    and consumes one sample per value, so handing out slices of a block drawn
+    the same way gives exactly the values of the sequential calls. close()
+    rewinds the global generator to just past the values handed out, so
+    later draws continue the same stream.
+    """
+    
+    def __init__(self, high, block_size=4096):
+        self.high = high
+        self.block_size = block_size
+        self._state = None  # Generator state at the start of the current block
+        self._block = np.empty(0)
+        self._values = []
+        self._next = 0
+    
+    def draw(self, size=None):
+        """Next value (size=None, as a float) or next size values (as an array)."""
+        count = 1 if size is None else size
+        if self._next + count > len(self._values):
+            self._refill(count)
+        
+        start = self._next
+        self._next += count
+        if size is None:
+            return self._values[start]
+        return self._block[start:self._next]
+    
+    def skip(self, count):
+        """Consume count values without returning them."""
+        if self._next + count > len(self._values):
+            self._refill(count)
+        self._next += count
+    
+    def close(self):
+        """Leave the global generator where the sequential draws would have left it."""
+        if self._state is None:
+            return
+        np.random.set_state(self._state)
+        if self._next:
+            np.random.uniform(0, self.high, self._next)
+        self._state = None
+        self._block = np.empty(0)
+        self._values = []
+        self._next = 0
+    
+    def _refill(self, count):
+        # Unused values of the old block are drawn again at the front of the new one
+        self.close()
+        self._state = np.random.get_state()
+        self._block = np.random.uniform(0, self.high, max(self.block_size, count))
+        self._values = self._block.tolist()
@@ -1,22 +1,57 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import matplotlib.dates as mdates
 
-def visualize_equity_curve(backtester, title="Equity Curve", save_path=None):
-    """자산 곡선 시각화"""
+RENDER_MANIFEST = ".render_manifest.json"  # 그림별 입력 해시 (바뀌지 않은 그림은 다시 그리지 않음)
+
+def downsample_indices(series, max_points):
+    """구간별 최솟값/최댓값 인덱스만 남겨 극값을 보존하는 다운샘플링
+    
+    series의 각 배열에서 구간마다 최소/최대 위치를 골라 합친다 (처음과 마지막 점 포함).
+    결과 점 수는 배열 하나당 대략 max_points개.
+    """
+    n = len(series[0])
+    if n <= max_points:
+        return np.arange(n)
+    
+    n_buckets = max(1, max_points // 2)
+    size = -(-n // n_buckets)
+    keep = [np.array([0, n - 1])]
+    for values in series:
+        padded = np.full(n_buckets * size, np.nan)
+        padded[:n] = values
+        buckets = padded.reshape(n_buckets, size)
+        valid = ~np.isnan(buckets).all(axis=1)
+        offsets = np.arange(n_buckets)[valid] * size
+        keep.append(offsets + np.nanargmin(buckets[valid], axis=1))
+        keep.append(offsets + np.nanargmax(buckets[valid], axis=1))
+    return np.unique(np.concatenate(keep))
+
+def visualize_equity_curve(backtester, title="Equity Curve", save_path=None, max_points=None, dpi=300):
+    """자산 곡선 시각화 (max_points를 주면 극값을 보존하며 점 수를 줄임)"""
     if not backtester.equity_curve:
         print("시각화할 데이터가 부족합니다.")
         return
     
     # 데이터 준비
-    equity_df = pd.DataFrame(backtester.equity_curve)
+    equity_df = backtester.equity_curve.to_frame()
+    if max_points is not None:
+        equity_df = equity_df.iloc[downsample_indices(
+            [equity_df['balance'].to_numpy(), equity_df['equity'].to_numpy()], max_points
+        )]
     equity_df['timestamp'] = pd.to_datetime(equity_df['timestamp'])
     equity_df.set_index('timestamp', inplace=True)
     
     # 그래프 생성
     plt.figure(figsize=(12, 6))
     plt.plot(equity_df.index, equity_df['balance'], label='Balance', color='blue', linewidth=2)
+    plt.plot(equity_df.index, equity_df['equity'], label='Equity (Mark-to-Market)', color='orange', linewidth=1, alpha=0.8)
     plt.axhline(y=backtester.initial_balance, color='gray', linestyle='--', alpha=0.7, label='Initial Balance')
     
     plt.title(title, fontsize=14)
@@ -30,14 +65,14 @@ def visualize_equity_curve(backtester, title="Equity Curve", save_path=None):
     
     if save_path:
         plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"자산 곡선이 저장되었습니다: {save_path}")
     else:
         plt.tight_layout()
         plt.show()
 
-def visualize_trade_results(backtester, title="Trade Results", save_path=None):
-    """거래 결과 시각화"""
+def visualize_trade_results(backtester, title="Trade Results", save_path=None, max_points=None, dpi=300):
+    """거래 결과 시각화 (max_points를 주면 누적 수익과 개별 거래를 극값 보존 다운샘플링)"""
     if not backtester.trades_history:
         print("시각화할 거래 기록이 없습니다.")
         return
@@ -52,7 +87,11 @@ def visualize_trade_results(backtester, title="Trade Results", save_path=None):
     
     # 누적 수익 그래프
     trades_df['cumulative_profit'] = trades_df['profit'].cumsum()
-    axes[0].plot(trades_df['exit_time'], trades_df['cumulative_profit'], 
+    cumulative_df = trades_df
+    if max_points is not None:
+        cumulative_df = trades_df.iloc[downsample_indices([trades_df['cumulative_profit'].to_numpy()], max_points)]
+        trades_df = trades_df.iloc[downsample_indices([trades_df['profit'].to_numpy()], max_points)]
+    axes[0].plot(cumulative_df['exit_time'], cumulative_df['cumulative_profit'], 
                color='green', linewidth=2)
     axes[0].axhline(y=0, color='gray', linestyle='-', alpha=0.5)
     axes[0].set_title("Cumulative Profit", fontsize=14)
@@ -74,12 +113,12 @@ def visualize_trade_results(backtester, title="Trade Results", save_path=None):
     plt.tight_layout()
     
     if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"거래 결과가 저장되었습니다: {save_path}")
     else:
         plt.show()
 
-def visualize_trade_patterns(backtester, title="Trade Patterns Analysis", save_path=None):
+def visualize_trade_patterns(backtester, title="Trade Patterns Analysis", save_path=None, dpi=300):
     """거래 패턴별 성과 시각화"""
     if not backtester.trades_history:
         print("시각화할 거래 기록이 없습니다.")
@@ -141,12 +180,12 @@ def visualize_trade_patterns(backtester, title="Trade Patterns Analysis", save_p
     plt.tight_layout()
     
     if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"패턴 분석이 저장되었습니다: {save_path}")
     else:
         plt.show()
 
-def compare_backtest_results(in_sample_stats, out_sample_stats, metrics=None, title="Backtest Results Comparison", save_path=None):
+def compare_backtest_results(in_sample_stats, out_sample_stats, metrics=None, title="Backtest Results Comparison", save_path=None, dpi=300):
     """인샘플과 아웃샘플 결과 비교 시각화"""
     if metrics is None:
         metrics = [
@@ -236,67 +275,119 @@ def compare_backtest_results(in_sample_stats, out_sample_stats, metrics=None, ti
     plt.tight_layout()
     
     if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"비교 차트가 저장되었습니다: {save_path}")
     else:
         plt.show()
 
-def visualize_all_results(backtester1, backtester2=None, period1_name="In-Sample", period2_name="Out-of-Sample", output_dir="./results"):
-    """모든 결과 시각화 (단일 백테스트 또는 비교)"""
-    import os
-    
+class ChartData:
+    """시각화 함수가 쓰는 백테스터 속성만 담은 스냅샷 (워커 프로세스로 보내기 위함)"""
+    
+    def __init__(self, backtester):
+        self.equity_curve = backtester.equity_curve
+        self.trades_history = backtester.trades_history
+        self.initial_balance = backtester.initial_balance
+    
+    def fingerprint(self):
+        """그림 입력이 바뀌었는지 판단하기 위한 해시 재료"""
+        curve = self.equity_curve
+        return (curve.timestamps_ns.tobytes(), curve.balance.tobytes(), curve.equity.tobytes(),
+                pickle.dumps(self.trades_history), self.initial_balance)
+
+def _init_render_worker():
+    plt.switch_backend('Agg')
+
+def _render(job):
+    function, kwargs = job
+    function(**kwargs)
+    plt.close('all')
+    return kwargs['save_path']
+
+def _job_digest(function, kwargs):
+    material = {k: v.fingerprint() if isinstance(v, ChartData) else v for k, v in kwargs.items()}
+    name = f"{function.__module__}.{function.__qualname__}"
+    return hashlib.sha1(pickle.dumps((name, sorted(material.items())))).hexdigest()
+
+def render_figures(jobs, output_dir, processes=None, skip_unchanged=True):
+    """(그리기 함수, 인자 dict) 목록의 그림을 Agg 백엔드 워커 프로세스에서 병렬로 렌더링
+    
+    skip_unchanged이면 입력 해시가 지난 렌더링과 같고 파일이 남아 있는 그림은
+    건너뛴다 (해시는 output_dir의 매니페스트에 저장). 새로 그린 파일 경로 목록을 반환.
+    """
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST)
+    manifest = {}
+    if skip_unchanged and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    
+    pending = []
+    for function, kwargs in jobs:
+        digest = _job_digest(function, kwargs)
+        path = kwargs['save_path']
+        if skip_unchanged and manifest.get(path) == digest and os.path.exists(path):
+            continue
+        pending.append(((function, kwargs), path, digest))
+    
+    if processes == 1 or len(pending) <= 1:
+        rendered = [_render(job) for job, _, _ in pending]
+    else:
+        workers = processes or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as executor:
+            rendered = list(executor.map(_render, [job for job, _, _ in pending]))
+    
+    manifest.update({path: digest for _, path, digest in pending})
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return rendered
+
+def visualize_all_results(backtester1, backtester2=None, period1_name="In-Sample", period2_name="Out-of-Sample", output_dir="./results",
+                          fast=False, max_points=2000, processes=None, dpi=None):
+    """모든 결과 시각화 (단일 백테스트 또는 비교)
+    
+    fast=True이면 긴 시계열을 극값을 보존하며 max_points개 안팎으로 줄이고,
+    그림을 워커 프로세스에서 병렬로 그리며, 입력이 지난번과 같은 그림은 건너뛴다.
+    dpi 기본값은 일반 모드 300, fast 모드 100. 두 모드 모두 새로 그린 파일 경로 목록을 반환.
+    """
     # 결과 디렉토리 생성
     os.makedirs(output_dir, exist_ok=True)
     
-    # 첫 번째 백테스트 시각화
-    visualize_equity_curve(
-        backtester1, 
-        title=f"{period1_name} Equity Curve",
-        save_path=f"{output_dir}/{period1_name.lower().replace('-', '_')}_equity_curve.png"
-    )
-    
-    visualize_trade_results(
-        backtester1,
-        title=f"{period1_name} Trade Results", 
-        save_path=f"{output_dir}/{period1_name.lower().replace('-', '_')}_trade_results.png"
-    )
-    
-    visualize_trade_patterns(
-        backtester1, 
-        title=f"{period1_name} Pattern Analysis",
-        save_path=f"{output_dir}/{period1_name.lower().replace('-', '_')}_patterns.png"
-    )
-    
-    # 두 번째 백테스트가 있으면 시각화 및 비교
+    if dpi is None:
+        dpi = 100 if fast else 300
+    series_options = {'max_points': max_points if fast else None, 'dpi': dpi}
+    
+    # 그릴 그림 목록 (그리기 함수, 인자)
+    jobs = []
+    periods = [(backtester1, period1_name)]
+    if backtester2:
+        periods.append((backtester2, period2_name))
+    for backtester, period_name in periods:
+        data = ChartData(backtester) if fast else backtester
+        prefix = f"{output_dir}/{period_name.lower().replace('-', '_')}"
+        jobs.append((visualize_equity_curve, {
+            'backtester': data, 'title': f"{period_name} Equity Curve",
+            'save_path': f"{prefix}_equity_curve.png", **series_options
+        }))
+        jobs.append((visualize_trade_results, {
+            'backtester': data, 'title': f"{period_name} Trade Results",
+            'save_path': f"{prefix}_trade_results.png", **series_options
+        }))
+        jobs.append((visualize_trade_patterns, {
+            'backtester': data, 'title': f"{period_name} Pattern Analysis",
+            'save_path': f"{prefix}_patterns.png", 'dpi': dpi
+        }))
+    
+    # 두 번째 백테스트가 있으면 결과 비교
     if backtester2:
-        visualize_equity_curve(
-            backtester2, 
-            title=f"{period2_name} Equity Curve",
-            save_path=f"{output_dir}/{period2_name.lower().replace('-', '_')}_equity_curve.png"
-        )
-        
-        visualize_trade_results(
-            backtester2,
-            title=f"{period2_name} Trade Results", 
-            save_path=f"{output_dir}/{period2_name.lower().replace('-', '_')}_trade_results.png"
-        )
-        
-        visualize_trade_patterns(
-            backtester2, 
-            title=f"{period2_name} Pattern Analysis",
-            save_path=f"{output_dir}/{period2_name.lower().replace('-', '_')}_patterns.png"
-        )
-        
-        # 결과 비교
-        stats1 = calculate_backtest_stats(backtester1)
-        stats2 = calculate_backtest_stats(backtester2)
-        
-        compare_backtest_results(
-            stats1, 
-            stats2,
-            title=f"{period1_name} vs {period2_name} Comparison",
-            save_path=f"{output_dir}/backtest_comparison.png"
-        )
+        jobs.append((compare_backtest_results, {
+            'in_sample_stats': calculate_backtest_stats(backtester1),
+            'out_sample_stats': calculate_backtest_stats(backtester2),
+            'title': f"{period1_name} vs {period2_name} Comparison",
+            'save_path': f"{output_dir}/backtest_comparison.png", 'dpi': dpi
+        }))
+    
+    if fast:
+        return render_figures(jobs, output_dir, processes)
+    return [_render(job) for job in jobs]
 
 def calculate_backtest_stats(backtester):
     """백테스트 결과 통계 계산"""
@@ -0,0 +1,196 @@
+# walk_forward.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import config
+from candle_store import load_columns, columns_to_frame
+from resample import add_strategy_indicators
+from sweep import override_parameters, parameter_grid, validate_parameters
+from validation import create_walk_forward_periods
+
+# Per-worker data, loaded once by _init_worker and shared read-only via mmap
+_worker_columns = None
+_worker_tz = None
+
+def _init_worker(csv_filename):
+    global _worker_columns, _worker_tz
+    _worker_columns, meta = load_columns(csv_filename)
+    _worker_tz = meta['tz']
+
+def build_walk_forward_windows(timestamps_ns, window_size_days=30, step_size_days=7):
+    """Turn create_walk_forward_periods into bar-index windows with contiguous test slices.
+    
+    Tail periods that create_walk_forward_periods clips to the end of the data
+    overlap earlier test slices; their test start is moved up to the previous
+    test end so every bar is tested at most once, and empty windows are dropped.
+    """
+    index = pd.DatetimeIndex(np.asarray(timestamps_ns).view('datetime64[ns]'), tz='UTC')
+    periods = create_walk_forward_periods(
+        pd.DataFrame(index=index), window_size_days, step_size_days
+    )
+    
+    def position(ts):
+        return int(np.searchsorted(timestamps_ns, ts.value, side='left'))
+    
+    windows = []
+    previous_test_end = 0
+    for period in periods:
+        train_lo, train_hi = position(period['train_start']), position(period['train_end'])
+        test_lo = max(position(period['test_start']), previous_test_end)
+        test_hi = position(period['test_end'])
+        if period['test_end'] >= index[-1]:
+            test_hi = len(timestamps_ns)  # Periods end on the last bar; include it
+        if train_hi <= train_lo or test_hi <= test_lo:
+            continue
+        
+        windows.append({
+            'window': len(windows),
+            'train_lo': train_lo,
+            'train_hi': train_hi,
+            'test_lo': test_lo,
+            'test_hi': test_hi
+        })
+        previous_test_end = test_hi
+    
+    return windows
+
+def backtest_slice(columns, tz, params, lo, hi, warmup_bars, initial_balance=10000,
+                   engine='array', seed=0):
+    """Backtest bars [lo, hi) with indicators computed on all prior bars.
+    
+    Indicators come from the full prefix [0, hi), so they match a run over the
+    whole history, and the warmup_bars bars before lo feed the
+    support/resistance tracker without trading. Returns the Backtester.
+    """
+    from backtest import Backtester
+    
+    start = max(0, lo - warmup_bars)
+    with override_parameters(params):
+        np.random.seed(seed)
+        prefix = columns_to_frame({c: v[:hi] for c, v in columns.items()}, tz)
+        data = add_strategy_indicators(prefix).iloc[start:hi]
+        backtester = Backtester(initial_balance=initial_balance, verbose=False)
+        backtester.last_stats = backtester.run_on_data(
+            data, engine=engine, warmup_bars=lo - start, compute_indicators=False
+        )
+    return backtester
+
+def _metric_value(stats, metric):
+    value = stats.get(metric, np.nan)
+    return value if np.isfinite(value) else -np.inf
+
+def _run_window(task):
+    window, parameter_sets, warmup_bars, metric, initial_balance, engine, seed = task
+    columns, tz = _worker_columns, _worker_tz
+    
+    # Optimize on the train slice
+    best_params, best_value, best_stats = None, -np.inf, None
+    for params in parameter_sets:
+        stats = backtest_slice(
+            columns, tz, params, window['train_lo'], window['train_hi'],
+            warmup_bars, initial_balance, engine, seed
+        ).last_stats
+        value = _metric_value(stats, metric)
+        if best_params is None or value > best_value:
+            best_params, best_value, best_stats = params, value, stats
+    
+    # Evaluate the winner on the test slice
+    test = backtest_slice(
+        columns, tz, best_params, window['test_lo'], window['test_hi'],
+        warmup_bars, initial_balance, engine, seed
+    )
+    
+    return {
+        'window': window,
+        'params': best_params,
+        'train_stats': best_stats,
+        'test_stats': test.last_stats,
+        'equity_timestamp': test.equity_curve.timestamps_ns.copy(),
+        'equity_balance': test.equity_curve.balance.copy(),
+        'final_balance': test.balance
+    }
+
+def stitch_equity_curves(results, initial_balance=10000):
+    """Chain per-window test equity curves into one compounded out-of-sample curve."""
+    frames = []
+    capital = initial_balance
+    for result in results:
+        scale = capital / initial_balance
+        frames.append(pd.DataFrame({
+            'timestamp': pd.to_datetime(result['equity_timestamp'], utc=True),
+            'balance': result['equity_balance'] * scale,
+            'window': result['window']['window']
+        }))
+        capital = result['final_balance'] * scale
+    
+    if not frames:
+        return pd.DataFrame(columns=['timestamp', 'balance', 'window'])
+    return pd.concat(frames, ignore_index=True)
+
+def run_walk_forward(csv_filename, parameter_sets, window_size_days=30, step_size_days=7,
+                     warmup_bars=2000, metric='sharpe_ratio', max_workers=None,
+                     initial_balance=10000, engine='array', seed=0):
+    """Walk-forward optimization with windows evaluated concurrently.
+    
+    For each window from create_walk_forward_periods, every parameter set is
+    backtested on the train slice, the best one by `metric` is run on the test
+    slice, and the test equity curves are stitched into one out-of-sample
+    curve. Returns (windows DataFrame, stitched equity DataFrame).
+    """
+    for params in parameter_sets:
+        validate_parameters(params)
+    
+    columns, _ = load_columns(csv_filename)
+    windows = build_walk_forward_windows(
+        np.asarray(columns['timestamp']), window_size_days, step_size_days
+    )
+    
+    tasks = [
+        (window, parameter_sets, warmup_bars, metric, initial_balance, engine, seed)
+        for window in windows
+    ]
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(csv_filename,)
+    ) as executor:
+        results = list(executor.map(_run_window, tasks))
+    
+    timestamps = pd.to_datetime(np.asarray(columns['timestamp']), utc=True)
+    rows = []
+    for result in results:
+        window = result['window']
+        rows.append({
+            'window': window['window'],
+            'train_start': timestamps[window['train_lo']],
+            'train_end': timestamps[window['train_hi'] - 1],
+            'test_start': timestamps[window['test_lo']],
+            'test_end': timestamps[window['test_hi'] - 1],
+            **result['params'],
+            f'train_{metric}': result['train_stats'].get(metric),
+            **{f'test_{k}': v for k, v in result['test_stats'].items()}
+        })
+    
+    return pd.DataFrame(rows), stitch_equity_curves(results, initial_balance)
+
+def main():
+    in_sample_file = (
+        f"{config.SYMBOL}_{config.TIMEFRAME}_{config.IN_SAMPLE_START.strftime('%Y%m%d')}_"
+        f"{config.IN_SAMPLE_END.strftime('%Y%m%d')}_UTC_in_sample.csv"
+    )
+    parameter_sets = parameter_grid({
+        'RISK_REWARD_RATIO': [3, 5],
+        'BODY_TO_SHADOW_RATIO': [1.5, 2],
+    })
+    windows, equity = run_walk_forward(
+        in_sample_file, parameter_sets, window_size_days=14, step_size_days=3
+    )
+    print(windows[['window', 'test_start', 'test_end', 'RISK_REWARD_RATIO',
+                   'BODY_TO_SHADOW_RATIO', 'test_total_return', 'test_total_trades']])
+    if not equity.empty:
+        print(f"\nStitched out-of-sample final balance: {equity['balance'].iloc[-1]:.2f}")
+
+if __name__ == "__main__":
+    main()